@@ -0,0 +1,58 @@
+"""
+Calls of many accounts: a new adaptor per call, and adaptors kept by
+the registry sharing one connection pool. Peak memory shows that
+evicted accounts are released.
+
+Usage:
+    python -m benchmarks.bench_accounts [calls] [accounts] [maxsize]
+"""
+
+import sys
+import time
+import tracemalloc
+
+from esputnik.accounts import AccountRegistry
+from esputnik.esputnik import ESputnikAPIAdaptor
+
+from benchmarks.stub import StubServer
+
+
+def measure(func, calls: int):
+    tracemalloc.start()
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return calls / elapsed, peak / 2 ** 20
+
+
+def main(calls: int = 5000, accounts: int = 2000, maxsize: int = 200) -> None:
+    users = [f'user{x}' for x in range(accounts)]
+
+    with StubServer() as stub:
+        def per_call():
+            for x in range(calls):
+                with ESputnikAPIAdaptor(
+                    users[x % accounts], 'secret', host=stub.host
+                ) as adaptor:
+                    assert adaptor.balance().status_code == 200
+
+        with AccountRegistry(maxsize=maxsize) as registry:
+            def kept():
+                for x in range(calls):
+                    adaptor = registry.get(
+                        users[x % accounts], 'secret', host=stub.host)
+                    assert adaptor.balance().status_code == 200
+
+            for name, func in (('adaptor per call', per_call),
+                               ('registry', kept)):
+                rate, peak = measure(func, calls)
+                print(f'{name:<17} {rate:7.0f} calls/s, '
+                      f'peak {peak:6.2f} MiB')
+            print(f'{accounts} accounts, {len(registry)} kept, '
+                  f'{registry.evictions} evictions')
+
+
+if __name__ == '__main__':
+    main(*(int(x) for x in sys.argv[1:]))
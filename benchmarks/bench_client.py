@@ -0,0 +1,55 @@
+"""
+Client side overhead of a request with verb shortcuts resolved by
+``__getattribute__`` (as before) and by plain methods. Network is
+replaced by a canned response.
+
+Usage:
+    python -m benchmarks.bench_client [calls]
+"""
+
+import sys
+import timeit
+from functools import partial
+
+import requests
+
+from esputnik.client import ESputnikRequestClient
+
+RESPONSE = requests.Response()
+RESPONSE.status_code = 200
+RESPONSE._content = b'{"id": 1}'
+
+
+class CannedClient(ESputnikRequestClient):
+
+    def _request(self, method, url, data, headers, auth, **kwargs):
+        return RESPONSE
+
+
+class LegacyClient(CannedClient):
+    """
+    Verb dispatch of previous versions.
+    """
+
+    def __getattribute__(self, name: str):
+        if name in ['get', 'post', 'put', 'delete']:
+            return partial(self._send, name)
+        return object.__getattribute__(self, name)
+
+
+def main(calls: int = 100000) -> None:
+    for name, cls in (('__getattribute__', LegacyClient),
+                      ('methods', CannedClient)):
+        client = cls('user', 'secret', 'https://esputnik.com/api/')
+        cases = (
+            ('attribute', lambda: client.host),
+            ('construct_url', lambda: client.construct_url('contacts')),
+            ('post', lambda: client.post('contact', b'{}')),
+        )
+        for case, func in cases:
+            elapsed = min(timeit.repeat(func, number=calls, repeat=3))
+            print(f'{name:<17} {case:<14} {elapsed / calls * 1e9:9.0f} ns')
+
+
+if __name__ == '__main__':
+    main(*(int(x) for x in sys.argv[1:]))
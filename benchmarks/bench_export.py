@@ -0,0 +1,48 @@
+"""
+Full contacts export with sequential paging and concurrent page fetching
+against a stub server with simulated latency.
+
+Usage:
+    python -m benchmarks.bench_export [contacts] [latency] [workers]
+"""
+
+import sys
+import time
+from ast import literal_eval
+
+from esputnik.esputnik import ESputnikAPIAdaptor
+
+from benchmarks.stub import StubServer
+
+
+def main(
+        total: int = 20000,
+        latency: float = 0.05,
+        workers: int = 8
+) -> None:
+    with StubServer(latency=latency, total_contacts=total) as stub:
+        with ESputnikAPIAdaptor(
+            'user',
+            'secret',
+            host=stub.host,
+            client_options={'pool_maxsize': workers}
+        ) as adaptor:
+            started = time.perf_counter()
+            count = sum(1 for _ in adaptor.iter_contacts())
+            sequential = time.perf_counter() - started
+            assert count == total, count
+
+            ids = []
+            started = time.perf_counter()
+            count = adaptor.export_contacts(
+                lambda x: ids.append(x['id']), workers=workers)
+            concurrent = time.perf_counter() - started
+            assert ids == list(range(1, total + 1)), 'order is broken'
+
+    print(f'{total} contacts, {latency * 1e3:.0f} ms latency')
+    print(f'iter_contacts             {sequential:8.2f} s')
+    print(f'export_contacts x{workers:<3}     {concurrent:8.2f} s')
+
+
+if __name__ == '__main__':
+    main(*map(literal_eval, sys.argv[1:]))
@@ -0,0 +1,51 @@
+"""
+Overhead of instrumentation per call of an adaptor method, without the
+network: requests are answered by a canned response in process.
+
+Usage:
+    python -m benchmarks.bench_hooks [calls]
+"""
+
+import sys
+import time
+
+import requests
+
+from esputnik.esputnik import ESputnikAPIAdaptor
+from esputnik.client import ESputnikRequestClient
+from esputnik.instrumentation import MetricsCollector
+
+from benchmarks import payloads
+
+
+class CannedClient(ESputnikRequestClient):
+
+    def _request(self, method, url, data, headers, auth, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"id": 1}'
+        return response
+
+
+class CannedAdaptor(ESputnikAPIAdaptor):
+    request_client_class = CannedClient
+
+
+def run(hooks, calls: int) -> float:
+    adaptor = CannedAdaptor(
+        'user', 'secret', client_options={'hooks': hooks})
+    contact = payloads.contact(1)
+    started = time.perf_counter()
+    for _ in range(calls):
+        adaptor.add_contact(contact)
+    return (time.perf_counter() - started) / calls
+
+
+def main(calls: int = 20000) -> None:
+    run((), 1000)
+    for name, hooks in (('no hooks', ()), ('collector', [MetricsCollector()])):
+        print(f'{name:<10} {run(hooks, calls) * 1e6:8.2f} us/call')
+
+
+if __name__ == '__main__':
+    main(*(int(x) for x in sys.argv[1:]))
@@ -0,0 +1,85 @@
+"""
+Import time of the package, measured with ``python -X importtime``
+in fresh interpreters, and modules loaded eagerly by the import.
+
+Exits with non-zero status when median import time exceeds budget.
+The same checks run with the tests, see ``tests/test_import_time.py``.
+
+Usage:
+    python -m benchmarks.bench_import [runs] [budget_ms]
+"""
+
+import statistics
+import subprocess
+import sys
+
+MODULE = 'esputnik.esputnik'
+
+RUNS = 10
+
+# Median import time in milliseconds.
+BUDGET = 150
+
+# Heavy dependencies that must not be loaded by import alone.
+HEAVY = (
+    'aiohttp',
+    'opentelemetry',
+    'prometheus_client',
+    'requests',
+    'trafaret'
+)
+
+CHECK = (
+    'import sys\n'
+    f'import {MODULE}\n'
+    'print(" ".join(x for x in {heavy!r} if x in sys.modules))'
+)
+
+
+def measure() -> int:
+    """
+    Returns cumulative import time of the module in microseconds.
+    """
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {MODULE}'],
+        stderr=subprocess.PIPE,
+        check=True
+    ).stderr.decode()
+    for line in output.splitlines():
+        _, cumulative, name = line.split('|')
+        if name.strip() == MODULE:
+            return int(cumulative)
+    raise RuntimeError(f'{MODULE} was not imported')
+
+
+def median(runs: int = RUNS) -> float:
+    """
+    Returns median import time of the module in milliseconds.
+    """
+    return statistics.median(measure() for _ in range(runs)) / 1000
+
+
+def loaded() -> str:
+    """
+    Returns names of heavy modules loaded by the import.
+    """
+    return subprocess.run(
+        [sys.executable, '-c', CHECK.format(heavy=HEAVY)],
+        stdout=subprocess.PIPE,
+        check=True
+    ).stdout.decode().strip()
+
+
+def main(runs: int = RUNS, budget: int = BUDGET) -> int:
+    times = [measure() for _ in range(runs)]
+    median_time = statistics.median(times) / 1000
+    print(f'import {MODULE}: median {median_time:.1f} ms, '
+          f'min {min(times) / 1000:.1f} ms ({runs} runs), '
+          f'budget {budget} ms')
+    heavy = loaded()
+    print(f'heavy modules loaded: {heavy or "none"}')
+    return int(median_time > budget or bool(heavy))
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(x) for x in sys.argv[1:])))
@@ -0,0 +1,82 @@
+"""
+Tail latency of calls against a jittery stub server, where a share of
+replies is slow: plain GETs, hedged GETs, and sends with deadlines.
+
+Usage:
+    python -m benchmarks.bench_latency [calls] [slow_ratio] [slow_latency]
+"""
+
+import sys
+import time
+from ast import literal_eval
+
+import requests
+
+from esputnik.esputnik import ESputnikAPIAdaptor
+from esputnik.instrumentation import Histogram
+from esputnik.latency import HedgePolicy, Timeout
+
+from benchmarks.stub import StubServer
+
+
+def measure(call, calls: int):
+    histogram = Histogram()
+    errors = 0
+    for x in range(calls):
+        started = time.perf_counter()
+        try:
+            call(x)
+        except requests.Timeout:
+            errors += 1
+        histogram.record(time.perf_counter() - started)
+    return histogram, errors
+
+
+def report(name: str, histogram: Histogram, extra: str = '') -> None:
+    ms = {k: v * 1000 for k, v in histogram.snapshot().items()}
+    print(f'{name:<16} p50 {ms["p50"]:7.1f} ms, p95 {ms["p95"]:7.1f} ms, '
+          f'p99 {ms["p99"]:7.1f} ms, max {ms["max"]:7.1f} ms{extra}')
+
+
+def main(
+        calls: int = 1000,
+        slow_ratio: float = 0.03,
+        slow_latency: float = 0.5
+) -> None:
+    with StubServer(
+        latency=0.005,
+        slow_ratio=slow_ratio,
+        slow_latency=slow_latency,
+        seed=1
+    ) as stub:
+        with ESputnikAPIAdaptor('user', 'secret', host=stub.host) as adaptor:
+            histogram, _ = measure(adaptor.get_contact, calls)
+            report('get', histogram)
+
+        hedge = HedgePolicy()
+        with ESputnikAPIAdaptor(
+            'user',
+            'secret',
+            host=stub.host,
+            client_options={'hedge': hedge}
+        ) as adaptor:
+            histogram, _ = measure(adaptor.get_contact, calls)
+            report('hedged get', histogram,
+                   f', {hedge.hedges} backups, {hedge.wins} won')
+
+        timeout = Timeout(connect=0.05, read=0.1, total=0.1)
+        with ESputnikAPIAdaptor(
+            'user',
+            'secret',
+            host=stub.host,
+            client_options={'timeout': timeout}
+        ) as adaptor:
+            def send(x):
+                adaptor.client.post('message/sms', b'{}')
+
+            histogram, errors = measure(send, calls)
+            report('post, deadline', histogram, f', {errors} timed out')
+
+
+if __name__ == '__main__':
+    main(*map(literal_eval, sys.argv[1:]))
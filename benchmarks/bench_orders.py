@@ -0,0 +1,83 @@
+"""
+Throughput of bulk orders: batches sent one by one with ``orders``,
+and the pipeline validating in the calling thread and in processes.
+Every 100th order is invalid, serial sending skips batches that fail.
+
+Usage:
+    python -m benchmarks.bench_orders [orders] [latency] [processes]
+"""
+
+import sys
+import time
+from ast import literal_eval
+
+from trafaret import DataError
+
+from esputnik.esputnik import ESputnikAPIAdaptor
+from esputnik.orders import OrderPipeline
+from esputnik.utils import chunked
+
+from benchmarks.stub import StubServer
+
+
+def iter_orders(size: int):
+    for x in range(size):
+        order = {
+            'id': str(x),
+            'user_id': str(x % 1000),
+            'total_cost': 100.5,
+            'date': '2024-01-01T10:00:00',
+            'email': f'john{x}@dou.com',
+            'first_name': 'John',
+            'items': [
+                {
+                    'id': str(i),
+                    'name': f'Item {i}',
+                    'quantity': 1,
+                    'cost': 10.5,
+                    'url': f'https://dou.com/items/{i}',
+                    'image_url': f'https://dou.com/items/{i}.png',
+                    'category': 'Books',
+                    'description': 'Book ' * 20,
+                }
+                for i in range(10)
+            ],
+        }
+        if x % 100 == 99:
+            del order['email']
+        yield order
+
+
+def main(
+        size: int = 20000,
+        latency: float = 0.02,
+        processes: int = 4
+) -> None:
+    with StubServer(latency=latency) as stub:
+        with ESputnikAPIAdaptor(
+            'user', 'secret', host=stub.host
+        ) as adaptor:
+            started = time.perf_counter()
+            rejected = 0
+            for batch in chunked(iter_orders(size), 1000):
+                try:
+                    adaptor.orders({'orders': batch})
+                except DataError:
+                    rejected += len(batch)
+            elapsed = time.perf_counter() - started
+            print(f'serial orders       {size / elapsed:9.0f} orders/s, '
+                  f'{rejected} orders lost with invalid batches')
+
+            for name, count in (('pipeline', 0), ('pipeline', processes)):
+                pipeline = OrderPipeline(adaptor, processes=count)
+                started = time.perf_counter()
+                result = pipeline.send(iter_orders(size))
+                elapsed = time.perf_counter() - started
+                assert result.sent + result.invalid == size, result[:4]
+                print(f'{name} processes={count:<2} {size / elapsed:9.0f} '
+                      f'orders/s, {result.invalid} quarantined, '
+                      f'{len(result.batches)} requests')
+
+
+if __name__ == '__main__':
+    main(*map(literal_eval, sys.argv[1:]))
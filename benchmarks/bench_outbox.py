@@ -0,0 +1,40 @@
+"""
+Write throughput of the outbox.
+
+Usage:
+    python -m benchmarks.bench_outbox [requests]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from esputnik.esputnik import ESputnikAPIAdaptor
+from esputnik.outbox import Outbox
+
+SMS = {
+    'from': 'Shop',
+    'text': 'Your order has been shipped',
+    'phone_numbers': ['+380501234567'],
+}
+
+
+def main(size: int = 20000) -> None:
+    adaptor = ESputnikAPIAdaptor('user', 'secret')
+
+    for synchronous in ('NORMAL', 'FULL'):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'outbox.sqlite3')
+            with Outbox(adaptor, path, synchronous=synchronous) as outbox:
+                started = time.perf_counter()
+                for index in range(size):
+                    outbox.message_sms(SMS, dedupe_key=f'sms-{index}')
+                elapsed = time.perf_counter() - started
+                assert outbox.pending() == size
+
+        print(f'synchronous={synchronous:<6} {size / elapsed:10.0f} writes/s')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
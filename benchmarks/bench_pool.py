@@ -0,0 +1,37 @@
+"""
+Calls per second with and without connection reuse.
+
+Usage:
+    python -m benchmarks.bench_pool [calls]
+"""
+
+import sys
+import time
+
+from esputnik.esputnik import ESputnikAPIAdaptor
+
+from benchmarks.stub import StubServer
+
+
+def run(host: str, calls: int, keep_alive: bool) -> float:
+    with ESputnikAPIAdaptor(
+        user='user',
+        password='secret',
+        host=host,
+        client_options={'keep_alive': keep_alive}
+    ) as adaptor:
+        started = time.perf_counter()
+        for _ in range(calls):
+            adaptor.version()
+        return calls / (time.perf_counter() - started)
+
+
+def main(calls: int = 2000) -> None:
+    with StubServer() as stub:
+        for keep_alive in (False, True):
+            rate = run(stub.host, calls, keep_alive)
+            print(f'keep_alive={keep_alive!s:<5} {rate:10.1f} calls/s')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
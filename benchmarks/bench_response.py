@@ -0,0 +1,66 @@
+"""
+Cost of building responses: body decoded eagerly as in previous
+versions, and lazily on first access to data, for responses whose
+body is never read and for ones read once.
+
+Usage:
+    python -m benchmarks.bench_response [responses]
+"""
+
+import sys
+import time
+
+from esputnik.client import ESputnikRequestClient, Response
+from esputnik.serializers import get_serializer
+
+BODIES = (
+    ('ack', b'{"id": 12345, "status": "OK"}'),
+    ('contacts page', get_serializer().dumps({
+        'contacts': [
+            {
+                'id': x,
+                'firstName': f'John{x}',
+                'channels': [{'type': 'email', 'value': f'j{x}@dou.com'}],
+                'fields': [{'id': 1, 'value': 'Kyiv'}],
+            }
+            for x in range(500)
+        ]
+    })),
+)
+
+
+def measure(func, number: int) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - started
+
+
+def main(number: int = 2000) -> None:
+    client = ESputnikRequestClient(
+        'user', 'secret', 'https://esputnik.com/api/')
+    loads = client.serializer.loads
+    build = client._build_response
+
+    def eager(content):
+        return Response(200, loads(content), 0, {})
+
+    for name, content in BODIES:
+        cases = (
+            ('not read',
+             lambda: eager(content),
+             lambda: build(200, {}, content, 0)),
+            ('read',
+             lambda: eager(content).data,
+             lambda: build(200, {}, content, 0).data),
+        )
+        for case, old, new in cases:
+            before = measure(old, number) / number * 1e6
+            after = measure(new, number) / number * 1e6
+            print(f'{name:<14} {case:<9} eager {before:9.2f} us, '
+                  f'lazy {after:9.2f} us, x{before / after:.1f} '
+                  f'({len(content)} bytes)')
+
+
+if __name__ == '__main__':
+    main(*(int(x) for x in sys.argv[1:]))
@@ -0,0 +1,51 @@
+"""
+Url construction by ``construct_url`` against the route table
+of the client, as done by ``_send`` for every request.
+
+Usage:
+    python -m benchmarks.bench_routes [constructions]
+"""
+
+import sys
+import time
+
+from esputnik.client import ESputnikRequestClient
+
+
+def measure(func, number: int) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - started
+
+
+def main(number: int = 1000000) -> None:
+    client = ESputnikRequestClient(
+        'user', 'secret', 'https://esputnik.com/api/')
+    construct_url = client.construct_url
+    url = client.routes.url
+    message_id = 12345
+    contact_ids = iter(range(10 ** 9))
+
+    cases = (
+        ('static',
+         lambda: construct_url('event'),
+         lambda: url('event')),
+        ('same id',
+         lambda: construct_url(f'message/{message_id}/smartsend'),
+         lambda: url(f'message/{message_id}/smartsend')),
+        ('unique ids',
+         lambda: construct_url(f'contact/{next(contact_ids)}'),
+         lambda: url(f'contact/{next(contact_ids)}')),
+    )
+    assert url('contact/1') == construct_url('contact/1')
+    for name, old, new in cases:
+        before = measure(old, number)
+        after = measure(new, number)
+        print(f'{name:<11} construct_url {before:6.2f} s, '
+              f'routes {after:6.2f} s, x{before / after:.1f} '
+              f'({number} urls)')
+
+
+if __name__ == '__main__':
+    main(*(int(x) for x in sys.argv[1:]))
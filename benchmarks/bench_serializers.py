@@ -0,0 +1,47 @@
+"""
+Encoding and decoding speed of installed JSON backends on transformed
+ORDER and CONTACTS payloads.
+
+Usage:
+    python -m benchmarks.bench_serializers [repeat]
+"""
+
+import sys
+import timeit
+
+from esputnik.serializers import SERIALIZERS
+from esputnik.templates import prepare_contacts, prepare_order
+
+from benchmarks import payloads
+
+CASES = (
+    ('ORDER 100x10', prepare_order(payloads.orders(100, 10))),
+    ('CONTACTS x3000', prepare_contacts(payloads.contacts(3000))),
+)
+
+
+def main(repeat: int = 5) -> None:
+    for name, data in CASES:
+        for serializer_class in SERIALIZERS:
+            try:
+                serializer = serializer_class()
+            except ImportError:
+                print(f'{name:<16} {serializer_class.name:<8} not installed')
+                continue
+
+            body = serializer.dumps(data)
+            number = 20
+            dumps = min(timeit.repeat(
+                lambda: serializer.dumps(data), number=number, repeat=repeat))
+            loads = min(timeit.repeat(
+                lambda: serializer.loads(body), number=number, repeat=repeat))
+            print(
+                f'{name:<16} {serializer.name:<8} '
+                f'dumps {dumps / number * 1e3:8.3f} ms  '
+                f'loads {loads / number * 1e3:8.3f} ms  '
+                f'{len(body) / 1024:8.1f} KiB'
+            )
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,80 @@
+"""
+Throughput of smartsend to many recipients: one request with a list
+built up front as in ``test_smart_send`` of ``esputnik/examples/cases.py``,
+and fan-out of packed requests by the dispatcher.
+
+Usage:
+    python -m benchmarks.bench_smartsend [recipients] [latency] [workers]
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+from ast import literal_eval
+
+from esputnik.esputnik import ESputnikAPIAdaptor
+from esputnik.smartsend import SmartsendDispatcher
+
+from benchmarks.stub import StubServer
+
+
+def iter_users(size: int):
+    for x in range(size):
+        yield {
+            'full_name': f'John Dou{x}',
+            'email': f'john{x}@dou.com',
+            'phone': f'+7{x:010d}',
+        }
+
+
+def measure(func):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main(
+        size: int = 100000,
+        latency: float = 0.02,
+        workers: int = 8
+) -> None:
+    with StubServer(latency=latency) as stub:
+        with ESputnikAPIAdaptor(
+            'user',
+            'secret',
+            host=stub.host,
+            client_options={'pool_maxsize': workers}
+        ) as adaptor:
+            def single():
+                users = list(iter_users(size))
+                recipients = []
+                for user in users:
+                    recipients.append({
+                        'locator': user['email'],
+                        'json_param': json.dumps(user)
+                    })
+                data = {'recipients': recipients}
+                return adaptor.message_smartsend('1', data)
+
+            response, elapsed, peak = measure(single)
+            assert response.status_code == 200, response
+            print(f'single request      {size / elapsed:9.0f} recipients/s, '
+                  f'peak {peak / 2 ** 20:7.2f} MiB')
+
+            dispatcher = SmartsendDispatcher(adaptor, workers=workers)
+            result, elapsed, peak = measure(
+                lambda: dispatcher.send(
+                    '1', ((x['email'], x) for x in iter_users(size))))
+            assert result.sent == size, result[:3]
+            print(f'dispatcher x{workers:<3}     {size / elapsed:9.0f} '
+                  f'recipients/s, peak {peak / 2 ** 20:7.2f} MiB, '
+                  f'{len(result.chunks)} requests')
+
+
+if __name__ == '__main__':
+    main(*map(literal_eval, sys.argv[1:]))
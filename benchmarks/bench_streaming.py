@@ -0,0 +1,43 @@
+"""
+Peak memory of sending large add_contacts body, built in one piece
+and streamed.
+
+Usage:
+    python -m benchmarks.bench_streaming [contacts]
+"""
+
+import sys
+import tracemalloc
+
+from esputnik.esputnik import ESputnikAPIAdaptor
+
+from benchmarks import payloads
+from benchmarks.stub import StubServer
+
+
+def run(adaptor: ESputnikAPIAdaptor, size: int, stream: bool) -> int:
+    data = payloads.contacts(0)
+    data['contacts'] = payloads.iter_contacts(size)
+    if not stream:
+        data['contacts'] = list(data['contacts'])
+
+    tracemalloc.start()
+    response = adaptor.add_contacts(data, stream=stream)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert response.status_code == 200, response
+    return peak
+
+
+def main(size: int = 20000) -> None:
+    with StubServer() as stub:
+        with ESputnikAPIAdaptor('user', 'secret', host=stub.host) as adaptor:
+            for stream in (False, True):
+                peak = run(adaptor, size, stream)
+                print(f'stream={stream!s:<5} {size} contacts, '
+                      f'peak {peak / 2 ** 20:8.2f} MiB')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
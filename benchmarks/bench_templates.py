@@ -0,0 +1,44 @@
+"""
+Compiled prepare_* functions against generic ``template.transform``.
+
+Usage:
+    python -m benchmarks.bench_templates [repeat]
+"""
+
+import json
+import sys
+import timeit
+
+from esputnik import templates
+
+from benchmarks import payloads
+
+CASES = (
+    ('CONTACTS x3000', templates.CONTACTS, templates.prepare_contacts,
+     payloads.contacts(3000)),
+    ('ORDER 100x10', templates.ORDER, templates.prepare_order,
+     payloads.orders(100, 10)),
+    ('CONTACT', templates.CONTACT, templates.prepare_contact,
+     payloads.contact(1)),
+)
+
+
+def main(repeat: int = 5) -> None:
+    for name, template, prepare, data in CASES:
+        expected = json.dumps(template.transform(data))
+        assert json.dumps(prepare(data)) == expected, name
+
+        number = 10
+        generic = min(timeit.repeat(
+            lambda: template.transform(data), number=number, repeat=repeat))
+        compiled = min(timeit.repeat(
+            lambda: prepare(data), number=number, repeat=repeat))
+        print(
+            f'{name:<16} transform {generic / number * 1e3:9.3f} ms  '
+            f'compiled {compiled / number * 1e3:9.3f} ms  '
+            f'x{generic / compiled:.1f}'
+        )
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
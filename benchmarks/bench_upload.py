@@ -0,0 +1,46 @@
+"""
+Peak memory and throughput of building contacts upload files
+from a generator of contacts.
+
+Usage:
+    python -m benchmarks.bench_upload [contacts] [max_part_size]
+"""
+
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from esputnik.upload import ContactFileBuilder
+
+from benchmarks import payloads
+
+
+def main(size: int = 200000, max_part_size: int = 8 * 2 ** 20) -> None:
+    for format, compression in (
+            ('csv', None), ('csv', 'gzip'), ('ndjson', 'gzip')):
+        with tempfile.TemporaryDirectory() as directory:
+            builder = ContactFileBuilder(
+                directory,
+                format=format,
+                compression=compression,
+                max_part_size=max_part_size,
+                custom_fields_ids=[1]
+            )
+            tracemalloc.start()
+            started = time.perf_counter()
+            manifest = builder.build(payloads.iter_contacts(size))
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            assert manifest.rows == size, manifest.rows
+            total = sum(x.size for x in manifest.parts)
+            print(f'{format:<6} {compression or "-":<5} {size} contacts, '
+                  f'{len(manifest.parts)} parts, {total / 2 ** 20:7.2f} MiB, '
+                  f'{size / elapsed:9.0f} rows/s, '
+                  f'peak {peak / 2 ** 20:6.2f} MiB')
+
+
+if __name__ == '__main__':
+    main(*(int(x) for x in sys.argv[1:]))
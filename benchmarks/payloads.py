@@ -0,0 +1,76 @@
+"""
+Representative payloads shared by benchmarks.
+"""
+
+from typing import Dict, Iterator
+
+__all__ = (
+    'contact',
+    'contacts',
+    'iter_contacts',
+    'order',
+    'orders'
+)
+
+
+def contact(index: int) -> Dict:
+    return {
+        'first_name': f'John{index}',
+        'last_name': 'Dou',
+        'channels': [
+            {'type': 'email', 'value': f'john{index}@dou.com'},
+            {'type': 'sms', 'value': f'+38050{index:07d}'},
+        ],
+        'address': {
+            'region': 'Kyivska obl',
+            'town': 'Kyiv',
+            'address': '25, Main str.',
+            'postcode': '78900',
+        },
+        'fields': [{'id': 1, 'value': 'x'}],
+        'groups': [{'name': 'Subscribers'}],
+    }
+
+
+def iter_contacts(size: int) -> Iterator[Dict]:
+    return (contact(x) for x in range(size))
+
+
+def contacts(size: int = 3000) -> Dict:
+    return {
+        'contacts': list(iter_contacts(size)),
+        'dedupe_on': 'email',
+        'contact_fields': ['firstName', 'lastName', 'email', 'sms'],
+        'group_names': ['Subscribers'],
+    }
+
+
+def order(index: int, items: int = 10) -> Dict:
+    return {
+        'id': str(index),
+        'user_id': f'user-{index}',
+        'total_cost': 1999.5,
+        'status': 'DELIVERED',
+        'date': '2020-01-01T10:00:00',
+        'email': f'john{index}@dou.com',
+        'phone': '+380501234567',
+        'first_name': 'John',
+        'last_name': 'Dou',
+        'shipping': 50.0,
+        'items': [
+            {
+                'id': str(x),
+                'name': f'Item {x}',
+                'quantity': 2,
+                'cost': 99.9,
+                'url': f'https://shop.com/items/{x}/',
+                'image_url': f'https://shop.com/images/{x}.jpg',
+                'category': 'Category',
+            }
+            for x in range(items)
+        ],
+    }
+
+
+def orders(size: int = 100, items: int = 10) -> Dict:
+    return {'orders': [order(x, items) for x in range(size)]}
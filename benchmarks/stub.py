@@ -0,0 +1,159 @@
+"""
+Local stub of the ESputnik REST API used by benchmarks.
+
+Every request is answered with a small JSON body, so benchmarks measure
+client-side overhead and the transport rather than the remote server.
+Contact searches return pages of generated contacts with TotalCount header.
+"""
+
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Tuple, cast
+from urllib.parse import parse_qs, urlsplit
+
+__all__ = (
+    'StubServer',
+)
+
+
+CONTACTS_PATH = re.compile(r'/v\d+/(contacts|group/[^/]+/contacts)/$')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _reply(self) -> None:
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        elif self.headers.get('Transfer-Encoding') == 'chunked':
+            self._drain_chunked()
+
+        server = cast(_Server, self.server)
+        latency = server.latency
+        if server.slow_ratio and server.random.random() < server.slow_ratio:
+            latency = server.slow_latency
+        if latency:
+            time.sleep(latency)
+
+        headers = {}
+        url = urlsplit(self.path)
+        data = None  # type: Any
+        if CONTACTS_PATH.search(url.path) and self.command == 'GET':
+            data = self._contacts(parse_qs(url.query))
+            headers['TotalCount'] = str(server.total_contacts)
+        elif url.path.endswith('/message/status/'):
+            data = {'results': [
+                {'id': x, 'status': 'DELIVERED'}
+                for x in parse_qs(url.query).get('ids', [])
+            ]}
+        else:
+            data = {'path': self.path}
+
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _contacts(self, query) -> list:
+        start = int(query.get('startindex', ['1'])[0])
+        rows = int(query.get('maxrows', ['500'])[0])
+        stop = min(start + rows, cast(_Server, self.server).total_contacts + 1)
+        return [
+            {'id': x, 'email': f'contact{x}@example.com'}
+            for x in range(start, stop)
+        ]
+
+    def _drain_chunked(self) -> None:
+        while True:
+            size = int(self.rfile.readline().strip(), 16)
+            self.rfile.read(size + 2)
+            if not size:
+                return
+
+    do_GET = do_POST = do_PUT = do_DELETE = _reply
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(
+            self,
+            address: Tuple[str, int],
+            latency: float,
+            total_contacts: int,
+            slow_ratio: float,
+            slow_latency: float,
+            seed: int = None
+    ) -> None:
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        self.total_contacts = total_contacts
+        self.slow_ratio = slow_ratio
+        self.slow_latency = slow_latency
+        self.random = random.Random(seed)
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients that timed out or lost the hedging race hang up.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubServer:
+    """
+    Threaded HTTP server running in the background.
+
+    Args:
+        latency (float, optional): Seconds to sleep before every reply.
+        total_contacts (int, optional): Amount of contacts to page through.
+        slow_ratio (float, optional): Share of replies that are slow.
+        slow_latency (float, optional): Seconds to sleep before slow reply.
+        seed (int, optional): Seed of random choice of slow replies.
+    """
+
+    def __init__(
+            self,
+            latency: float = 0,
+            total_contacts: int = 0,
+            slow_ratio: float = 0,
+            slow_latency: float = 0,
+            seed: int = None
+    ) -> None:
+        self.server = _Server(
+            ('127.0.0.1', 0),
+            latency=latency,
+            total_contacts=total_contacts,
+            slow_ratio=slow_ratio,
+            slow_latency=slow_latency,
+            seed=seed
+        )
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True)
+
+    @property
+    def host(self) -> str:
+        return 'http://127.0.0.1:%d/api/' % self.server.server_port
+
+    def __enter__(self) -> 'StubServer':
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.server.shutdown()
+        self.server.server_close()
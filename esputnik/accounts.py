@@ -0,0 +1,298 @@
+"""
+Registry of API adaptors of many accounts.
+
+Adaptors are created on first use and kept for following calls, all of
+them send requests through a single shared connection pool. Every
+account has its own rate limiter and metrics. Least recently used
+accounts are evicted, so memory is bounded whatever the amount of
+accounts.
+"""
+
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple
+)
+
+from esputnik.esputnik import ESputnikAPIAdaptor
+from esputnik.exceptions import InvalidAuthDataError
+from esputnik.instrumentation import MetricsCollector
+from esputnik.ratelimit import TokenBucketLimiter
+
+if TYPE_CHECKING:
+    from requests.adapters import HTTPAdapter
+
+__all__ = (
+    'DEFAULT_HOST',
+    'Account',
+    'AccountRegistry'
+)
+
+
+DEFAULT_HOST = 'https://esputnik.com/api/'
+
+# User, host and version.
+AccountKey = Tuple[str, str, int]
+
+
+class Account(NamedTuple):
+    adaptor: ESputnikAPIAdaptor
+    metrics: Optional[MetricsCollector]
+    rate_limiter: Optional[TokenBucketLimiter]
+
+
+class AccountRegistry:
+    """
+    Keeps one adaptor per account (user, host and version).
+
+    Evicted adaptor is closed, its connections and threads are released.
+    It stays usable by callers that still hold it, they are created
+    again on demand, it just is not returned by the registry anymore.
+
+    Attributes:
+        maxsize (int): Max amount of kept accounts, the least recently
+            used ones are evicted.
+        idle_timeout (float, optional): Accounts not used for that many
+            seconds are evicted by ``evict_idle``, and on ``get``.
+        rates (Dict[str, float], optional): Requests per second
+            by endpoint family for every account, not limited if not set.
+        burst (float, optional): Burst of rate limiters.
+        metrics (bool): Keep ``MetricsCollector`` of every account.
+        pool_connections (int): Number of per-host pools of the shared
+            connection pool.
+        pool_maxsize (int): Max number of connections kept open per host
+            by the shared connection pool.
+        pool_block (bool): Block when no free connection is available.
+        client_options (Dict, optional): Extra options of every request
+            client, e.g. retry policy or hooks shared by all accounts.
+    """
+    adaptor_class = ESputnikAPIAdaptor
+
+    def __init__(
+            self,
+            maxsize: int = 1024,
+            idle_timeout: float = None,
+            rates: Dict[str, float] = None,
+            burst: float = None,
+            metrics: bool = True,
+            pool_connections: int = 10,
+            pool_maxsize: int = 50,
+            pool_block: bool = False,
+            client_options: Dict = None
+    ) -> None:
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.rates = rates
+        self.burst = burst
+        self.metrics = metrics
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.client_options = client_options or {}
+        self.evictions = 0
+        self._adapter = None  # type: Optional[HTTPAdapter]
+        self._lock = threading.Lock()
+        # Key -> (account, time of last use), least recent first.
+        self._accounts = OrderedDict()  # type: OrderedDict
+
+    def __enter__(self) -> 'AccountRegistry':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._accounts)
+
+    def __contains__(self, key: AccountKey) -> bool:
+        return key in self._accounts
+
+    def __iter__(self) -> Iterator[AccountKey]:
+        with self._lock:
+            return iter(list(self._accounts))
+
+    @property
+    def adapter(self) -> 'HTTPAdapter':
+        """
+        Returns shared connection pool, creating it on first access.
+        """
+        if self._adapter is None:
+            from requests.adapters import HTTPAdapter
+
+            self._adapter = HTTPAdapter(
+                pool_connections=self.pool_connections,
+                pool_maxsize=self.pool_maxsize,
+                pool_block=self.pool_block
+            )
+        return self._adapter
+
+    def create(
+            self,
+            user: str,
+            password: str,
+            host: str,
+            version: int
+    ) -> Account:
+        """
+        Creates adaptor of the account with its own rate limiter and
+        metrics, sending requests through the shared connection pool.
+        """
+        options = dict(self.client_options, adapter=self.adapter)
+
+        metrics = None
+        if self.metrics:
+            metrics = MetricsCollector()
+            options['hooks'] = (metrics,) + tuple(options.get('hooks', ()))
+
+        rate_limiter = None
+        if self.rates:
+            rate_limiter = TokenBucketLimiter(self.rates, self.burst)
+            options['rate_limiter'] = rate_limiter
+
+        adaptor = self.adaptor_class(
+            user, password, host, version, client_options=options)
+        return Account(adaptor, metrics, rate_limiter)
+
+    def account(
+            self,
+            user: str,
+            password: str,
+            host: str = DEFAULT_HOST,
+            version: int = 1
+    ) -> Account:
+        """
+        Returns account, creating it on first use.
+
+        Raises:
+            InvalidAuthDataError: account is kept with another password,
+                evict it first to change the password.
+        """
+        key = (user, host, version)
+        now = time.monotonic()
+        evicted = []  # type: List[Account]
+
+        with self._lock:
+            entry = self._accounts.get(key)
+            if entry is not None:
+                kept = entry[0].adaptor.client.api_password
+                if not hmac.compare_digest(kept.encode(), password.encode()):
+                    raise InvalidAuthDataError(
+                        code='api_password',
+                        message=f'Account {user} is kept with '
+                                f'another password.'
+                    )
+                self._accounts.move_to_end(key)
+            else:
+                entry = self._accounts[key] = [
+                    self.create(user, password, host, version), now]
+            entry[1] = now
+
+            if self.idle_timeout is not None:
+                evicted.extend(self._evict_idle(now))
+            while len(self._accounts) > self.maxsize:
+                evicted.append(self._accounts.popitem(last=False)[1][0])
+                self.evictions += 1
+
+        self._close(evicted)
+        return entry[0]
+
+    def get(
+            self,
+            user: str,
+            password: str,
+            host: str = DEFAULT_HOST,
+            version: int = 1
+    ) -> ESputnikAPIAdaptor:
+        """
+        Returns adaptor of the account, creating it on first use.
+
+        Args:
+            user (str): API user of the account.
+            password (str): API password of the account.
+            host (str, optional): API host.
+            version (int, optional): API version.
+        """
+        return self.account(user, password, host, version).adaptor
+
+    def get_metrics(
+            self,
+            user: str,
+            host: str = DEFAULT_HOST,
+            version: int = 1
+    ) -> Optional[MetricsCollector]:
+        """
+        Returns metrics of kept account, None if it is not kept
+        or metrics are disabled.
+        """
+        entry = self._accounts.get((user, host, version))
+        return entry[0].metrics if entry is not None else None
+
+    def evict(
+            self,
+            user: str,
+            host: str = DEFAULT_HOST,
+            version: int = 1
+    ) -> bool:
+        """
+        Evicts the account, returns True if it was kept.
+        """
+        with self._lock:
+            entry = self._accounts.pop((user, host, version), None)
+            if entry is None:
+                return False
+            self.evictions += 1
+        self._close((entry[0],))
+        return True
+
+    @staticmethod
+    def _close(accounts: Iterable[Account]) -> None:
+        for account in accounts:
+            account.adaptor.close()
+
+    def _evict_idle(self, now: float) -> List[Account]:
+        deadline = now - (self.idle_timeout or 0.0)
+        evicted = []
+        while self._accounts:
+            key, (account, used) = next(iter(self._accounts.items()))
+            if used > deadline:
+                break
+            del self._accounts[key]
+            evicted.append(account)
+        self.evictions += len(evicted)
+        return evicted
+
+    def evict_idle(self) -> int:
+        """
+        Evicts accounts not used for ``idle_timeout`` seconds.
+
+        Returns:
+            int: amount of evicted accounts.
+        """
+        if self.idle_timeout is None:
+            return 0
+        with self._lock:
+            evicted = self._evict_idle(time.monotonic())
+        self._close(evicted)
+        return len(evicted)
+
+    def close(self) -> None:
+        """
+        Closes adaptors of all accounts, forgets them and closes
+        the shared connection pool.
+        """
+        with self._lock:
+            evicted = [entry[0] for entry in self._accounts.values()]
+            self._accounts.clear()
+            self._close(evicted)
+            if self._adapter is not None:
+                self._adapter.close()
+                self._adapter = None
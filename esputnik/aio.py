@@ -0,0 +1,702 @@
+"""
+Asyncio flavour of the request client and API adaptor.
+
+Requires ``aiohttp`` to be installed.
+"""
+
+import asyncio
+import time
+from functools import partial
+from itertools import islice
+from typing import (
+    IO, Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List,
+    Optional, Set, Tuple
+)
+
+from esputnik.client import (
+    DOWNLOAD_CHUNK_SIZE,
+    ESputnikRequestClient,
+    RequestData,
+    Response,
+    is_success
+)
+from esputnik.coalesce import AsyncMessageStatusCoalescer
+from esputnik.consts import CONTACTS_BATCH_SIZE, CONTACTS_PAGE_SIZE
+from esputnik.esputnik import BatchResult, ESputnikAPIAdaptor
+from esputnik.exceptions import IncorrectDataError
+from esputnik.instrumentation import CountingIterator
+from esputnik.latency import HedgePolicy, Timeout, fit_delay
+from esputnik.pagination import aexport_pages, aiter_pages
+from esputnik.utils import chunked, lazy_import
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None  # type: ignore
+
+__all__ = (
+    'AsyncESputnikRequestClient',
+    'AsyncESputnikAPIAdaptor',
+    'AsyncEventDispatcher'
+)
+
+_STOP = object()
+
+templates = lazy_import('esputnik.templates')
+
+
+async def _iterate(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    for chunk in chunks:
+        yield chunk
+
+
+def _prepare_params(data: Dict = None) -> List[Tuple]:
+    """
+    Flattens query params the same way ``requests`` does,
+    list values are sent as repeated keys.
+    """
+    params = []  # type: List[Tuple]
+    for key, value in (data or {}).items():
+        if isinstance(value, (list, tuple)):
+            params.extend((key, str(x)) for x in value)
+        elif value is not None:
+            params.append((key, str(value)))
+    return params
+
+
+class AsyncESputnikRequestClient(ESputnikRequestClient):
+    """
+    Client class that sends requests with ``aiohttp``.
+    Verb shortcuts (get, post, put, delete) and ``download``
+    return coroutines.
+
+    Attributes:
+        max_concurrency (int): Max number of requests in flight at once,
+            extra requests wait for a free slot.
+    """
+
+    def __init__(
+            self,
+            api_user: str,
+            api_password: str,
+            host: str,
+            version: int = 1,
+            *args,
+            max_concurrency: int = 100,
+            **kwargs
+    ) -> None:
+        if aiohttp is None:
+            raise ImportError(
+                'aiohttp is required to use AsyncESputnikRequestClient.')
+
+        self.max_concurrency = max_concurrency
+        self._semaphore = None  # type: Optional[asyncio.Semaphore]
+
+        super().__init__(
+            api_user, api_password, host, version, *args, **kwargs)
+
+    def __enter__(self):
+        raise TypeError('Use "async with" instead.')
+
+    async def __aenter__(self) -> 'AsyncESputnikRequestClient':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def create_session(self) -> 'aiohttp.ClientSession':
+        """
+        Creates new session with pooled connector.
+        Must be called from within a running event loop.
+        """
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_connections * self.pool_maxsize,
+            limit_per_host=self.pool_maxsize,
+            force_close=not self.keep_alive
+        )
+        return aiohttp.ClientSession(connector=connector)
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def close(self) -> None:
+        """
+        Closes all pooled connections.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _send(
+        self,
+        method: str,
+        path: str,
+        data: RequestData = None,
+        headers: Dict = None,
+        auth: Tuple = None,
+        file: IO = None,
+        timeout: Timeout = None
+    ) -> Response:
+        """
+        Private method used to send request to the remote REST API server.
+
+        Args:
+            method (str): REST method to use.
+            path (str): Corresponding relative path to send request.
+            data (Dict, optional): Params to send.
+            headers (Dict, optional): Request headers.
+            auth (Tuple, optional): Auth data.
+            file (IO, optional): File to write successful response
+                body to.
+            timeout (Timeout, optional): Timeouts of the call, the ones
+                of client are used where they are not set.
+
+        Returns:
+            Response: requests's response instance.
+
+        Raises:
+            AttributeError: Unsupported method was used.
+            asyncio.TimeoutError: Request timed out, or total timeout
+                of the call has passed.
+        """
+        url = self.routes.url(path)
+
+        if method not in ('get', 'post', 'put', 'delete'):
+            raise AttributeError(f'{method} is not supported')
+
+        if headers is None:
+            headers = {}
+
+        headers.update(self.get_base_headers())
+
+        if auth is None:
+            auth = self.get_auth_data()
+
+        # Streamed body can not be sent twice.
+        retry = None if isinstance(data, Iterator) else self.retry
+        retries = 0
+
+        hooks = self.hooks
+        if hooks and isinstance(data, Iterator):
+            data = CountingIterator(data)
+        network = 0.0
+
+        timeout = self.timeout.override(timeout)
+        deadline = timeout.get_deadline()
+        hedge = self.hedge if method == 'get' and file is None else None
+        timed = hooks or hedge is not None
+
+        while True:
+            if self.rate_limiter is not None:
+                wait = self.rate_limiter.reserve(path)
+                if wait:
+                    await asyncio.sleep(wait)
+
+            started = time.perf_counter() if timed else 0.0
+            try:
+                attempt = timeout.for_attempt(deadline)
+                if attempt is None:
+                    raise asyncio.TimeoutError(
+                        f'Total timeout of {timeout.total} s has passed.')
+                hedge_delay = None
+                if hedge is not None:
+                    hedge_delay = hedge.get_delay(path)
+                if hedge is not None and hedge_delay is not None:
+                    request = self._hedged_request(
+                        hedge, hedge_delay, method, url, data, headers,
+                        auth, attempt, deadline)
+                else:
+                    request = self._request(
+                        method, url, data, headers, auth,
+                        file=file, timeout=attempt)
+                status, response_headers, content = await request
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if hooks:
+                    network += time.perf_counter() - started
+                delay = fit_delay(
+                    retry.get_delay(retries, method, path, error=e)
+                    if retry is not None else None,
+                    deadline
+                )
+                if delay is None:
+                    if hooks:
+                        self._emit(method, path, data, retries, network,
+                                   error=e)
+                    raise
+            else:
+                elapsed = time.perf_counter() - started if timed else 0.0
+                network += elapsed
+                if hedge is not None and status < 500:
+                    hedge.record(path, elapsed)
+                delay = fit_delay(
+                    retry.get_delay(
+                        retries, method, path,
+                        status_code=status,
+                        headers=response_headers
+                    ) if retry is not None else None,
+                    deadline
+                )
+                if delay is None:
+                    break
+
+            retries += 1
+            await asyncio.sleep(delay)
+
+        if isinstance(content, int):
+            size, content = content, b''
+        else:
+            size = len(content)
+
+        if not hooks:
+            return self._build_response(
+                status, response_headers, content, retries)
+
+        self._emit(
+            method, path, data, retries, network,
+            status_code=status,
+            response_bytes=size
+        )
+        return self._build_response(
+            status, response_headers, content, retries,
+            on_parse=partial(self._emit_parse, method, path))
+
+    async def _hedged_request(
+        self,
+        hedge: HedgePolicy,
+        delay: float,
+        method: str,
+        url: str,
+        data,
+        headers: Dict,
+        auth: Tuple,
+        timeout: Timeout,
+        deadline: Optional[float]
+    ) -> Tuple:
+        """
+        Sends request, and its backup if there is no response after
+        delay. Returns the first successful response, the other request
+        is cancelled. Backup gets time left until deadline.
+        """
+        primary = asyncio.ensure_future(self._request(
+            method, url, data, headers, auth, timeout=timeout))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+
+            attempt = timeout.for_attempt(deadline)
+            if attempt is None:
+                return await primary
+            backup = asyncio.ensure_future(self._request(
+                method, url, data, headers, auth, timeout=attempt))
+            pending.add(backup)
+
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        hedge.count(won=task is backup)
+                        return task.result()
+                    error = task.exception()
+
+            hedge.count(won=False)
+            assert error is not None
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        data,
+        headers: Dict,
+        auth: Tuple,
+        file: IO = None,
+        timeout: Timeout = None
+    ) -> Tuple:
+        """
+        Sends single request through the pooled session.
+
+        Returns:
+            Tuple: status code, headers and raw body of the response,
+                or amount of bytes written to ``file`` if it is set
+                and response is successful.
+        """
+        kwargs = {
+            'headers': headers,
+            'auth': aiohttp.BasicAuth(*auth)
+        }  # type: Dict[str, Any]
+
+        # Delete method accepts only path, without extra params
+        if method == 'get':
+            kwargs['params'] = _prepare_params(data)
+        elif isinstance(data, Iterator):
+            kwargs['data'] = _iterate(data)
+        elif method != 'delete':
+            kwargs['data'] = data
+
+        started = time.monotonic()
+        async with self.semaphore:
+            # Session timeouts are kept if the call is not limited.
+            if timeout is not None and any(x is not None for x in timeout):
+                total = timeout.total
+                if total is not None:
+                    # Time spent waiting for the semaphore counts as well.
+                    total -= time.monotonic() - started
+                    if total <= 0:
+                        raise asyncio.TimeoutError()
+                kwargs['timeout'] = aiohttp.ClientTimeout(
+                    total=total,
+                    sock_connect=timeout.connect,
+                    sock_read=timeout.read
+                )
+
+            async with self.session.request(method, url, **kwargs) as response:
+                if file is not None and 200 <= response.status < 300:
+                    content = 0
+                    async for chunk in response.content.iter_chunked(
+                            DOWNLOAD_CHUNK_SIZE):
+                        file.write(chunk)
+                        content += len(chunk)
+                else:
+                    content = await response.read()
+
+        return response.status, response.headers, content
+
+
+class AsyncESputnikAPIAdaptor(ESputnikAPIAdaptor):
+    """
+    Asyncio version of the adaptor.
+    Has the same methods as ``ESputnikAPIAdaptor``, each of them
+    returns awaitable with ``Response``.
+    """
+    request_client_class = AsyncESputnikRequestClient
+
+    def __enter__(self):
+        raise TypeError('Use "async with" instead.')
+
+    async def __aenter__(self) -> 'AsyncESputnikAPIAdaptor':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """
+        Releases connections held by the request client.
+        """
+        await self.client.close()
+
+    async def cached_get(self, name: str, path: str):
+        """
+        Sends GET request or returns its cached successful response.
+        """
+        if self.cache is None:
+            return await self.client.get(path)
+        return await self.cache.get_or_fetch_async(
+            self.cache_key(name), partial(self.client.get, path),
+            is_success)
+
+    async def add_contacts_bulk(
+            self,
+            contacts: Iterable[Dict],
+            data: Dict,
+            batch_size: int = CONTACTS_BATCH_SIZE,
+            workers: int = 4
+    ) -> List[BatchResult]:
+        """
+        Add/update any amount of contacts.
+        Same as ``ESputnikAPIAdaptor.add_contacts_bulk``, but ``workers``
+        batches are sent concurrently as tasks in the running loop.
+        """
+        async def send(index, batch):
+            try:
+                response = await self.add_contacts(dict(data, contacts=batch))
+            except Exception as e:
+                return BatchResult(index, len(batch), None, e)
+            return BatchResult(index, len(batch), response, None)
+
+        batches = enumerate(chunked(contacts, batch_size))
+        pending = {
+            asyncio.ensure_future(send(*x))
+            for x in islice(batches, workers)
+        }
+        results = []  # type: List[BatchResult]
+
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            results.extend(x.result() for x in done)
+            pending.update(
+                asyncio.ensure_future(send(*x))
+                for x in islice(batches, len(done))
+            )
+
+        return sorted(results, key=lambda x: x.index)
+
+    def iter_contacts(
+            self,
+            data: Dict = None,
+            page_size: int = CONTACTS_PAGE_SIZE,
+            prefetch: bool = False
+    ) -> AsyncIterator[Dict]:
+        """
+        Search contacts and iterate over all of them with ``async for``.
+        """
+        def fetch(start):
+            return self.get_contacts(
+                dict(data or {}, start_index=start, max_rows=page_size))
+        return aiter_pages(fetch, page_size, prefetch)
+
+    async def export_contacts(
+            self,
+            sink: Callable[[Dict], None],
+            data: Dict = None,
+            page_size: int = CONTACTS_PAGE_SIZE,
+            workers: int = 8
+    ) -> int:
+        """
+        Search contacts and pass all of them to sink in order,
+        see ``ESputnikAPIAdaptor.export_contacts``.
+        """
+        def fetch(start):
+            return self.get_contacts(
+                dict(data or {}, start_index=start, max_rows=page_size))
+        return await aexport_pages(fetch, sink, page_size, workers)
+
+    def iter_group_contacts(
+            self,
+            group_id,
+            page_size: int = CONTACTS_PAGE_SIZE,
+            prefetch: bool = False
+    ) -> AsyncIterator[Dict]:
+        """
+        Iterate over all contacts of segment with ``async for``.
+        """
+        def fetch(start):
+            return self.group_contacts(
+                group_id, {'start_index': start, 'max_rows': page_size})
+        return aiter_pages(fetch, page_size, prefetch)
+
+    def status_coalescer(self, **options) -> AsyncMessageStatusCoalescer:
+        """
+        Returns coalescer that batches concurrent single message
+        status lookups of the event loop.
+        """
+        return AsyncMessageStatusCoalescer(self, **options)
+
+    def event_dispatcher(self, **options):
+        """
+        Returns dispatcher that sends events in background tasks.
+        Must be called from within a running event loop.
+
+        Args:
+            **options: options of ``AsyncEventDispatcher``.
+        """
+        return AsyncEventDispatcher(self, **options)
+
+    async def orders_bulk(self, orders: Iterable[Dict], **options):
+        """
+        Add any amount of orders.
+        Same as ``ESputnikAPIAdaptor.orders_bulk``, but ``workers``
+        batches are sent concurrently as tasks in the running loop.
+        Orders are validated and packed in the default executor,
+        so the loop is not blocked meanwhile.
+        """
+        from esputnik.orders import OrderPipeline
+
+        pipeline = OrderPipeline(self, **options)
+        quarantine = []  # type: List[Any]
+        batches = enumerate(
+            pipeline.pack(pipeline.validate(orders), quarantine))
+        loop = asyncio.get_event_loop()
+
+        async def send(index, batch):
+            ids, body = batch
+            try:
+                response = await self.client.post('orders', body)
+            except Exception as e:
+                return index, (ids, BatchResult(None, len(ids), None, e))
+            return index, (ids, BatchResult(None, len(ids), response, None))
+
+        async def submit(count):
+            for _ in range(count):
+                batch = await loop.run_in_executor(None, next, batches, None)
+                if batch is None:
+                    return
+                pending.add(asyncio.ensure_future(send(*batch)))
+
+        pending = set()  # type: Set[asyncio.Future]
+        results = []  # type: List[Any]
+        await submit(pipeline.workers)
+
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            results.extend(x.result() for x in done)
+            await submit(len(done))
+
+        return pipeline.summarize(results, quarantine)
+
+
+class AsyncEventDispatcher:
+    """
+    Sends events in background tasks of the running loop,
+    see ``EventDispatcher``.
+
+    API accepts one event per request, so events are not batched:
+    every task sends queued events one by one. 'spill' policy is not
+    supported, writing to file would block the loop.
+
+    Attributes:
+        adaptor (AsyncESputnikAPIAdaptor): Adaptor to send events with.
+        maxsize (int): Max amount of queued events.
+        workers (int): Amount of sending tasks.
+        policy (str): What to do when queue is full:
+            'block' - wait for free place (up to ``block_timeout``),
+            'drop' - discard event.
+        on_error (Callable, optional): Called with body and response or
+            exception of every event that failed to send. Exceptions it
+            raises are counted in ``callback_errors`` and ignored.
+    """
+
+    def __init__(
+            self,
+            adaptor,
+            maxsize: int = 10000,
+            workers: int = 4,
+            policy: str = 'block',
+            block_timeout: float = None,
+            on_error: Callable = None
+    ) -> None:
+        if policy not in ('block', 'drop'):
+            raise IncorrectDataError(
+                code='policy',
+                message="Policy must be one of ('block', 'drop')."
+            )
+
+        self.adaptor = adaptor
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.on_error = on_error
+
+        self.sent = 0
+        self.failed = 0
+        self.callback_errors = 0
+        self.dropped = 0
+
+        self._queue = asyncio.Queue(maxsize)  # type: asyncio.Queue
+        self._closed = False
+        # Set when the last event() in progress returns.
+        self._idle = asyncio.Event()
+        self._putting = 0
+        self._workers = [
+            asyncio.ensure_future(self._work()) for _ in range(workers)
+        ]
+
+    async def __aenter__(self) -> 'AsyncEventDispatcher':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def event(self, data: Dict) -> bool:
+        """
+        Queues event, see ``ESputnikAPIAdaptor.event``.
+
+        Returns:
+            bool: False if event was dropped.
+
+        Raises:
+            DataError: Event data is invalid.
+            asyncio.TimeoutError: Queue is full and ``block_timeout``
+                has passed.
+            RuntimeError: Dispatcher is closed.
+        """
+        if self._closed:
+            raise RuntimeError('Dispatcher is closed.')
+
+        body = self.adaptor.dumps(data, templates.prepare_event)
+
+        if self.policy == 'drop':
+            try:
+                self._queue.put_nowait(body)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                return False
+            return True
+
+        # close() waits for events in progress, so none of them is put
+        # behind the stop markers and lost.
+        self._putting += 1
+        try:
+            await asyncio.wait_for(
+                self._queue.put(body), self.block_timeout)
+        finally:
+            self._putting -= 1
+            if not self._putting:
+                self._idle.set()
+        return True
+
+    async def _work(self) -> None:
+        while True:
+            body = await self._queue.get()
+            if body is _STOP:
+                return
+            await self._send(body)
+
+    async def _send(self, body: bytes) -> None:
+        try:
+            response = await self.adaptor.client.post('event', body)
+            if is_success(response):
+                self.sent += 1
+                return
+            error = response
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = e
+
+        self.failed += 1
+        if self.on_error is not None:
+            try:
+                self.on_error(body, error)
+            except Exception:
+                self.callback_errors += 1
+
+    def stats(self) -> Dict:
+        """
+        Returns counters of the dispatcher.
+        """
+        return {
+            'queue_depth': self._queue.qsize(),
+            'sent': self.sent,
+            'failed': self.failed,
+            'callback_errors': self.callback_errors,
+            'dropped': self.dropped,
+        }
+
+    async def close(self) -> None:
+        """
+        Stops accepting events, sends everything queued
+        and waits for tasks to finish.
+        """
+        if self._closed:
+            return
+        self._closed = True
+
+        if self._putting:
+            self._idle.clear()
+            await self._idle.wait()
+
+        for _ in self._workers:
+            await self._queue.put(_STOP)
+        await asyncio.gather(*self._workers)
@@ -0,0 +1,219 @@
+"""
+Response cache for read-only endpoints.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+from esputnik.utils import lazy_import
+
+asyncio = lazy_import('asyncio')
+
+__all__ = (
+    'TTLCache',
+)
+
+
+class _Call:
+    """
+    Fetch in progress, shared by all callers of the same key.
+    """
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self) -> Any:
+        self.event.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class TTLCache:
+    """
+    Size bounded LRU cache with expiration.
+
+    Concurrent callers of a missing key wait for a single fetch
+    instead of sending the same request at once.
+
+    Cached values are shared by all callers and returned as is, they
+    must be treated as read-only. Copy the data before changing it.
+
+    Attributes:
+        ttl (float): Default lifetime of entries in seconds.
+        ttls (Dict[str, float]): Lifetime by method name,
+            first item of the key.
+        maxsize (int): Max amount of entries, least recently used ones
+            are evicted.
+        hits (int): Amount of lookups served from cache.
+        misses (int): Amount of lookups that required fetching.
+    """
+
+    def __init__(
+            self,
+            ttl: float = 300,
+            ttls: Dict[str, float] = None,
+            maxsize: int = 128
+    ) -> None:
+        self.ttl = ttl
+        self.ttls = ttls or {}
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+        self._data = OrderedDict()  # type: OrderedDict
+        self._calls = {}  # type: Dict[Hashable, Any]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_ttl(self, key: Hashable) -> float:
+        # Keys are method names, optionally paired with the account.
+        name = key[0] if isinstance(key, tuple) else key
+        if not isinstance(name, str):
+            return self.ttl
+        return self.ttls.get(name, self.ttl)
+
+    def _lookup(self, key: Hashable):
+        """
+        Returns cached value and flag of hit. Must be called under lock.
+        """
+        entry = self._data.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value, True
+            del self._data[key]
+        return None, False
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        """
+        Puts value into cache. Must be called under lock.
+        """
+        self._data[key] = (time.monotonic() + self.get_ttl(key), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get_or_fetch(
+            self,
+            key: Hashable,
+            fetch: Callable,
+            cacheable: Callable[[Any], bool] = None
+    ) -> Any:
+        """
+        Returns cached value or the result of ``fetch``.
+
+        Args:
+            key (Hashable): cache key, tuple starting with method name
+                and including everything the value depends on, e.g.
+                the account it was fetched for.
+            fetch (Callable): function without arguments to get value.
+            cacheable (Callable, optional): predicate to check whether
+                fetched value may be stored, e.g. it is not an error.
+        """
+        with self._lock:
+            value, hit = self._lookup(key)
+            if hit:
+                return value
+
+            call = self._calls.get(key)
+            owner = call is None
+            if call is None:
+                self.misses += 1
+                call = self._calls[key] = _Call()
+
+        if not owner:
+            return call.wait()
+
+        try:
+            call.result = fetch()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call.error is None and (
+                        cacheable is None or cacheable(call.result)):
+                    self._store(key, call.result)
+            call.event.set()
+
+        return call.result
+
+    async def get_or_fetch_async(
+            self,
+            key: Hashable,
+            fetch: Callable,
+            cacheable: Callable[[Any], bool] = None
+    ) -> Any:
+        """
+        Same as ``get_or_fetch``, but ``fetch`` returns awaitable.
+        Should be used from a single event loop.
+        """
+        with self._lock:
+            value, hit = self._lookup(key)
+            if hit:
+                return value
+
+            future = self._calls.get(key)
+            if future is not None:
+                owner = False
+            else:
+                owner = True
+                self.misses += 1
+                future = self._calls[key] = \
+                    asyncio.get_event_loop().create_future()
+
+        if not owner:
+            return await asyncio.shield(future)
+
+        try:
+            result = await fetch()
+        except BaseException as e:
+            if isinstance(e, Exception):
+                future.set_exception(e)
+                # Retrieve it, so it is not reported as never retrieved.
+                future.exception()
+            else:
+                future.cancel()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if not future.cancelled() and future.exception() is None \
+                        and (cacheable is None or cacheable(future.result())):
+                    self._store(key, future.result())
+
+        return result
+
+    def invalidate(self, name: str = None) -> None:
+        """
+        Removes entries of given method or all entries.
+
+        Args:
+            name (str, optional): method name, first item of the key.
+        """
+        with self._lock:
+            if name is None:
+                self._data.clear()
+                return
+            for key in list(self._data):
+                if (key[0] if isinstance(key, tuple) else key) == name:
+                    del self._data[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._data)
+        }
@@ -1,20 +1,175 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
 from functools import partial
-from typing import Dict, Tuple, NamedTuple
-
-import requests
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Tuple,
+    Union
+)
 
 from esputnik.exceptions import InvalidAuthDataError
+from esputnik.instrumentation import (
+    CountingIterator,
+    Hook,
+    RequestMetrics,
+    endpoint_name
+)
+from esputnik.latency import HedgePolicy, Timeout, fit_delay
+from esputnik.ratelimit import TokenBucketLimiter
+from esputnik.retry import RetryPolicy
+from esputnik.routes import RouteTable
+from esputnik.serializers import JSONSerializer, get_serializer
+from esputnik.utils import lazy_import
+
+if TYPE_CHECKING:
+    from requests.adapters import HTTPAdapter
+
+# Imported on first request, it is the slowest part of package import.
+requests = lazy_import('requests')
 
 __all__ = (
     'Response',
-    'ESputnikRequestClient'
+    'ESputnikRequestClient',
+    'is_success'
 )
 
 
-Response = NamedTuple('Response', [
-    ('status_code', int),
-    ('data', Dict)
-])
+# Query params of GET, or body: dict, serialized one, or bytes chunks.
+RequestData = Union[Dict, bytes, str, Iterator[bytes]]
+
+# Size of chunks of body written to file by ``download``.
+DOWNLOAD_CHUNK_SIZE = 65536
+
+_NOT_PARSED = object()
+
+
+def _discard(future: Future) -> None:
+    """
+    Releases connection of response that lost the race.
+    """
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class Response:
+    """
+    Response of the API. Raw body is kept as is and decoded from JSON
+    on first access to ``data``, so bodies that are never read are never
+    parsed. Body that is not JSON is returned by ``data`` as is.
+
+    Behaves as a named tuple of ``status_code`` and ``data``, as it did
+    before: it can be unpacked, indexed and compared to tuples. Other
+    fields are attributes only.
+
+    Attributes:
+        status_code (int): HTTP status code.
+        retries (int): Amount of times the request was resent.
+        headers (Dict): Headers of the response, case insensitive.
+        content (bytes): Raw body, empty if it was written to file.
+        serializer (JSONSerializer): Backend to decode body with.
+        on_parse (Callable, optional): Called with seconds spent decoding
+            the body, when it is decoded.
+    """
+    __slots__ = (
+        'status_code',
+        'retries',
+        'headers',
+        'content',
+        'serializer',
+        'on_parse',
+        '_data'
+    )
+    _fields = ('status_code', 'data')
+
+    def __init__(
+            self,
+            status_code: int,
+            data: Any = _NOT_PARSED,
+            retries: int = 0,
+            headers: Dict = None,
+            content: bytes = b'',
+            serializer: JSONSerializer = None,
+            on_parse: Callable[[float], None] = None
+    ) -> None:
+        self.status_code = status_code
+        self.retries = retries
+        self.headers = headers
+        self.content = content
+        self.serializer = serializer
+        self.on_parse = on_parse
+        # Slot is left empty until body is decoded.
+        if data is not _NOT_PARSED:
+            self._data = data
+
+    @property
+    def data(self) -> Any:
+        try:
+            return self._data
+        except AttributeError:
+            pass
+        on_parse = self.on_parse
+        started = time.perf_counter() if on_parse is not None else 0.0
+        try:
+            data = (self.serializer or JSONSerializer()).loads(self.content)
+        except Exception:
+            data = self.content
+        self._data = data
+        if on_parse is not None:
+            on_parse(time.perf_counter() - started)
+        return data
+
+    def __iter__(self) -> Iterator:
+        return iter((self.status_code, self.data))
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __getitem__(self, index):
+        return tuple(self)[index]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (Response, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self) -> str:
+        return (
+            f'{self.__class__.__name__}(status_code={self.status_code!r}, '
+            f'data={self.data!r})'
+        )
+
+    def _asdict(self) -> Dict:
+        return dict(zip(self._fields, self))
+
+    def _replace(self, **kwargs) -> 'Response':
+        fields = {
+            'status_code': self.status_code,
+            'retries': self.retries,
+            'headers': self.headers,
+            'content': self.content,
+            'serializer': self.serializer,
+            'on_parse': self.on_parse
+        }  # type: Dict[str, Any]
+        if hasattr(self, '_data'):
+            fields['data'] = self._data
+        fields.update(kwargs)
+        return self.__class__(**fields)
+
+
+def is_success(response: Response) -> bool:
+    """
+    Returns True if the server accepted the request, status is 2xx.
+    """
+    return 200 <= response.status_code < 300
 
 
 class ESputnikRequestClient:
@@ -22,9 +177,35 @@ class ESputnikRequestClient:
     Client class that implements basic REST methods to make requests to the
     server.
 
+    Requests are sent through a single ``requests.Session`` that is created
+    on first use and keeps connections to the host alive between calls.
+
     Attributes:
         api_user (str): Unique API user passed on init.
         api_password (str): Unique API password passed on init.
+        pool_connections (int): Number of per-host connection pools to cache.
+        pool_maxsize (int): Max number of connections kept open per host.
+        pool_block (bool): Block when no free connection is available
+            in the pool instead of opening a throwaway one.
+        keep_alive (bool): Reuse connections between requests.
+        retry (RetryPolicy, optional): Policy to resend failed requests,
+            requests are sent once if not set.
+        rate_limiter (TokenBucketLimiter, optional): Limiter to wait on
+            before every request, may be shared by many clients.
+        serializer (JSONSerializer): JSON backend for bodies and responses,
+            the fastest installed one by default.
+        hooks (Tuple[Hook]): Hooks to get metrics of every request,
+            nothing is measured without them.
+        adapter (HTTPAdapter, optional): Connection pool shared with
+            other clients, pool options are ignored then. It is not
+            closed with the client.
+        timeout (Timeout): Default timeouts of calls, nothing is limited
+            if not set. Timeouts passed to a call override them.
+        hedge (HedgePolicy, optional): Policy to send backups of slow
+            GET requests, they are not hedged if not set.
+        base_url (str): Url of the API version, built from host
+            and version on init.
+        routes (RouteTable): Urls of the API paths, built once.
     """
 
     def __init__(
@@ -34,6 +215,17 @@ class ESputnikRequestClient:
             host: str,
             version: int = 1,
             *args,
+            pool_connections: int = 10,
+            pool_maxsize: int = 10,
+            pool_block: bool = False,
+            keep_alive: bool = True,
+            retry: RetryPolicy = None,
+            rate_limiter: TokenBucketLimiter = None,
+            serializer: JSONSerializer = None,
+            hooks: Iterable[Hook] = (),
+            adapter: 'HTTPAdapter' = None,
+            timeout: Timeout = None,
+            hedge: HedgePolicy = None,
             **kwargs
     ) -> None:
         self.api_user = api_user
@@ -53,16 +245,162 @@ class ESputnikRequestClient:
 
         self.host = host
         self.version = version
+        self.base_url = f'{host}v{version}/'
+        self.routes = RouteTable(self.base_url)
+
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.retry = retry
+        self.rate_limiter = rate_limiter
+        self.serializer = serializer or get_serializer()
+        self.hooks = tuple(hooks or ())
+        self.adapter = adapter
+        self.timeout = timeout or Timeout()
+        self.hedge = hedge
+        # Session of requests, or of aiohttp in the async client.
+        self._session = None  # type: Any
+        self._hedge_executor = None  # type: Optional[ThreadPoolExecutor]
 
         super().__init__(*args, **kwargs)
 
-    def __getattribute__(self, name: str):
+    def __enter__(self) -> 'ESputnikRequestClient':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # Shortcuts to send request on remote server. They are plain methods,
+    # so other attributes are looked up natively, and they call
+    # ``self._send`` to respect its overrides in subclasses.
+    def get(
+        self,
+        path: str,
+        data: RequestData = None,
+        headers: Dict = None,
+        auth: Tuple = None,
+        timeout: Timeout = None
+    ):
+        return self._send('get', path, data, headers, auth, timeout=timeout)
+
+    def post(
+        self,
+        path: str,
+        data: RequestData = None,
+        headers: Dict = None,
+        auth: Tuple = None,
+        timeout: Timeout = None
+    ):
+        return self._send('post', path, data, headers, auth, timeout=timeout)
+
+    def put(
+        self,
+        path: str,
+        data: RequestData = None,
+        headers: Dict = None,
+        auth: Tuple = None,
+        timeout: Timeout = None
+    ):
+        return self._send('put', path, data, headers, auth, timeout=timeout)
+
+    def delete(
+        self,
+        path: str,
+        data: RequestData = None,
+        headers: Dict = None,
+        auth: Tuple = None,
+        timeout: Timeout = None
+    ):
+        return self._send('delete', path, data, headers, auth, timeout=timeout)
+
+    def download(
+        self,
+        path: str,
+        file: IO,
+        data: Dict = None,
+        headers: Dict = None,
+        auth: Tuple = None,
+        timeout: Timeout = None
+    ):
         """
-        Shortcut to send request on remote server.
+        Sends GET request and writes successful response body to file
+        in chunks, without keeping it in memory.
+        Body of unsuccessful response is kept in the returned response.
+
+        Args:
+            path (str): Corresponding relative path to send request.
+            file (IO): Binary file opened for writing.
+            data (Dict, optional): Query params.
+            headers (Dict, optional): Request headers.
+            auth (Tuple, optional): Auth data.
+            timeout (Timeout, optional): Timeouts of the call.
+
+        Returns:
+            Response: response with empty content if it is successful.
         """
-        if name in ['get', 'post', 'put', 'delete']:
-            return partial(self._send, name)
-        return object.__getattribute__(self, name)
+        return self._send(
+            'get', path, data, headers, auth, file=file, timeout=timeout)
+
+    @property
+    def session(self):
+        """
+        Returns pooled session, creating it on first access.
+
+        Returns:
+            requests.Session: session created by ``create_session``.
+        """
+        if self._session is None:
+            self._session = self.create_session()
+        return self._session
+
+    @property
+    def hedge_executor(self) -> ThreadPoolExecutor:
+        """
+        Returns pool of threads to send hedged requests from,
+        creating it on first access.
+        """
+        if self._hedge_executor is None:
+            self._hedge_executor = ThreadPoolExecutor(
+                max_workers=max(2, self.pool_maxsize * 2))
+        return self._hedge_executor
+
+    def create_session(self):
+        """
+        Creates new session with connection pool mounted for
+        http and https schemes, the shared one if it is set.
+
+        Returns:
+            requests.Session: configured session.
+        """
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = self.adapter or HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+
+        return session
+
+    def close(self):
+        """
+        Closes all pooled connections, except the ones of shared pool.
+        Client can still be used after that, new session will be created.
+        """
+        if self._session is not None:
+            if self.adapter is None:
+                self._session.close()
+            self._session = None
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
+            self._hedge_executor = None
 
     def construct_url(self, *args) -> str:
         """
@@ -74,14 +412,12 @@ class ESputnikRequestClient:
         Returns:
             str: URL
         """
-        url = f'{self.host}v{self.version}/'
-
         if not args:
-            return url
+            return self.base_url
 
         joined_args = '/'.join([x.strip('/') for x in args]) + '/'
 
-        return f'{url}{joined_args}'
+        return f'{self.base_url}{joined_args}'
 
     def get_auth_data(self) -> Tuple:
         return self.api_user, self.api_password
@@ -97,31 +433,38 @@ class ESputnikRequestClient:
         self,
         method: str,
         path: str,
-        data: Dict = None,
+        data: RequestData = None,
         headers: Dict = None,
-        auth: Tuple = None
-    ) -> Response:
+        auth: Tuple = None,
+        file: IO = None,
+        timeout: Timeout = None
+    ):
         """
         Private method used to send request to the remote REST API server.
 
         Args:
             method (str): REST method to use.
             path (str): Corresponding relative path to send request.
-            data (Dict, optional): Params to send.
+            data (Dict, optional): Params to send, body can be
+                a string or an iterator over bytes chunks.
             headers (Dict, optional): Request headers.
             auth (Tuple, optional): Auth data.
+            file (IO, optional): File to write successful response
+                body to.
+            timeout (Timeout, optional): Timeouts of the call, the ones
+                of client are used where they are not set.
 
         Returns:
             Response: requests's response instance.
 
         Raises:
             AttributeError: Unsupported method was used.
+            requests.Timeout: Request timed out, or total timeout
+                of the call has passed.
         """
-        url = self.construct_url(path)
-
-        request_method = getattr(requests, method, None)
+        url = self.routes.url(path)
 
-        if not request_method:
+        if method not in ('get', 'post', 'put', 'delete'):
             raise AttributeError(f'{method} is not supported')
 
         if headers is None:
@@ -132,21 +475,263 @@ class ESputnikRequestClient:
         if auth is None:
             auth = self.get_auth_data()
 
-        # Delete method accepts only path, without extra params
-        if method == 'delete':
-            response = request_method(
-                url=url, headers=headers, auth=auth)
+        # Streamed body can not be sent twice.
+        retry = None if isinstance(data, Iterator) else self.retry
+        retries = 0
+
+        hooks = self.hooks
+        if hooks and isinstance(data, Iterator):
+            data = CountingIterator(data)
+        network = 0.0
+
+        timeout = self.timeout.override(timeout)
+        deadline = timeout.get_deadline()
+        hedge = self.hedge if method == 'get' and file is None else None
+        timed = hooks or hedge is not None
+
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(path)
+
+            started = time.perf_counter() if timed else 0.0
+            try:
+                attempt = timeout.for_attempt(deadline)
+                if attempt is None:
+                    raise requests.Timeout(
+                        f'Total timeout of {timeout.total} s has passed.')
+                hedge_delay = None
+                if hedge is not None:
+                    hedge_delay = hedge.get_delay(path)
+                if hedge is not None and hedge_delay is not None:
+                    response = self._hedged_request(
+                        hedge, hedge_delay, method, url, data, headers,
+                        auth, attempt, deadline)
+                else:
+                    response = self._request(
+                        method, url, data, headers, auth,
+                        file=file, timeout=attempt)
+            except requests.RequestException as e:
+                if hooks:
+                    network += time.perf_counter() - started
+                delay = fit_delay(
+                    retry.get_delay(retries, method, path, error=e)
+                    if retry is not None else None,
+                    deadline
+                )
+                if delay is None:
+                    if hooks:
+                        self._emit(method, path, data, retries, network,
+                                   error=e)
+                    raise
+            else:
+                elapsed = time.perf_counter() - started if timed else 0.0
+                network += elapsed
+                if hedge is not None and response.status_code < 500:
+                    hedge.record(path, elapsed)
+                delay = fit_delay(
+                    retry.get_delay(
+                        retries, method, path,
+                        status_code=response.status_code,
+                        headers=response.headers
+                    ) if retry is not None else None,
+                    deadline
+                )
+                if delay is None:
+                    break
+                if file is not None:
+                    # Release connection of the unread streamed body.
+                    response.close()
+
+            retries += 1
+            time.sleep(delay)
+
+        if file is not None and 200 <= response.status_code < 300:
+            started = time.perf_counter() if hooks else 0.0
+            size = 0
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                file.write(chunk)
+                size += len(chunk)
+            if hooks:
+                network += time.perf_counter() - started
+            content = b''
+        else:
+            content = response.content
+            size = len(content)
+
+        if not hooks:
+            return self._build_response(
+                response.status_code, response.headers, content, retries)
+
+        self._emit(
+            method, path, data, retries, network,
+            status_code=response.status_code,
+            response_bytes=size
+        )
+        return self._build_response(
+            response.status_code, response.headers, content, retries,
+            on_parse=partial(self._emit_parse, method, path))
+
+    def _build_response(
+        self,
+        status_code: int,
+        headers: Dict,
+        content: bytes,
+        retries: int,
+        on_parse: Callable[[float], None] = None
+    ) -> Response:
+        """
+        Returns response that decodes body on first access to its data.
+        """
+        return Response(
+            status_code=status_code,
+            retries=retries,
+            headers=headers,
+            content=content,
+            serializer=self.serializer,
+            on_parse=on_parse
+        )
+
+    def _emit(
+        self,
+        method: str,
+        path: str,
+        data,
+        retries: int,
+        network: float,
+        status_code: Optional[int] = None,
+        response_bytes: int = 0,
+        error: Exception = None
+    ) -> None:
+        """
+        Passes metrics of finished request to hooks.
+        """
+        if isinstance(data, CountingIterator):
+            request_bytes = data.size
+        elif isinstance(data, (bytes, str)):
+            request_bytes = len(data)
         else:
-            response = request_method(
-                url, data, headers=headers, auth=auth)
+            request_bytes = 0
+
+        metrics = RequestMetrics(
+            method=method,
+            path=path,
+            endpoint=endpoint_name(path),
+            status_code=status_code,
+            retries=retries,
+            transform=getattr(data, 'transform', 0.0),
+            serialize=getattr(data, 'serialize', 0.0),
+            network=network,
+            request_bytes=request_bytes,
+            response_bytes=response_bytes,
+            error=error
+        )
+        for hook in self.hooks:
+            hook.on_request(metrics)
+
+    def _emit_parse(self, method: str, path: str, seconds: float) -> None:
+        """
+        Passes time spent decoding response body to hooks.
+        """
+        endpoint = endpoint_name(path)
+        for hook in self.hooks:
+            hook.on_parse(method, endpoint, seconds)
+
+    def _hedged_request(
+        self,
+        hedge: HedgePolicy,
+        delay: float,
+        method: str,
+        url: str,
+        data,
+        headers: Dict,
+        auth: Tuple,
+        timeout: Timeout,
+        deadline: Optional[float]
+    ):
+        """
+        Sends request, and its backup if there is no response after
+        delay. Returns the first successful response, the other one
+        is discarded. Backup gets time left until deadline.
 
+        Returns:
+            requests.Response: response of the session.
+        """
+        executor = self.hedge_executor
         try:
-            return Response(
-                status_code=response.status_code,
-                data=response.json()
-            )
-        except Exception:
-            return Response(
-                status_code=response.status_code,
-                data=response.content
+            primary = executor.submit(
+                self._request, method, url, data, headers, auth,
+                timeout=timeout)
+        except RuntimeError:
+            # Client is closed by another thread, e.g. evicted
+            # from the registry, request is sent without backup.
+            return self._request(
+                method, url, data, headers, auth, timeout=timeout)
+        done, _ = wait((primary,), timeout=delay)
+        if done:
+            return primary.result()
+
+        attempt = timeout.for_attempt(deadline)
+        if attempt is None:
+            return primary.result()
+        try:
+            backup = executor.submit(
+                self._request, method, url, data, headers, auth,
+                timeout=attempt)
+        except RuntimeError:
+            return primary.result()
+
+        error = None
+        for future in as_completed((primary, backup)):
+            try:
+                response = future.result()
+            except requests.RequestException as e:
+                error = e
+                continue
+            (backup if future is primary else primary).add_done_callback(
+                _discard)
+            hedge.count(won=future is backup)
+            return response
+
+        hedge.count(won=False)
+        assert error is not None
+        raise error
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        data,
+        headers: Dict,
+        auth: Tuple,
+        file: IO = None,
+        timeout: Timeout = None
+    ):
+        """
+        Sends single request through the pooled session.
+        Body of the response is not read if ``file`` is set,
+        it is written there by the caller.
+
+        Returns:
+            requests.Response: response of the session.
+        """
+        # Unlike a pair of connect and read timeouts, urllib3 timeout
+        # caps both of them together by total time of the attempt.
+        limits = None
+        if timeout is not None:
+            limits = requests.adapters.TimeoutSauce(
+                connect=timeout.connect,
+                read=timeout.read,
+                total=timeout.total
             )
+
+        # Delete method accepts only path, without extra params
+        if method == 'delete':
+            return self.session.delete(
+                url=url, headers=headers, auth=auth, timeout=limits)
+        elif method == 'get':
+            return self.session.get(
+                url, params=data, headers=headers, auth=auth,
+                stream=file is not None, timeout=limits)
+        return self.session.request(
+            method, url, data=data, headers=headers, auth=auth,
+            timeout=limits)
@@ -0,0 +1,208 @@
+"""
+Coalescing of single message status lookups into multi-id requests.
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+from esputnik.client import Response
+from esputnik.exceptions import ResponseError
+from esputnik.utils import lazy_import
+
+if TYPE_CHECKING:
+    import asyncio
+else:
+    asyncio = lazy_import('asyncio')
+
+__all__ = (
+    'MessageStatusCoalescer',
+    'AsyncMessageStatusCoalescer'
+)
+
+
+def _split_ids(ids: Iterable[str], max_ids: int, max_length: int) -> List:
+    """
+    Splits unique ids into groups that fit into one request:
+    not more than ``max_ids`` and ``max_length`` chars of query string.
+    """
+    groups = []
+    group = []  # type: List[str]
+    length = 0
+
+    for id_ in dict.fromkeys(ids):
+        size = len('ids=') + len(id_) + 1
+        if group and (len(group) >= max_ids or length + size > max_length):
+            groups.append(group)
+            group, length = [], 0
+        group.append(id_)
+        length += size
+
+    if group:
+        groups.append(group)
+    return groups
+
+
+def _parse_statuses(response: Response) -> Dict[str, Dict]:
+    """
+    Returns statuses from response by message id.
+
+    Raises:
+        ResponseError: Server responded with error.
+    """
+    if not 200 <= response.status_code < 300:
+        raise ResponseError(
+            code=response.status_code,
+            message=f'Failed to get statuses: {response.data!r}',
+            response=response
+        )
+    data = response.data
+    if isinstance(data, dict):
+        data = data.get('results') or []
+    return {
+        str(x.get('id')): x
+        for x in data or ()
+        if isinstance(x, dict)
+    }
+
+
+class _Coalescer:
+    """
+    Attributes:
+        adaptor (ESputnikAPIAdaptor): Adaptor to send requests with.
+        window (float): Seconds to collect lookups before sending request.
+        max_ids (int): Max amount of ids in one request.
+        max_length (int): Max length of ids query string, to fit
+            url length limits of servers and proxies.
+    """
+
+    def __init__(
+            self,
+            adaptor,
+            window: float = 0.01,
+            max_ids: int = 100,
+            max_length: int = 1800
+    ) -> None:
+        self.adaptor = adaptor
+        self.window = window
+        self.max_ids = max_ids
+        self.max_length = max_length
+        self.requests = 0
+        self.lookups = 0
+
+
+class MessageStatusCoalescer(_Coalescer):
+    """
+    Collects ``status`` calls from many threads during ``window`` and
+    sends one ``message_status`` request per group of ids.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+        self._pending = {}  # type: Dict[str, List[Future]]
+        self._leader = False
+
+    def status(self, message_id: str, timeout: float = None) -> Optional[Dict]:
+        """
+        Returns status of the message, None if server does not know it.
+
+        Raises:
+            ResponseError: Server responded with error.
+        """
+        future = Future()  # type: Future
+
+        with self._lock:
+            self.lookups += 1
+            self._pending.setdefault(str(message_id), []).append(future)
+            leader = not self._leader
+            self._leader = True
+            batch = None
+            if len(self._pending) >= self.max_ids:
+                batch, self._pending = self._pending, {}
+
+        if batch is not None:
+            self._fetch(batch)
+
+        if leader:
+            time.sleep(self.window)
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._leader = False
+            self._fetch(batch)
+
+        return future.result(timeout)
+
+    def _fetch(self, batch: Dict[str, List[Future]]) -> None:
+        for ids in _split_ids(batch, self.max_ids, self.max_length):
+            with self._lock:
+                self.requests += 1
+            try:
+                statuses = _parse_statuses(self.adaptor.message_status(ids))
+            except Exception as e:
+                for id_ in ids:
+                    for future in batch[id_]:
+                        future.set_exception(e)
+                continue
+
+            for id_ in ids:
+                for future in batch[id_]:
+                    future.set_result(statuses.get(id_))
+
+
+class AsyncMessageStatusCoalescer(_Coalescer):
+    """
+    Same as ``MessageStatusCoalescer`` for ``AsyncESputnikAPIAdaptor``,
+    lookups are collected from tasks of one event loop.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._pending = {}  # type: Dict[str, List[asyncio.Future]]
+        self._handle = None  # type: Optional[asyncio.TimerHandle]
+
+    async def status(self, message_id: str) -> Optional[Dict]:
+        """
+        Returns status of the message, None if server does not know it.
+
+        Raises:
+            ResponseError: Server responded with error.
+        """
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+
+        self.lookups += 1
+        self._pending.setdefault(str(message_id), []).append(future)
+
+        if len(self._pending) >= self.max_ids:
+            self._flush()
+        elif self._handle is None:
+            self._handle = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        batch, self._pending = self._pending, {}
+        for ids in _split_ids(batch, self.max_ids, self.max_length):
+            asyncio.ensure_future(self._fetch(ids, batch))
+
+    async def _fetch(self, ids: List[str], batch: Dict) -> None:
+        try:
+            self.requests += 1
+            response = await self.adaptor.message_status(ids)
+            statuses = _parse_statuses(response)
+        except Exception as e:
+            for id_ in ids:
+                for future in batch[id_]:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for id_ in ids:
+            for future in batch[id_]:
+                if not future.done():
+                    future.set_result(statuses.get(id_))
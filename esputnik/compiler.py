@@ -0,0 +1,192 @@
+"""
+Compiles trafaret templates into plain python functions.
+
+Generated function walks the data the same way ``template.transform`` does,
+but with checks for the common case (exact ``str``, ``int``, ``float``,
+``list`` and ``dict`` values) inlined. Any value that is not trivially
+valid is passed to the original trafaret, and if validation fails the
+whole data is transformed by the template again, so results and errors
+are exactly the same as of ``template.transform``.
+"""
+
+from collections.abc import Mapping
+from itertools import count
+from typing import Callable, Dict, List
+
+from trafaret import (
+    Any as AnyTrafaret, Bool, DataError, Dict as DictTrafaret, Enum, Float,
+    Int, Key, List as ListTrafaret, String
+)
+
+__all__ = (
+    'compile_template',
+)
+
+
+# Trafaret's marker of a key without default value.
+_EMPTY = Key('_').default
+
+
+class _Compiler:
+    """
+    Generates source of functions for Dict and List trafarets.
+    Other trafarets are checked inline or called as is.
+    """
+
+    def __init__(self) -> None:
+        self.namespace = {'Mapping': Mapping}  # type: Dict
+        self.functions = []  # type: List[str]
+        self._ids = count()
+
+    def bind(self, prefix: str, obj) -> str:
+        """
+        Puts object into namespace of generated code, returns its name.
+        """
+        name = f'{prefix}{next(self._ids)}'
+        self.namespace[name] = obj
+        return name
+
+    def compile(self, trafaret) -> Callable:
+        name = self.function(trafaret)
+        source = '\n\n'.join(self.functions)
+        code = compile(source, f'<compiled {name}>', 'exec')
+        exec(code, self.namespace)  # nosec
+        return self.namespace[name]
+
+    def function(self, trafaret) -> str:
+        if self.is_plain_dict(trafaret):
+            return self.dict_function(trafaret)
+        if type(trafaret) is ListTrafaret:
+            return self.list_function(trafaret)
+        return self.bind('t', trafaret)
+
+    @staticmethod
+    def is_plain_dict(trafaret) -> bool:
+        return (
+            type(trafaret) is DictTrafaret and
+            trafaret.ignore_any and
+            all(type(key) is Key for key in trafaret.keys)
+        )
+
+    def check(self, trafaret, src: str, dst: str, indent: str) -> List[str]:
+        """
+        Returns lines that check ``src`` variable and assign result to
+        ``dst`` expression.
+        """
+        kind = type(trafaret)
+        fallback = f'{dst} = {self.bind("t", trafaret)}({src})'
+        condition = None
+
+        if kind is AnyTrafaret:
+            return [f'{indent}{dst} = {src}']
+        elif kind is String:
+            if trafaret.min_length is None and trafaret.max_length is None:
+                condition = f'{src}.__class__ is str'
+                if not trafaret.allow_blank:
+                    condition += f' and {src}'
+        elif kind in (Int, Float):
+            bounds = (trafaret.gte, trafaret.lte, trafaret.gt, trafaret.lt)
+            if all(x is None for x in bounds):
+                type_name = trafaret.value_type.__name__
+                condition = f'{src}.__class__ is {type_name}'
+        elif kind is Bool:
+            condition = f'{src} is True or {src} is False'
+        elif kind is Enum:
+            condition = f'{src} in {self.bind("v", trafaret.variants)}'
+        elif self.is_plain_dict(trafaret) or kind is ListTrafaret:
+            return [f'{indent}{dst} = {self.function(trafaret)}({src})']
+
+        if condition is None:
+            return [f'{indent}{fallback}']
+
+        return [
+            f'{indent}if {condition}:',
+            f'{indent}    {dst} = {src}',
+            f'{indent}else:',
+            f'{indent}    {fallback}',
+        ]
+
+    def list_function(self, trafaret: ListTrafaret) -> str:
+        name = self.bind('f', None)
+        original = self.bind('t', trafaret)
+
+        condition = f'value.__class__ is not list or ' \
+                    f'len(value) < {trafaret.min_length!r}'
+        if trafaret.max_length is not None:
+            condition += f' or len(value) > {trafaret.max_length!r}'
+
+        lines = [
+            f'def {name}(value):',
+            f'    if {condition}:',
+            f'        return {original}(value)',
+            '    result = []',
+            '    append = result.append',
+            '    for item in value:',
+        ]
+        lines += self.check(trafaret.trafaret, 'item', 'item', ' ' * 8)
+        lines += [
+            '        append(item)',
+            '    return result',
+        ]
+        self.functions.append('\n'.join(lines))
+        return name
+
+    def dict_function(self, trafaret: DictTrafaret) -> str:
+        name = self.bind('f', None)
+        original = self.bind('t', trafaret)
+
+        lines = [
+            f'def {name}(value):',
+            '    if not isinstance(value, Mapping):',
+            f'        return {original}(value)',
+            '    result = {}',
+        ]
+
+        for key in trafaret.keys:
+            dst = f'result[{key.get_name()!r}]'
+            lines += [
+                f'    if {key.name!r} in value:',
+                f'        item = value[{key.name!r}]',
+            ]
+            lines += self.check(key.trafaret, 'item', dst, ' ' * 8)
+
+            if key.default is not _EMPTY:
+                default = self.bind('d', key.default)
+                if callable(key.default):
+                    default += '()'
+                lines += [
+                    '    else:',
+                    f'        item = {default}',
+                ]
+                lines += self.check(key.trafaret, 'item', dst, ' ' * 8)
+            elif not key.optional:
+                lines += [
+                    '    else:',
+                    f'        return {original}(value)',
+                ]
+
+        lines.append('    return result')
+        self.functions.append('\n'.join(lines))
+        return name
+
+
+def compile_template(template) -> Callable:
+    """
+    Returns function with the same behaviour as ``template.transform``.
+
+    Args:
+        template: trafaret to compile.
+    """
+    compiled = _Compiler().compile(template)
+
+    def transform(value, context=None):
+        if context is not None:
+            return template.transform(value, context=context)
+        try:
+            return compiled(value)
+        except DataError:
+            # Rerun with the template to get error with the full path.
+            return template.transform(value)
+
+    transform.template = template  # type: ignore
+    return transform
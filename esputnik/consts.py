@@ -1,7 +1,10 @@
 __all__ = (
     'MEDIA_CHANNEL_TYPES',
     'CONTACT_FIELDS_CHOICES',
-    'UNIQUENESS_CONTACT_CHOICES'
+    'UNIQUENESS_CONTACT_CHOICES',
+    'CONTACTS_BATCH_SIZE',
+    'CONTACTS_PAGE_SIZE',
+    'ORDERS_BATCH_SIZE'
 )
 
 
@@ -27,3 +30,12 @@ UNIQUENESS_CONTACT_CHOICES = (
     'email_or_sms',
     'id'
 )
+
+# Max amount of contacts accepted by a single "contacts" request.
+CONTACTS_BATCH_SIZE = 3000
+
+# Max amount of contacts returned by a single contacts search request.
+CONTACTS_PAGE_SIZE = 500
+
+# Amount of orders sent by a single request of bulk orders.
+ORDERS_BATCH_SIZE = 1000
@@ -0,0 +1,321 @@
+"""
+Background dispatch of events.
+
+``EventDispatcher.event`` validates and serializes the event, puts it into
+a bounded queue and returns at once. Queued events are collected into
+batches and sent by a pool of workers through the pooled client of the
+adaptor.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List
+
+from esputnik.exceptions import IncorrectDataError
+from esputnik.utils import lazy_import
+
+__all__ = (
+    'BACKPRESSURE_POLICIES',
+    'EventDispatcher'
+)
+
+
+BACKPRESSURE_POLICIES = (
+    'block',
+    'drop',
+    'spill'
+)
+
+_STOP = object()
+
+templates = lazy_import('esputnik.templates')
+
+
+class EventDispatcher:
+    """
+    Sends events in background.
+
+    API accepts one event per request, so batches only group events for
+    workers: every worker sends its batch one by one over a kept alive
+    connection. Set ``pool_maxsize`` of the client to at least ``workers``.
+
+    Attributes:
+        adaptor (ESputnikAPIAdaptor): Adaptor to send events with.
+        maxsize (int): Max amount of queued events.
+        batch_size (int): Max amount of events in batch.
+        flush_interval (float): Max seconds the first event of batch
+            waits for the batch to fill up.
+        workers (int): Amount of sending threads.
+        policy (str): What to do when queue is full:
+            'block' - wait for free place (up to ``block_timeout``),
+            'drop' - discard event,
+            'spill' - append event to ``spill_path`` file, spilled events
+            are sent when the queue is empty again, ``batch_size``
+            at a time.
+        on_error (Callable, optional): Called with body and response or
+            exception of every event that failed to send. Exceptions it
+            raises are counted in ``callback_errors`` and ignored.
+    """
+
+    def __init__(
+            self,
+            adaptor,
+            maxsize: int = 10000,
+            batch_size: int = 100,
+            flush_interval: float = 1.0,
+            workers: int = 4,
+            policy: str = 'block',
+            block_timeout: float = None,
+            spill_path: str = None,
+            on_error: Callable = None
+    ) -> None:
+        if policy not in BACKPRESSURE_POLICIES:
+            raise IncorrectDataError(
+                code='policy',
+                message=f'Policy must be one of {BACKPRESSURE_POLICIES}.'
+            )
+        if policy == 'spill' and not spill_path:
+            raise IncorrectDataError(
+                code='spill_path',
+                message='You must provide spill_path for spill policy.'
+            )
+
+        self.adaptor = adaptor
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.spill_path = spill_path
+        self.on_error = on_error
+
+        self.sent = 0
+        self.failed = 0
+        self.callback_errors = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.flushes = 0
+        self.flush_time = 0.0
+        self.max_flush_time = 0.0
+
+        self._queue = queue.Queue(maxsize)  # type: queue.Queue
+        self._lock = threading.Lock()
+        # Signalled when the last event() in progress returns.
+        self._idle = threading.Condition(self._lock)
+        self._putting = 0
+        self._spill_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        # Batches handed to workers, so the executor does not buffer
+        # events behind the back of the bounded queue.
+        self._slots = threading.Semaphore(workers * 2)
+        self._closed = False
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def __enter__(self) -> 'EventDispatcher':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def event(self, data: Dict) -> bool:
+        """
+        Queues event, see ``ESputnikAPIAdaptor.event``.
+
+        Returns:
+            bool: False if event was dropped.
+
+        Raises:
+            DataError: Event data is invalid.
+            queue.Full: Queue is full and ``block_timeout`` has passed.
+            RuntimeError: Dispatcher is closed.
+        """
+        body = self.adaptor.dumps(data, templates.prepare_event)
+
+        # close() waits for events in progress, so none of them is put
+        # behind the stop marker and lost.
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Dispatcher is closed.')
+            self._putting += 1
+        try:
+            return self._put(body)
+        finally:
+            with self._lock:
+                self._putting -= 1
+                if not self._putting:
+                    self._idle.notify_all()
+
+    def _put(self, body: bytes) -> bool:
+        if self.policy == 'block':
+            self._queue.put(body, timeout=self.block_timeout)
+            return True
+
+        try:
+            self._queue.put_nowait(body)
+        except queue.Full:
+            if self.policy == 'drop':
+                with self._lock:
+                    self.dropped += 1
+                return False
+            self._spill(body)
+        return True
+
+    def _spill(self, body: bytes) -> None:
+        assert self.spill_path is not None
+        with self._spill_lock:
+            with open(self.spill_path, 'ab') as f:
+                f.write(body + b'\n')
+        with self._lock:
+            self.spilled += 1
+
+    def _unspill(self) -> Iterator[List[bytes]]:
+        """
+        Takes spilled events from file, ``batch_size`` events at a time.
+
+        The file is renamed first, so events spilled meanwhile go to
+        a new one. Renamed file left by a crash is taken first.
+        """
+        if not self.spill_path:
+            return
+        taken = self.spill_path + '.taken'
+        with self._spill_lock:
+            if not os.path.exists(taken):
+                if not os.path.exists(self.spill_path):
+                    return
+                os.replace(self.spill_path, taken)
+
+        with open(taken, 'rb') as f:
+            batch = []  # type: List[bytes]
+            for line in f:
+                body = line.rstrip(b'\n')
+                if not body:
+                    continue
+                batch.append(body)
+                if len(batch) == self.batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        os.remove(taken)
+
+    def _collect(self) -> None:
+        """
+        Collects queued events into batches and hands them to workers.
+        """
+        while True:
+            batch = []  # type: List[bytes]
+            deadline = None
+            stop = False
+
+            while len(batch) < self.batch_size:
+                timeout = None
+                if deadline is not None:
+                    timeout = max(0.0, deadline - time.monotonic())
+                elif self.spill_path:
+                    # Wake up from time to time to pick up spilled events.
+                    timeout = self.flush_interval
+
+                try:
+                    body = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+
+                if body is _STOP:
+                    stop = True
+                    break
+
+                batch.append(body)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if batch:
+                self._submit(batch)
+            elif self._queue.empty():
+                for spilled in self._unspill():
+                    self._submit(spilled)
+
+            if stop:
+                return
+
+    def _submit(self, bodies: List[bytes]) -> None:
+        for chunk in range(0, len(bodies), self.batch_size):
+            self._slots.acquire()
+            self._executor.submit(
+                self._send, bodies[chunk:chunk + self.batch_size])
+
+    def _send(self, batch: List[bytes]) -> None:
+        try:
+            self._send_batch(batch)
+        finally:
+            self._slots.release()
+
+    def _send_batch(self, batch: List[bytes]) -> None:
+        started = time.monotonic()
+        sent = failed = callback_errors = 0
+
+        try:
+            for body in batch:
+                try:
+                    response = self.adaptor.client.post('event', body)
+                    if 200 <= response.status_code < 300:
+                        sent += 1
+                        continue
+                    error = response
+                except Exception as e:
+                    error = e
+
+                failed += 1
+                if self.on_error is not None:
+                    try:
+                        self.on_error(body, error)
+                    except Exception:
+                        # Must not lose the rest of the batch.
+                        callback_errors += 1
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self.sent += sent
+                self.failed += failed
+                self.callback_errors += callback_errors
+                self.flushes += 1
+                self.flush_time += elapsed
+                self.max_flush_time = max(self.max_flush_time, elapsed)
+
+    def stats(self) -> Dict:
+        """
+        Returns counters of the dispatcher.
+        """
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'sent': self.sent,
+                'failed': self.failed,
+                'callback_errors': self.callback_errors,
+                'dropped': self.dropped,
+                'spilled': self.spilled,
+                'flushes': self.flushes,
+                'avg_flush_time': self.flush_time / (self.flushes or 1),
+                'max_flush_time': self.max_flush_time,
+            }
+
+    def close(self) -> None:
+        """
+        Stops accepting events, sends everything queued or spilled
+        and waits for workers to finish.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            while self._putting:
+                self._idle.wait()
+
+        self._queue.put(_STOP)
+        self._collector.join()
+
+        for spilled in self._unspill():
+            self._submit(spilled)
+        self._executor.shutdown(wait=True)
@@ -1,28 +1,42 @@
-import json
-from typing import Dict, List, Union
-from six import string_types
+import time
+from functools import partial
+from typing import (
+    Callable, Dict, Iterable, List, NamedTuple, Tuple, Union
+)
 
-from esputnik.client import ESputnikRequestClient
-from esputnik.exceptions import IncorrectDataError
-from esputnik.templates import (
-    prepare_contact,
-    prepare_contact_subscribe,
-    prepare_contacts,
-    prepare_contact_search,
-    prepare_contact_upload,
-    prepare_event,
-    prepare_order,
-    prepare_send_email,
-    prepare_smartsend_email,
-    prepare_email,
-    prepare_sms,
-    prepare_viber_message
+from esputnik.cache import TTLCache
+from esputnik.client import (
+    ESputnikRequestClient,
+    RequestData,
+    Response,
+    is_success
 )
+from esputnik.coalesce import MessageStatusCoalescer
+from esputnik.consts import CONTACTS_BATCH_SIZE, CONTACTS_PAGE_SIZE
+from esputnik.dispatch import EventDispatcher
+from esputnik.exceptions import IncorrectDataError
+from esputnik.instrumentation import Body
+from esputnik.latency import Timeout
+from esputnik.pagination import export_pages, iter_pages
+from esputnik.utils import bounded_map, chunked, lazy_import
 
 __all__ = (
+    'BatchResult',
     'ESputnikAPIAdaptor',
 )
 
+six = lazy_import('six')
+# Loaded on first use, loading imports trafaret and builds all templates.
+templates = lazy_import('esputnik.templates')
+
+
+BatchResult = NamedTuple('BatchResult', [
+    ('index', int),
+    ('size', int),
+    ('response', Response),
+    ('error', Exception)
+])
+
 
 def _prepare_emails(value) -> List:
     if not value:
@@ -32,7 +46,7 @@ def _prepare_emails(value) -> List:
         )
     if isinstance(value, list):
         return value
-    elif isinstance(value, string_types):
+    elif isinstance(value, six.string_types):
         return [value]
     return list(value)
 
@@ -53,6 +67,8 @@ class ESputnikAPIAdaptor:
             host: str = 'https://esputnik.com/api/',
             version: int = 1,
             *args,
+            client_options: Dict = None,
+            cache: TTLCache = None,
             **kwargs
     ) -> None:
         """
@@ -62,21 +78,88 @@ class ESputnikAPIAdaptor:
         Args:
             api_client (None, optional): Custom APIClient instance, if
                 you need to pass special params or even your own class.
+            client_options (Dict, optional): Extra keyword arguments for
+                the request client, e.g. connection pool settings.
+            cache (TTLCache, optional): Cache for responses of read-only
+                methods: version, account_info, addressbooks, balance
+                and groups. Entries are kept per account, so the cache
+                may be shared by adaptors of many accounts. Cached
+                responses are shared by callers and must not be changed.
         """
         self.client = self.__class__.request_client_class(
             api_user=user,
             api_password=password,
             host=host,
-            version=version
+            version=version,
+            **(client_options or {})
         )
+        self.cache = cache
 
         super().__init__(*args, **kwargs)
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self):
+        """
+        Releases connections held by the request client.
+        """
+        self.client.close()
+
+    def cache_key(self, name: str) -> Tuple[str, str, str]:
+        """
+        Returns key of cached response of the method for the account
+        of the client.
+        """
+        return name, self.client.base_url, self.client.api_user
+
+    def cached_get(self, name: str, path: str):
+        """
+        Sends GET request or returns its cached successful response.
+        Cached response is shared by callers, it must not be changed.
+
+        Args:
+            name (str): method name, first item of cache key.
+            path (str): relative path of request.
+        """
+        if self.cache is None:
+            return self.client.get(path)
+        return self.cache.get_or_fetch(
+            self.cache_key(name), partial(self.client.get, path), is_success)
+
+    def dumps(self, data: Dict, prepare: Callable = None) -> bytes:
+        """
+        Transforms data with template function and encodes request body
+        with serializer of the request client. Timings of both steps are
+        attached to the body when the request client has hooks.
+
+        Args:
+            data (Dict): data to send.
+            prepare (Callable, optional): template function, e.g.
+                ``prepare_contact``.
+        """
+        serializer = self.client.serializer
+        if not self.client.hooks:
+            return serializer.dumps(data if prepare is None else prepare(data))
+
+        started = time.perf_counter()
+        if prepare is not None:
+            data = prepare(data)
+        transformed = time.perf_counter()
+        body = Body(serializer.dumps(data))
+        body.transform = transformed - started
+        body.serialize = time.perf_counter() - transformed
+        return body
+
     def version(self):
         """
         Get protocol version.
         """
-        return self.client.get(
+        return self.cached_get(
+            'version',
             'version'
         )
 
@@ -84,7 +167,8 @@ class ESputnikAPIAdaptor:
         """
         Get current account info.
         """
-        return self.client.get(
+        return self.cached_get(
+            'account_info',
             'account/info'
         )
 
@@ -94,7 +178,8 @@ class ESputnikAPIAdaptor:
         The catalog contains the list of additional fields
         for contacts that are available in your organisation.
         """
-        return self.client.get(
+        return self.cached_get(
+            'addressbooks',
             'addressbooks'
         )
 
@@ -102,7 +187,8 @@ class ESputnikAPIAdaptor:
         """
         Get organisation balance.
         """
-        return self.client.get(
+        return self.cached_get(
+            'balance',
             'balance'
         )
 
@@ -113,10 +199,10 @@ class ESputnikAPIAdaptor:
         Args:
             data (Dict): dict of data to send
         """
-        data = json.dumps(prepare_contact(data))
+        body = self.dumps(data, templates.prepare_contact)
         return self.client.post(
             'contact',
-            data
+            body
         )
 
     def update_contact(self, contact_id: str, data: Dict):
@@ -129,10 +215,10 @@ class ESputnikAPIAdaptor:
             contact_id (str): id of contact in your esputnik database
             data (Dict): dict of data to send
         """
-        data = json.dumps(prepare_contact(data))
+        body = self.dumps(data, templates.prepare_contact)
         return self.client.put(
             f'contact/{contact_id}',
-            data
+            body
         )
 
     def delete_contact(self, contact_id: str):
@@ -148,7 +234,7 @@ class ESputnikAPIAdaptor:
             f'contact/{contact_id}'
         )
 
-    def get_contact(self, contact_id: str):
+    def get_contact(self, contact_id: str, timeout: Timeout = None):
         """
         Get contact.
 
@@ -156,9 +242,11 @@ class ESputnikAPIAdaptor:
 
         Args:
             contact_id (str): id of contact in your esputnik database
+            timeout (Timeout, optional): timeouts of the call
         """
         return self.client.get(
-            f'contact/{contact_id}'
+            f'contact/{contact_id}',
+            timeout=timeout
         )
 
     def contact_subscribe(self, data: Dict):
@@ -173,13 +261,13 @@ class ESputnikAPIAdaptor:
         Args:
             data (Dict): dict of data to send
         """
-        data = json.dumps(prepare_contact_subscribe(data))
+        body = self.dumps(data, templates.prepare_contact_subscribe)
         return self.client.post(
             'contact/subscribe',
-            data
+            body
         )
 
-    def add_contacts(self, data: Dict):
+    def add_contacts(self, data: Dict, stream: bool = False):
         """
         Add/update contacts.
         Existing contacts will be updated, new contacts will be added.
@@ -188,13 +276,59 @@ class ESputnikAPIAdaptor:
 
         Args:
             data (Dict): dict of data to send
+            stream (bool, optional): serialize contacts one by one while
+                sending, 'contacts' may be a generator then
         """
-        data = json.dumps(prepare_contacts(data))
+        if stream:
+            from esputnik.streaming import stream_contacts
+
+            body = stream_contacts(
+                data, self.client.serializer)  # type: RequestData
+        else:
+            body = self.dumps(data, templates.prepare_contacts)
         return self.client.post(
             'contacts',
-            data
+            body
         )
 
+    def add_contacts_bulk(
+            self,
+            contacts: Iterable[Dict],
+            data: Dict,
+            batch_size: int = CONTACTS_BATCH_SIZE,
+            workers: int = 4
+    ):
+        """
+        Add/update any amount of contacts.
+        Contacts are consumed lazily and sent in batches of ``batch_size``
+        by ``add_contacts`` from a pool of ``workers`` threads, so at most
+        ``workers`` batches are kept in memory at once.
+
+        Args:
+            contacts (Iterable[Dict]): list or generator of contacts
+            data (Dict): rest of the CONTACTS template
+                (dedupe_on, contact_fields, group_names, etc.)
+            batch_size (int, optional): amount of contacts in one request
+            workers (int, optional): amount of concurrent requests
+
+        Returns:
+            List[BatchResult]: results ordered by batch index.
+                Batch that failed to send has ``error`` instead of response.
+        """
+        def send(batch):
+            try:
+                response = self.add_contacts(dict(data, contacts=batch))
+            except Exception as e:
+                return BatchResult(None, len(batch), None, e)
+            return BatchResult(None, len(batch), response, None)
+
+        results = [
+            result._replace(index=index)
+            for index, result in bounded_map(
+                send, chunked(contacts, batch_size), workers)
+        ]
+        return sorted(results, key=lambda x: x.index)
+
     def get_contacts(self, data: Dict = None):
         """
         Search contacts.
@@ -204,12 +338,68 @@ class ESputnikAPIAdaptor:
         Type of method: GET.
         """
         if data:
-            data = prepare_contact_search(data)
+            data = templates.prepare_contact_search(data)
         return self.client.get(
             'contacts',
             data
         )
 
+    def iter_contacts(
+            self,
+            data: Dict = None,
+            page_size: int = CONTACTS_PAGE_SIZE,
+            prefetch: bool = False
+    ):
+        """
+        Search contacts and iterate over all of them.
+        Pages are requested lazily with ``get_contacts``.
+
+        Args:
+            data (Dict, optional): search filters, see ``get_contacts``
+            page_size (int, optional): amount of contacts in one request
+            prefetch (bool, optional): fetch next page in background
+
+        Returns:
+            Iterator[Dict]: contacts in order of pages.
+
+        Raises:
+            ResponseError: Server responded with error.
+        """
+        def fetch(start):
+            return self.get_contacts(
+                dict(data or {}, start_index=start, max_rows=page_size))
+        return iter_pages(fetch, page_size, prefetch)
+
+    def export_contacts(
+            self,
+            sink: Callable[[Dict], None],
+            data: Dict = None,
+            page_size: int = CONTACTS_PAGE_SIZE,
+            workers: int = 8
+    ):
+        """
+        Search contacts and pass all of them to sink in order.
+        Pages after the first one are fetched concurrently, their offsets
+        are computed from the TotalCount header.
+
+        Args:
+            sink (Callable[[Dict], None]): function to call with every
+                contact, e.g. ``CSVSink`` or ``NDJSONSink``
+            data (Dict, optional): search filters, see ``get_contacts``
+            page_size (int, optional): amount of contacts in one request
+            workers (int, optional): amount of concurrent requests
+
+        Returns:
+            int: amount of exported contacts.
+
+        Raises:
+            ResponseError: Server responded with error.
+        """
+        def fetch(start):
+            return self.get_contacts(
+                dict(data or {}, start_index=start, max_rows=page_size))
+        return export_pages(fetch, sink, page_size, workers)
+
     def contacts_upload(self, data: Dict):
         """
         Add/update contacts from external file.
@@ -220,10 +410,10 @@ class ESputnikAPIAdaptor:
         Args:
             data (Dict): dict of data to send
         """
-        data = json.dumps(prepare_contact_upload(data))
+        body = self.dumps(data, templates.prepare_contact_upload)
         return self.client.post(
             'contacts/upload',
-            data
+            body
         )
 
     def emails_unsubscribed_add(self, emails: Union[List, str]):
@@ -235,7 +425,7 @@ class ESputnikAPIAdaptor:
         Args:
             emails (List): list of emails
         """
-        data = json.dumps({
+        data = self.dumps({
             "emails": _prepare_emails(emails)
         })
         return self.client.post(
@@ -252,7 +442,7 @@ class ESputnikAPIAdaptor:
         Args:
             emails (List): list of emails
         """
-        data = json.dumps({
+        data = self.dumps({
             "emails": _prepare_emails(emails)
         })
         return self.client.post(
@@ -269,13 +459,22 @@ class ESputnikAPIAdaptor:
         Args:
             data (Dict): dict of data to send
         """
-        data = json.dumps(prepare_event(data))
+        body = self.dumps(data, templates.prepare_event)
         return self.client.post(
             'event',
-            data
+            body
         )
 
-    def orders(self, data: Dict):
+    def event_dispatcher(self, **options) -> EventDispatcher:
+        """
+        Returns dispatcher that sends events in background.
+
+        Args:
+            **options: options of ``EventDispatcher``.
+        """
+        return EventDispatcher(self, **options)
+
+    def orders(self, data: Dict, stream: bool = False):
         """
         Add orders.
 
@@ -283,14 +482,40 @@ class ESputnikAPIAdaptor:
 
         Args:
             data (Dict): dict of data to send
+            stream (bool, optional): serialize orders one by one while
+                sending, 'orders' may be a generator then
         """
-        data = json.dumps(prepare_order(data))
+        if stream:
+            from esputnik.streaming import stream_order
+
+            body = stream_order(
+                data, self.client.serializer)  # type: RequestData
+        else:
+            body = self.dumps(data, templates.prepare_order)
         return self.client.post(
             'orders',
-            data
+            body
         )
 
-    def group_contacts(self, group_id):
+    def orders_bulk(self, orders: Iterable[Dict], **options):
+        """
+        Add any amount of orders.
+        Orders are validated one by one, invalid ones are quarantined
+        with their errors and valid ones are sent in concurrent batches.
+
+        Args:
+            orders (Iterable[Dict]): list or generator of orders
+            **options: options of ``OrderPipeline``
+                (max_orders, max_bytes, workers, processes, etc.)
+
+        Returns:
+            OrdersResult: summary with outcome of every order.
+        """
+        from esputnik.orders import OrderPipeline
+
+        return OrderPipeline(self, **options).send(orders)
+
+    def group_contacts(self, group_id, data: Dict = None):
         """
         Get contacts from segment.
 
@@ -298,11 +523,41 @@ class ESputnikAPIAdaptor:
 
         Args:
             group_id: id of group in your esputnik database
+            data (Dict, optional): paging params, start_index and max_rows
         """
+        if data:
+            data = templates.prepare_group_contacts(data)
         return self.client.get(
-            f'group/{group_id}/contacts'
+            f'group/{group_id}/contacts',
+            data
         )
 
+    def iter_group_contacts(
+            self,
+            group_id,
+            page_size: int = CONTACTS_PAGE_SIZE,
+            prefetch: bool = False
+    ):
+        """
+        Iterate over all contacts of segment.
+        Pages are requested lazily with ``group_contacts``.
+
+        Args:
+            group_id: id of group in your esputnik database
+            page_size (int, optional): amount of contacts in one request
+            prefetch (bool, optional): fetch next page in background
+
+        Returns:
+            Iterator[Dict]: contacts in order of pages.
+
+        Raises:
+            ResponseError: Server responded with error.
+        """
+        def fetch(start):
+            return self.group_contacts(
+                group_id, {'start_index': start, 'max_rows': page_size})
+        return iter_pages(fetch, page_size, prefetch)
+
     def group_contacts_detach(self, group_id):
         """
         Delete all contacts from static segment.
@@ -322,11 +577,17 @@ class ESputnikAPIAdaptor:
 
         Type of method: GET.
         """
-        return self.client.get(
+        return self.cached_get(
+            'groups',
             'groups'
         )
 
-    def message_send(self, message_id: str, data: Dict):
+    def message_send(
+            self,
+            message_id: str,
+            data: Dict,
+            timeout: Timeout = None
+    ):
         """
         Dispatch start of the created message. Message can be parametrized additionally.
 
@@ -335,19 +596,26 @@ class ESputnikAPIAdaptor:
         Args:
             message_id (str): if of message in your esputnik database
             data (Dict): dict of data to send
+            timeout (Timeout, optional): timeouts of the call
         """
         if data.get('recipients') is None and data.get('group_id') is None:
             raise IncorrectDataError(
                 code='message_send',
                 message='You mast provide \'recipients\' or \'group_id\'.'
             )
-        data = json.dumps(prepare_send_email(data))
+        body = self.dumps(data, templates.prepare_send_email)
         return self.client.post(
             f'message/{message_id}/send',
-            data
+            body,
+            timeout=timeout
         )
 
-    def message_smartsend(self, message_id: str, data: Dict):
+    def message_smartsend(
+            self,
+            message_id: str,
+            data: Dict,
+            stream: bool = False
+    ):
         """
         Sending prepared message to one or many contacts.
         The message can be parametrized for each contact separately.
@@ -355,39 +623,54 @@ class ESputnikAPIAdaptor:
         Args:
             message_id (str): unique id of the message in your esputnik database
             data (Dict): dict of data to send
+            stream (bool, optional): serialize recipients one by one while
+                sending, 'recipients' may be a generator then
         """
-        data = json.dumps(prepare_smartsend_email(data))
+        if stream:
+            from esputnik.streaming import stream_smartsend_email
+
+            body = stream_smartsend_email(
+                data, self.client.serializer)  # type: RequestData
+        else:
+            body = self.dumps(data, templates.prepare_smartsend_email)
         return self.client.post(
             f'message/{message_id}/smartsend',
-            data
+            body
         )
 
-    def message_email(self, data: Dict):
+    def message_email(self, data: Dict, timeout: Timeout = None):
         """
         Send email message. If contact with such email address is not exist it will be created.
 
         Args:
             data (Dict): dict of data to send
+            timeout (Timeout, optional): timeouts of the call
         """
-        data = json.dumps(prepare_email(data))
+        body = self.dumps(data, templates.prepare_email)
         return self.client.post(
             'message/email',
-            data
+            body,
+            timeout=timeout
         )
 
-    def message_sms(self, data: Dict):
+    def message_sms(self, data: Dict, timeout: Timeout = None):
         """
         Send SMS message. If contact with such phone number is not exist it will be created.
 
         Type of method: POST.
+
+        Args:
+            data (Dict): dict of data to send
+            timeout (Timeout, optional): timeouts of the call
         """
-        data = json.dumps(prepare_sms(data))
+        body = self.dumps(data, templates.prepare_sms)
         return self.client.post(
             'message/sms',
-            data
+            body,
+            timeout=timeout
         )
 
-    def message_status(self, ids: List):
+    def message_status(self, ids: List, timeout: Timeout = None):
         """
         Get status of a single message.
 
@@ -395,16 +678,31 @@ class ESputnikAPIAdaptor:
 
         Args:
             ids (List): list of ids to check statuses
+            timeout (Timeout, optional): timeouts of the call
         """
         data = {
             'ids': ids or []
         }
         return self.client.get(
             'message/status',
-            data
+            data,
+            timeout=timeout
         )
 
-    def message_viber(self, data: Dict):
+    def status_coalescer(self, **options):
+        """
+        Returns coalescer that batches concurrent single message
+        status lookups into ``message_status`` requests.
+
+        Args:
+            **options: options of ``MessageStatusCoalescer``.
+
+        Returns:
+            MessageStatusCoalescer: coalescer bound to the adaptor.
+        """
+        return MessageStatusCoalescer(self, **options)
+
+    def message_viber(self, data: Dict, timeout: Timeout = None):
         """
         Send VIBER message. If contact with such phone number is not exist it will be created.
 
@@ -413,9 +711,11 @@ class ESputnikAPIAdaptor:
 
         Args:
             data (Dict): dict of data to send
+            timeout (Timeout, optional): timeouts of the call
         """
-        data = json.dumps(prepare_viber_message(data))
+        body = self.dumps(data, templates.prepare_viber_message)
         return self.client.post(
             'message/viber',
-            data
+            body,
+            timeout=timeout
         )
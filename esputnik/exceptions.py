@@ -1,7 +1,8 @@
 __all__ = (
     'ESputnikException',
     'InvalidAuthDataError',
-    'IncorrectDataError'
+    'IncorrectDataError',
+    'ResponseError'
 )
 
 
@@ -17,3 +18,10 @@ class InvalidAuthDataError(ESputnikException):
 
 class IncorrectDataError(InvalidAuthDataError):
     pass
+
+
+class ResponseError(ESputnikException):
+    def __init__(self, code, message, response=None):
+        self.code = code
+        self.message = message
+        self.response = response
@@ -0,0 +1,389 @@
+"""
+Instrumentation of requests.
+
+Hooks are passed to the request client with ``hooks`` option and get
+``RequestMetrics`` of every request: timings of template transform,
+body serialization and network, sizes of bodies and status code.
+JSON body of the response is decoded later, on first access to its
+data, so time of the parse phase is passed to hooks separately, when
+the body is decoded. Without hooks nothing is measured.
+
+Prometheus and OpenTelemetry exporters require ``prometheus_client``
+and ``opentelemetry-api`` to be installed, they are imported only when
+an exporter is created.
+"""
+
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterator, NamedTuple, Optional
+
+__all__ = (
+    'PHASES',
+    'Body',
+    'CountingIterator',
+    'RequestMetrics',
+    'Hook',
+    'Histogram',
+    'MetricsCollector',
+    'PrometheusExporter',
+    'OpenTelemetryExporter',
+    'endpoint_name'
+)
+
+
+PHASES = (
+    'transform',
+    'serialize',
+    'network',
+    'parse'
+)
+
+# Phases timed by the time request is finished, see ``Hook.on_parse``.
+_REQUEST_PHASES = PHASES[:-1]
+
+_ID_SEGMENT = re.compile(r'^[^/]*\d[^/]*$')
+
+
+@lru_cache(maxsize=1024)
+def endpoint_name(path: str) -> str:
+    """
+    Returns path with ids replaced by placeholder,
+    e.g. 'message/{id}/smartsend', to keep amount of endpoints bounded.
+    """
+    return '/'.join(
+        '{id}' if _ID_SEGMENT.match(x) else x
+        for x in path.strip('/').split('/')
+    )
+
+
+class Body(bytes):
+    """
+    Encoded request body that carries timings of its preparation.
+    Returned by ``ESputnikAPIAdaptor.dumps`` only when hooks are set.
+    """
+    transform = 0.0
+    serialize = 0.0
+
+
+class CountingIterator:
+    """
+    Passes chunks of streamed body through, counting their size.
+    """
+
+    def __init__(self, chunks: Iterator[bytes]) -> None:
+        self.chunks = chunks
+        self.size = 0
+
+    def __iter__(self) -> 'CountingIterator':
+        return self
+
+    def __next__(self) -> bytes:
+        chunk = next(self.chunks)
+        self.size += len(chunk)
+        return chunk
+
+
+class RequestMetrics(NamedTuple):
+    method: str
+    path: str
+    endpoint: str
+    status_code: Optional[int]
+    retries: int
+    transform: float
+    serialize: float
+    network: float
+    request_bytes: int
+    response_bytes: int
+    error: Optional[Exception] = None
+
+
+class Hook:
+    """
+    Base class of hooks, gets metrics of every request
+    after it is finished. Must be thread safe.
+    """
+
+    def on_request(self, metrics: RequestMetrics) -> None:
+        raise NotImplementedError
+
+    def on_parse(self, method: str, endpoint: str, seconds: float) -> None:
+        """
+        Gets time spent decoding body of response, on first access to its
+        data. Bodies that are never read are never decoded.
+        """
+
+
+class Histogram:
+    """
+    Log-linear histogram in HDR style: values are counted in buckets
+    whose width grows with magnitude, so relative error of percentiles
+    is below 1% whatever the range of values. Not thread safe.
+
+    Attributes:
+        unit (float): Smallest distinguishable value, one microsecond
+            for timings in seconds by default.
+    """
+    # 2 ** 8 linear sub-buckets for 2 significant digits.
+    SUB_BUCKET_BITS = 8
+    SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+    HALF = SUB_BUCKETS >> 1
+
+    def __init__(self, unit: float = 1e-6) -> None:
+        self.unit = unit
+        self.count = 0
+        self.total = 0.0
+        self.min = None  # type: Optional[float]
+        self.max = None  # type: Optional[float]
+        self._counts = Counter()  # type: Counter
+
+    def _index(self, value: float) -> int:
+        units = int(value / self.unit)
+        if units < self.SUB_BUCKETS:
+            return max(units, 0)
+        exp = units.bit_length() - self.SUB_BUCKET_BITS
+        return exp * self.HALF + (units >> exp)
+
+    def _value(self, index: int) -> float:
+        """
+        Returns the highest value counted in the bucket.
+        """
+        if index < self.SUB_BUCKETS:
+            return index * self.unit
+        exp = (index >> (self.SUB_BUCKET_BITS - 1)) - 1
+        sub = index - exp * self.HALF
+        return (((sub + 1) << exp) - 1) * self.unit
+
+    def record(self, value: float) -> None:
+        self._counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other: 'Histogram') -> None:
+        self._counts.update(other._counts)
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent: float) -> float:
+        """
+        Returns value below which ``percent`` of recorded values are.
+        """
+        if not self.count or self.max is None:
+            return 0.0
+        rank = max(1, round(self.count * percent / 100))
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= rank:
+                return min(self._value(index), self.max)
+        return self.max
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'min': self.min or 0.0,
+            'max': self.max or 0.0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+        }
+
+
+class _EndpointStats:
+
+    def __init__(self) -> None:
+        self.phases = {x: Histogram() for x in PHASES}
+        self.statuses = Counter()  # type: Counter
+        self.errors = 0
+        self.retries = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+
+class MetricsCollector(Hook):
+    """
+    Keeps latency histograms and counters by endpoint in memory.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._endpoints = {}  # type: Dict[str, _EndpointStats]
+
+    def on_request(self, metrics: RequestMetrics) -> None:
+        with self._lock:
+            stats = self._endpoints.get(metrics.endpoint)
+            if stats is None:
+                stats = self._endpoints[metrics.endpoint] = _EndpointStats()
+
+            for phase in _REQUEST_PHASES:
+                stats.phases[phase].record(getattr(metrics, phase))
+            if metrics.error is not None:
+                stats.errors += 1
+            else:
+                stats.statuses[metrics.status_code] += 1
+            stats.retries += metrics.retries
+            stats.request_bytes += metrics.request_bytes
+            stats.response_bytes += metrics.response_bytes
+
+    def on_parse(self, method: str, endpoint: str, seconds: float) -> None:
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = _EndpointStats()
+            stats.phases['parse'].record(seconds)
+
+    def histogram(self, endpoint: str, phase: str = 'network') -> Histogram:
+        """
+        Returns copy of histogram of the endpoint phase.
+        """
+        histogram = Histogram()
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is not None:
+                histogram.merge(stats.phases[phase])
+        return histogram
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Returns summary of all endpoints.
+        """
+        with self._lock:
+            return {
+                endpoint: {
+                    'phases': {
+                        name: histogram.snapshot()
+                        for name, histogram in stats.phases.items()
+                    },
+                    'statuses': dict(stats.statuses),
+                    'errors': stats.errors,
+                    'retries': stats.retries,
+                    'request_bytes': stats.request_bytes,
+                    'response_bytes': stats.response_bytes,
+                }
+                for endpoint, stats in self._endpoints.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+
+class PrometheusExporter(Hook):
+    """
+    Exports metrics with ``prometheus_client``.
+
+    Attributes:
+        registry: Collector registry, the default one if not set.
+        namespace (str): Prefix of metric names.
+    """
+
+    def __init__(self, registry=None, namespace: str = 'esputnik') -> None:
+        try:
+            import prometheus_client
+        except ImportError:  # pragma: no cover
+            raise ImportError('prometheus_client is not installed.')
+
+        if registry is None:
+            registry = prometheus_client.REGISTRY
+
+        self.duration = prometheus_client.Histogram(
+            'request_phase_seconds',
+            'Time spent in phases of API requests.',
+            ['endpoint', 'method', 'phase'],
+            namespace=namespace,
+            registry=registry
+        )
+        self.bytes = prometheus_client.Counter(
+            'request_bytes',
+            'Size of request and response bodies.',
+            ['endpoint', 'method', 'direction'],
+            namespace=namespace,
+            registry=registry
+        )
+        self.responses = prometheus_client.Counter(
+            'responses',
+            'Responses by status code, "error" for failed requests.',
+            ['endpoint', 'method', 'status'],
+            namespace=namespace,
+            registry=registry
+        )
+
+    def on_request(self, metrics: RequestMetrics) -> None:
+        labels = (metrics.endpoint, metrics.method)
+        for phase in _REQUEST_PHASES:
+            self.duration.labels(*labels, phase).observe(
+                getattr(metrics, phase))
+        self.bytes.labels(*labels, 'out').inc(metrics.request_bytes)
+        self.bytes.labels(*labels, 'in').inc(metrics.response_bytes)
+        status = 'error' if metrics.error is not None \
+            else str(metrics.status_code)
+        self.responses.labels(*labels, status).inc()
+
+    def on_parse(self, method: str, endpoint: str, seconds: float) -> None:
+        self.duration.labels(endpoint, method, 'parse').observe(seconds)
+
+
+class OpenTelemetryExporter(Hook):
+    """
+    Exports metrics with OpenTelemetry metrics API.
+
+    Attributes:
+        meter: Meter to create instruments with,
+            one of the global meter provider if not set.
+        prefix (str): Prefix of instrument names.
+    """
+
+    def __init__(self, meter=None, prefix: str = 'esputnik') -> None:
+        if meter is None:
+            try:
+                from opentelemetry import metrics as otel_metrics
+            except ImportError:  # pragma: no cover
+                raise ImportError('opentelemetry-api is not installed.')
+            meter = otel_metrics.get_meter('esputnik')
+
+        self.duration = meter.create_histogram(
+            f'{prefix}.request.phase.duration',
+            unit='s',
+            description='Time spent in phases of API requests.'
+        )
+        self.bytes = meter.create_counter(
+            f'{prefix}.request.bytes',
+            unit='By',
+            description='Size of request and response bodies.'
+        )
+        self.responses = meter.create_counter(
+            f'{prefix}.responses',
+            description='Responses by status code, "error" for failed requests.'
+        )
+
+    def on_request(self, metrics: RequestMetrics) -> None:
+        attributes = {'endpoint': metrics.endpoint, 'method': metrics.method}
+        for phase in _REQUEST_PHASES:
+            self.duration.record(
+                getattr(metrics, phase), dict(attributes, phase=phase))
+        self.bytes.add(
+            metrics.request_bytes, dict(attributes, direction='out'))
+        self.bytes.add(
+            metrics.response_bytes, dict(attributes, direction='in'))
+        status = 'error' if metrics.error is not None \
+            else str(metrics.status_code)
+        self.responses.add(1, dict(attributes, status=status))
+
+    def on_parse(self, method: str, endpoint: str, seconds: float) -> None:
+        self.duration.record(
+            seconds, {'endpoint': endpoint, 'method': method, 'phase': 'parse'})
@@ -0,0 +1,166 @@
+"""
+Deadlines and hedging of requests, to bound tail latency.
+
+Timeouts are set per client with ``timeout`` option and per call.
+Hedging is enabled per client with ``hedge`` option and applies to GET
+requests only, as they are idempotent: when response is slower than
+usual for the endpoint, a backup request is sent and the first response
+of the two is taken.
+"""
+
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+
+from esputnik.instrumentation import Histogram, endpoint_name
+
+__all__ = (
+    'Timeout',
+    'HedgePolicy',
+    'fit_delay'
+)
+
+
+class Timeout(NamedTuple):
+    """
+    Timeouts of a call in seconds, not limited if None.
+
+    Attributes:
+        connect (float, optional): Time to open connection.
+        read (float, optional): Time to wait for every chunk of response.
+        total (float, optional): Time of the whole call, including
+            retries with delays between them.
+    """
+    connect: Optional[float] = None
+    read: Optional[float] = None
+    total: Optional[float] = None
+
+    def override(self, other: Optional['Timeout']) -> 'Timeout':
+        """
+        Returns timeouts of other, the ones of self where they are not set.
+        """
+        if other is None:
+            return self
+        return Timeout(*(
+            y if y is not None else x for x, y in zip(self, other)))
+
+    def get_deadline(self) -> Optional[float]:
+        """
+        Returns ``time.monotonic`` value the call must end by.
+        """
+        if self.total is None:
+            return None
+        return time.monotonic() + self.total
+
+    def for_attempt(self, deadline: Optional[float]) -> Optional['Timeout']:
+        """
+        Returns timeouts of a single attempt, cut to time left
+        until deadline, or None if deadline has passed.
+        """
+        if deadline is None:
+            return self
+        left = deadline - time.monotonic()
+        if left <= 0:
+            return None
+        return Timeout(
+            connect=left if self.connect is None else min(self.connect, left),
+            read=left if self.read is None else min(self.read, left),
+            total=left
+        )
+
+
+def fit_delay(
+        delay: Optional[float],
+        deadline: Optional[float]
+) -> Optional[float]:
+    """
+    Returns delay before retry, None if retry would end after deadline.
+    """
+    if delay is None or deadline is None:
+        return delay
+    if time.monotonic() + delay >= deadline:
+        return None
+    return delay
+
+
+class HedgePolicy:
+    """
+    Decides when to send backup of a slow request: after ``percentile``
+    of latencies of the endpoint, so about ``100 - percentile``
+    percent of requests are hedged. Thread safe, may be shared
+    by many clients.
+
+    Attributes:
+        percentile (float): Percentile of latencies to wait before backup.
+        min_samples (int): Amount of latencies of the endpoint to collect
+            before its requests are hedged.
+        min_delay (float): Min delay before backup in seconds.
+        max_delay (float, optional): Max delay before backup in seconds.
+        refresh (int): Delay is computed again after that many
+            new latencies.
+        hedges (int): Amount of sent backups.
+        wins (int): Amount of backups that responded first.
+    """
+
+    def __init__(
+            self,
+            percentile: float = 95,
+            min_samples: int = 20,
+            min_delay: float = 0.005,
+            max_delay: float = None,
+            refresh: int = 16
+    ) -> None:
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.refresh = refresh
+        self.hedges = 0
+        self.wins = 0
+        self._lock = threading.Lock()
+        self._histograms = {}  # type: Dict[str, Histogram]
+        self._delays = {}  # type: Dict[str, float]
+
+    def record(self, path: str, latency: float) -> None:
+        """
+        Records latency of successful request.
+        """
+        endpoint = endpoint_name(path)
+        with self._lock:
+            histogram = self._histograms.get(endpoint)
+            if histogram is None:
+                histogram = self._histograms[endpoint] = Histogram()
+            histogram.record(latency)
+
+            count = histogram.count
+            if count >= self.min_samples and \
+                    (endpoint not in self._delays or
+                     count % self.refresh == 0):
+                delay = max(
+                    histogram.percentile(self.percentile), self.min_delay)
+                if self.max_delay is not None:
+                    delay = min(delay, self.max_delay)
+                self._delays[endpoint] = delay
+
+    def get_delay(self, path: str) -> Optional[float]:
+        """
+        Returns seconds to wait before backup request,
+        None if there are not enough latencies yet.
+        """
+        return self._delays.get(endpoint_name(path))
+
+    def count(self, won: bool) -> None:
+        """
+        Counts sent backup.
+        """
+        with self._lock:
+            self.hedges += 1
+            if won:
+                self.wins += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._delays.clear()
+            self.hedges = 0
+            self.wins = 0
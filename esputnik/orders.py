@@ -0,0 +1,284 @@
+"""
+Bulk sending of orders.
+
+Orders are validated and serialized one by one, in a pool of processes
+for CPU heavy catalogs. Invalid orders are quarantined with their errors
+instead of failing the whole batch, valid ones are packed into requests
+bounded by amount and size and sent concurrently.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import (
+    Any, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+)
+
+from trafaret import DataError
+
+from esputnik.client import is_success
+from esputnik.consts import ORDERS_BATCH_SIZE
+from esputnik.esputnik import BatchResult
+from esputnik.serializers import JSONSerializer
+from esputnik.utils import BodyPacker, bounded_map, chunked, ordered_map
+
+__all__ = (
+    'SENT',
+    'FAILED',
+    'INVALID',
+    'OrderOutcome',
+    'QuarantinedOrder',
+    'OrdersResult',
+    'OrderPipeline'
+)
+
+
+SENT = 'sent'
+FAILED = 'failed'
+INVALID = 'invalid'
+
+_HEAD = b'{"orders": ['
+
+
+OrderOutcome = NamedTuple('OrderOutcome', [
+    ('index', int),
+    ('order_id', Any),
+    ('status', str),
+    ('batch', Optional[int]),
+    ('error', Any)
+])
+OrderOutcome.__new__.__defaults__ = (None, None)  # type: ignore
+
+QuarantinedOrder = NamedTuple('QuarantinedOrder', [
+    ('index', int),
+    ('order', Dict),
+    ('errors', Any)
+])
+
+
+class OrdersResult(NamedTuple):
+    total: int
+    sent: int
+    invalid: int
+    failed: int
+    outcomes: List[OrderOutcome]
+    quarantine: List[QuarantinedOrder]
+    batches: List[BatchResult]
+
+
+def _get_order_id(order: Any) -> Any:
+    return order.get('id') if isinstance(order, dict) else None
+
+
+def validate_orders(
+        orders: List[Dict],
+        serializer: JSONSerializer
+) -> List[Tuple[Optional[bytes], Any]]:
+    """
+    Transforms orders with the ``ORDER`` template and serializes them.
+    Runs in worker processes, so errors are returned as plain data
+    that can be pickled.
+
+    Returns:
+        List[Tuple[Optional[bytes], Any]]: pairs of serialized order and
+            None, or None and errors of trafaret as dict (message if
+            the order can not be serialized), in order of orders.
+    """
+    from esputnik.streaming import stream_order
+
+    prepare = stream_order.prepare_record
+    dumps = serializer.dumps
+    results = []  # type: List[Tuple[Optional[bytes], Any]]
+    for order in orders:
+        try:
+            results.append((dumps(prepare(order)), None))
+        except DataError as e:
+            results.append((None, e.as_dict(value=True)))
+        except (TypeError, ValueError) as e:
+            results.append((None, str(e)))
+    return results
+
+
+class OrderPipeline:
+    """
+    Sends any amount of orders, validating them off the request path.
+
+    Attributes:
+        adaptor (ESputnikAPIAdaptor): Adaptor to send orders with.
+        max_orders (int): Max amount of orders in one request.
+        max_bytes (int): Max size of request body in bytes.
+        workers (int): Amount of concurrent requests.
+        processes (int): Amount of processes to validate orders in,
+            orders are validated in the calling thread if 0.
+        chunk_size (int): Amount of orders passed to a process at once.
+    """
+
+    def __init__(
+            self,
+            adaptor,
+            max_orders: int = ORDERS_BATCH_SIZE,
+            max_bytes: int = 1024 * 1024,
+            workers: int = 4,
+            processes: int = 0,
+            chunk_size: int = 500
+    ) -> None:
+        self.adaptor = adaptor
+        self.max_orders = max_orders
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.processes = processes
+        self.chunk_size = chunk_size
+
+    def validate(
+            self,
+            orders: Iterable[Dict]
+    ) -> Iterator[Tuple[int, Dict, Optional[bytes], Any]]:
+        """
+        Validates orders, keeping at most two chunks per process
+        in flight.
+
+        Yields:
+            Tuple[int, Dict, Optional[bytes], Any]: index, order,
+                serialized order and errors, in order of orders.
+        """
+        func = partial(
+            validate_orders, serializer=self.adaptor.client.serializer)
+        # Chunks are kept until their results come back in the same order.
+        pending = deque()  # type: Deque[List[Dict]]
+
+        def remember(chunks):
+            for chunk in chunks:
+                pending.append(chunk)
+                yield chunk
+
+        chunks = remember(chunked(orders, self.chunk_size))
+        executor = None
+        if self.processes:
+            executor = ProcessPoolExecutor(self.processes)
+            results = ordered_map(
+                func, chunks, self.processes * 2, executor)
+        else:
+            results = map(func, chunks)
+
+        try:
+            index = 0
+            for validated in results:
+                chunk = pending.popleft()
+                for order, (body, errors) in zip(chunk, validated):
+                    yield index, order, body, errors
+                    index += 1
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def pack(
+            self,
+            validated: Iterable[Tuple[int, Dict, Optional[bytes], Any]],
+            quarantine: List[QuarantinedOrder]
+    ) -> Iterator[Tuple[List[Tuple[int, Any]], bytes]]:
+        """
+        Packs valid orders into request bodies, invalid ones and orders
+        that alone exceed ``max_bytes`` are added to quarantine.
+
+        Yields:
+            Tuple[List[Tuple[int, Any]], bytes]: indexes and ids
+                of orders, and body.
+        """
+        packer = BodyPacker(_HEAD, self.max_orders, self.max_bytes)
+
+        for index, order, body, errors in validated:
+            if body is not None and not packer.fits(body):
+                body = None
+                errors = f'Order does not fit into {self.max_bytes} bytes.'
+            if body is None:
+                quarantine.append(QuarantinedOrder(index, order, errors))
+                continue
+
+            packed = packer.add((index, _get_order_id(order)), body)
+            if packed is not None:
+                yield packed
+
+        packed = packer.flush()
+        if packed is not None:
+            yield packed
+
+    def send(self, orders: Iterable[Dict]) -> OrdersResult:
+        """
+        Validates and sends all orders.
+
+        Args:
+            orders (Iterable[Dict]): orders of the ``ORDER`` template.
+                May be a generator, it is consumed as requests are sent.
+
+        Returns:
+            OrdersResult: counters, outcome of every order ordered by
+                index, quarantined invalid orders with their errors and
+                results of requests ordered by batch index. Request that
+                failed to send has ``error`` instead of response.
+        """
+        quarantine = []  # type: List[QuarantinedOrder]
+
+        def post(batch):
+            ids, body = batch
+            try:
+                response = self.adaptor.client.post('orders', body)
+            except Exception as e:
+                return ids, BatchResult(None, len(ids), None, e)
+            return ids, BatchResult(None, len(ids), response, None)
+
+        return self.summarize(
+            bounded_map(
+                post,
+                self.pack(self.validate(orders), quarantine),
+                self.workers),
+            quarantine
+        )
+
+    def summarize(
+            self,
+            results: Iterable[Tuple[int, Tuple[List[Tuple[int, Any]],
+                                               BatchResult]]],
+            quarantine: List[QuarantinedOrder]
+    ) -> OrdersResult:
+        """
+        Builds result of ``send`` from results of requests.
+
+        Args:
+            results (Iterable): batch index, indexes and ids of orders,
+                and result of request without index, of every batch.
+                Consumed before the quarantine is read.
+            quarantine (List[QuarantinedOrder]): filled by ``pack``.
+        """
+        batches = []
+        outcomes = []  # type: List[OrderOutcome]
+        for batch_index, (ids, result) in results:
+            result = result._replace(index=batch_index)
+            batches.append(result)
+
+            if result.response is not None and is_success(result.response):
+                status, error = SENT, None
+            else:
+                status, error = FAILED, result.error or result.response
+            outcomes.extend(
+                OrderOutcome(index, order_id, status, batch_index, error)
+                for index, order_id in ids
+            )
+
+        outcomes.extend(
+            OrderOutcome(
+                x.index, _get_order_id(x.order), INVALID, None, x.errors)
+            for x in quarantine
+        )
+        outcomes.sort(key=lambda x: x.index)
+        batches.sort(key=lambda x: x.index)
+
+        sent = sum(1 for x in outcomes if x.status == SENT)
+        return OrdersResult(
+            total=len(outcomes),
+            sent=sent,
+            invalid=len(quarantine),
+            failed=len(outcomes) - sent - len(quarantine),
+            outcomes=outcomes,
+            quarantine=quarantine,
+            batches=batches
+        )
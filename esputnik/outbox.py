@@ -0,0 +1,415 @@
+"""
+Durable outbox for requests that must not be lost.
+
+Requests are built by the adaptor as usual, but instead of being sent
+they are appended to SQLite database in WAL mode. Replay worker sends
+them later in order, with retries, and marks them as sent.
+
+Request is marked as in flight before it is sent and as sent right
+after its response. Requests that are not idempotent (see RetryPolicy)
+are never sent twice: when the server may have processed them, i.e. on
+5xx, connection error or crash in flight, they are held for review
+instead of being retried. Only idempotent requests are sent again.
+"""
+
+import copy
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from esputnik.client import Response
+from esputnik.retry import RetryPolicy
+
+__all__ = (
+    'Outbox',
+)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dedupe_key TEXT UNIQUE,
+    method TEXT NOT NULL,
+    path TEXT NOT NULL,
+    body BLOB,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    sent REAL,
+    status_code INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_pending
+    ON outbox (state, next_attempt, id);
+"""
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+DEAD = 'dead'
+REVIEW = 'review'
+
+
+class _CapturingClient:
+    """
+    Stands in for request client of the adaptor and keeps the request
+    instead of sending it. Timeouts of the call do not apply to replay.
+    """
+
+    def __init__(self, client) -> None:
+        self.serializer = client.serializer
+        self.hooks = ()
+        self._local = threading.local()
+
+    def _capture(self, method: str, path: str, data=None) -> Response:
+        if isinstance(data, Iterator):
+            data = b''.join(data)
+        if isinstance(data, str):
+            data = data.encode()
+        self._local.request = (method, path, data)
+        return Response(status_code=202, data=None)
+
+    def get(self, path: str, data=None, timeout=None) -> Response:
+        return self._capture('get', path, data)
+
+    def post(self, path: str, data=None, timeout=None) -> Response:
+        return self._capture('post', path, data)
+
+    def put(self, path: str, data=None, timeout=None) -> Response:
+        return self._capture('put', path, data)
+
+    def delete(self, path: str, timeout=None) -> Response:
+        return self._capture('delete', path)
+
+    def pop(self) -> Tuple:
+        request = self._local.request
+        del self._local.request
+        return request
+
+
+class Outbox:
+    """
+    Attributes:
+        adaptor (ESputnikAPIAdaptor): Adaptor to build and send requests.
+        path (str): Path to SQLite database file.
+        batch_size (int): Amount of requests loaded for replay at once.
+        max_attempts (int): Requests that failed so many times are marked
+            as dead and not sent anymore.
+        retry (RetryPolicy): Policy that decides which failures are
+            retried and the delay between attempts. Its ``total`` is not
+            used, ``max_attempts`` applies instead.
+        synchronous (str): SQLite synchronous mode, 'NORMAL' survives
+            process crash, 'FULL' survives power loss as well.
+    """
+
+    def __init__(
+            self,
+            adaptor,
+            path: str,
+            batch_size: int = 100,
+            max_attempts: int = 10,
+            retry: RetryPolicy = None,
+            synchronous: str = 'NORMAL'
+    ) -> None:
+        self.adaptor = adaptor
+        self.path = path
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry = retry or RetryPolicy(backoff_factor=1, max_backoff=300)
+
+        self._lock = threading.Lock()
+        # Rows are read and marked under _lock, but sent outside of it.
+        # Replays hold this one for the whole run, so they do not send
+        # the same rows at once.
+        self._replay_lock = threading.Lock()
+        self._db = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(f'PRAGMA synchronous={synchronous}')
+        self._db.executescript(SCHEMA)
+        self._recover()
+
+        self._capturing = _CapturingClient(adaptor.client)
+        self._recorder = copy.copy(adaptor)
+        self._recorder.client = self._capturing
+        self._recorder.cache = None
+
+        self._worker = None  # type: Optional[threading.Thread]
+        self._stopped = threading.Event()
+
+    def __enter__(self) -> 'Outbox':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def put(
+            self,
+            method: str,
+            path: str,
+            body: bytes = None,
+            dedupe_key: str = None
+    ) -> bool:
+        """
+        Appends request to the outbox.
+
+        Returns:
+            bool: False if request with the same dedupe key was already put.
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                'INSERT OR IGNORE INTO outbox '
+                '(dedupe_key, method, path, body, created) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (dedupe_key, method, path, body, time.time())
+            )
+        return cursor.rowcount == 1
+
+    def record(self, name: str, *args, dedupe_key: str = None, **kwargs):
+        """
+        Builds request with adaptor method and appends it to the outbox.
+        Data is validated right away.
+
+        Args:
+            name (str): name of adaptor method, e.g. 'message_sms'.
+            *args: arguments of the method.
+            dedupe_key (str, optional): unique key of the request,
+                request with the same key is put only once.
+            **kwargs: keyword arguments of the method.
+
+        Returns:
+            bool: False if request with the same dedupe key was already put.
+        """
+        getattr(self._recorder, name)(*args, **kwargs)
+        method, path, body = self._capturing.pop()
+        return self.put(method, path, body, dedupe_key)
+
+    def message_sms(self, data: Dict, dedupe_key: str = None) -> bool:
+        return self.record('message_sms', data, dedupe_key=dedupe_key)
+
+    def message_email(self, data: Dict, dedupe_key: str = None) -> bool:
+        return self.record('message_email', data, dedupe_key=dedupe_key)
+
+    def message_viber(self, data: Dict, dedupe_key: str = None) -> bool:
+        return self.record('message_viber', data, dedupe_key=dedupe_key)
+
+    def message_smartsend(
+            self,
+            message_id: str,
+            data: Dict,
+            dedupe_key: str = None
+    ) -> bool:
+        return self.record(
+            'message_smartsend', message_id, data, dedupe_key=dedupe_key)
+
+    def orders(self, data: Dict, dedupe_key: str = None) -> bool:
+        return self.record('orders', data, dedupe_key=dedupe_key)
+
+    def pending(self) -> int:
+        """
+        Returns amount of requests waiting to be sent.
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT COUNT(*) FROM outbox WHERE state = ?', (PENDING,)
+            ).fetchone()
+        return row[0]
+
+    def _recover(self) -> None:
+        # Requests left in flight by a crash may have been processed.
+        rows = self._db.execute(
+            'SELECT id, method, path FROM outbox WHERE state = ?',
+            (SENDING,)
+        ).fetchall()
+        for id_, method, path in rows:
+            state = PENDING if self.retry.is_idempotent(method, path) \
+                else REVIEW
+            self._db.execute(
+                'UPDATE outbox SET state = ? WHERE id = ?', (state, id_))
+
+    def held(self) -> List[Tuple[int, str, str, Optional[bytes]]]:
+        """
+        Returns requests held for review, since they may have been
+        processed by the server already.
+
+        Returns:
+            List[Tuple[int, str, str, Optional[bytes]]]: id, method, path
+            and body of every held request.
+        """
+        with self._lock:
+            return self._db.execute(
+                'SELECT id, method, path, body FROM outbox '
+                'WHERE state = ? ORDER BY id', (REVIEW,)
+            ).fetchall()
+
+    def requeue(self, id_: int) -> bool:
+        """
+        Puts request held for review or dead back to the queue,
+        e.g. once it is known that the server did not process it.
+
+        Returns:
+            bool: False if there is no such held or dead request.
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                'UPDATE outbox SET state = ?, attempts = 0, next_attempt = 0 '
+                'WHERE id = ? AND state IN (?, ?)',
+                (PENDING, id_, REVIEW, DEAD)
+            )
+        return cursor.rowcount == 1
+
+    def _send(self, method: str, path: str, body: Optional[bytes]):
+        sender = getattr(self.adaptor.client, method)
+        if method in ('get', 'delete'):
+            return sender(path)
+        return sender(path, body)
+
+    def replay(self, limit: int = None) -> Tuple[int, int]:
+        """
+        Sends due requests in order, batch by batch.
+
+        Requests rejected with 429 are retried later with backoff, as well
+        as idempotent requests failed with 5xx or connection error.
+        Requests that are not idempotent are held for review after such
+        failures, since the server may have processed them. Other
+        failures mark request as dead.
+        Concurrent replays, e.g. a manual one and the one of the worker,
+        run one after another, so a request is not sent twice.
+
+        Args:
+            limit (int, optional): max amount of requests to send.
+
+        Returns:
+            Tuple[int, int]: amount of sent and failed requests.
+        """
+        with self._replay_lock:
+            return self._replay(limit)
+
+    def _replay(self, limit: Optional[int]) -> Tuple[int, int]:
+        sent = failed = 0
+
+        while limit is None or sent + failed < limit:
+            size = self.batch_size
+            if limit is not None:
+                size = min(size, limit - sent - failed)
+
+            with self._lock:
+                rows = self._db.execute(
+                    'SELECT id, method, path, body, attempts FROM outbox '
+                    'WHERE state = ? AND next_attempt <= ? '
+                    'ORDER BY id LIMIT ?',
+                    (PENDING, time.time(), size)
+                ).fetchall()
+
+            if not rows or self._stopped.is_set():
+                break
+
+            for id_, method, path, body, attempts in rows:
+                with self._lock:
+                    self._db.execute(
+                        'UPDATE outbox SET state = ? WHERE id = ?',
+                        (SENDING, id_)
+                    )
+
+                status_code = None
+                error = None  # type: Optional[Exception]
+                try:
+                    response = self._send(method, path, body)
+                    status_code = response.status_code
+                except Exception as e:
+                    error = e
+
+                if status_code is not None and 200 <= status_code < 300:
+                    self._mark_sent(id_, status_code)
+                    sent += 1
+                    continue
+
+                failed += 1
+                if self.retry.is_retryable(method, path, status_code, error):
+                    if attempts + 1 >= self.max_attempts:
+                        state, delay = DEAD, 0.0
+                    else:
+                        state = PENDING
+                        delay = self.retry.get_backoff(attempts)
+                elif error is not None or \
+                        status_code in self.retry.statuses:
+                    state, delay = REVIEW, 0.0
+                else:
+                    state, delay = DEAD, 0.0
+                self._mark_failed(id_, state, delay, status_code,
+                                  None if error is None else repr(error))
+
+        return sent, failed
+
+    def _mark_sent(self, id_: int, status_code: int) -> None:
+        # Body is not needed anymore, dedupe key is kept.
+        with self._lock:
+            self._db.execute(
+                'UPDATE outbox SET state = ?, sent = ?, status_code = ?, '
+                'attempts = attempts + 1, body = NULL WHERE id = ?',
+                (SENT, time.time(), status_code, id_)
+            )
+
+    def _mark_failed(
+            self,
+            id_: int,
+            state: str,
+            delay: float,
+            status_code: Optional[int],
+            error: Optional[str]
+    ) -> None:
+        with self._lock:
+            self._db.execute(
+                'UPDATE outbox SET state = ?, attempts = attempts + 1, '
+                'next_attempt = ?, status_code = ?, error = ? WHERE id = ?',
+                (state, time.time() + delay, status_code, error, id_)
+            )
+
+    def purge(self, older_than: float) -> int:
+        """
+        Deletes requests sent more than ``older_than`` seconds ago.
+        Their dedupe keys are forgotten as well.
+
+        Returns:
+            int: amount of deleted requests.
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                'DELETE FROM outbox WHERE state = ? AND sent < ?',
+                (SENT, time.time() - older_than)
+            )
+        return cursor.rowcount
+
+    def start(self, interval: float = 1.0) -> None:
+        """
+        Starts background thread that replays the outbox
+        every ``interval`` seconds.
+        """
+        if self._worker is not None:
+            return
+        self._stopped.clear()
+        self._worker = threading.Thread(
+            target=self._run, args=(interval,), daemon=True)
+        self._worker.start()
+
+    def _run(self, interval: float) -> None:
+        while not self._stopped.is_set():
+            self.replay()
+            self._stopped.wait(interval)
+
+    def stop(self) -> None:
+        """
+        Stops background replay after the current batch.
+        """
+        if self._worker is None:
+            return
+        self._stopped.set()
+        self._worker.join()
+        self._worker = None
+        self._stopped.clear()
+
+    def close(self) -> None:
+        self.stop()
+        self._db.close()
@@ -0,0 +1,236 @@
+"""
+Helpers to page through list endpoints with startindex/maxrows params.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from esputnik.client import Response
+from esputnik.exceptions import ResponseError
+from esputnik.utils import lazy_import, ordered_map
+
+asyncio = lazy_import('asyncio')
+
+__all__ = (
+    'get_total_count',
+    'get_page_items',
+    'iter_pages',
+    'aiter_pages',
+    'export_pages',
+    'aexport_pages'
+)
+
+# Index of the first record, API counts from one.
+FIRST_INDEX = 1
+
+
+def get_total_count(response: Response) -> Optional[int]:
+    """
+    Returns total amount of records from TotalCount header, if any.
+    """
+    value = (response.headers or {}).get('TotalCount')
+    return int(value) if value is not None else None
+
+
+def get_page_items(response: Response) -> List[Dict]:
+    """
+    Returns records of the page.
+
+    Raises:
+        ResponseError: Server responded with error.
+    """
+    if not 200 <= response.status_code < 300:
+        raise ResponseError(
+            code=response.status_code,
+            message=f'Failed to fetch page: {response.data!r}',
+            response=response
+        )
+    data = response.data
+    if isinstance(data, dict):
+        return data.get('contacts') or []
+    return data or []
+
+
+def _has_next(response: Response, items: List, start: int, size: int) -> bool:
+    if not items:
+        return False
+    total = get_total_count(response)
+    if total is not None:
+        return start + size <= total
+    return len(items) >= size
+
+
+def iter_pages(
+        fetch: Callable[[int], Response],
+        page_size: int,
+        prefetch: bool = False,
+        start: int = FIRST_INDEX
+) -> Iterator[Dict]:
+    """
+    Yields records page by page, only one or two pages are kept in memory.
+
+    Args:
+        fetch (Callable[[int], Response]): function to get page by index
+            of its first record.
+        page_size (int): amount of records in page.
+        prefetch (bool, optional): fetch next page in background thread
+            while current one is being consumed.
+        start (int, optional): index of the first record.
+    """
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    response = fetch(start)
+
+    try:
+        while True:
+            items = get_page_items(response)
+            has_next = _has_next(response, items, start, page_size)
+            start += page_size
+
+            future = None
+            if has_next and executor is not None:
+                future = executor.submit(fetch, start)
+
+            yield from items
+
+            if not has_next:
+                return
+            response = future.result() if future else fetch(start)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+async def aiter_pages(
+        fetch: Callable,
+        page_size: int,
+        prefetch: bool = False,
+        start: int = FIRST_INDEX
+) -> AsyncIterator[Dict]:
+    """
+    Same as ``iter_pages``, but ``fetch`` returns awaitable and
+    next page is prefetched as a task.
+    """
+    response = await fetch(start)
+    task = None
+
+    try:
+        while True:
+            items = get_page_items(response)
+            has_next = _has_next(response, items, start, page_size)
+            start += page_size
+
+            if has_next and prefetch:
+                task = asyncio.ensure_future(fetch(start))
+
+            for item in items:
+                yield item
+
+            if not has_next:
+                return
+            response = await task if task else await fetch(start)
+            task = None
+    finally:
+        if task is not None:
+            task.cancel()
+
+
+def _page_starts(response: Response, page_size: int) -> Optional[range]:
+    """
+    Returns indexes of all pages after the first one, if TotalCount is known.
+    """
+    total = get_total_count(response)
+    if total is None:
+        return None
+    return range(FIRST_INDEX + page_size, total + 1, page_size)
+
+
+def export_pages(
+        fetch: Callable[[int], Response],
+        sink: Callable[[Dict], None],
+        page_size: int,
+        workers: int
+) -> int:
+    """
+    Fetches all pages concurrently and passes records to sink in order.
+
+    Offsets of pages are computed from TotalCount of the first page,
+    if the header is missing pages are fetched one by one.
+
+    Args:
+        fetch (Callable[[int], Response]): function to get page by index
+            of its first record.
+        sink (Callable[[Dict], None]): function to call with every record.
+        page_size (int): amount of records in page.
+        workers (int): amount of concurrent requests.
+
+    Returns:
+        int: amount of exported records.
+    """
+    response = fetch(FIRST_INDEX)
+    items = get_page_items(response)
+    count = len(items)
+    for item in items:
+        sink(item)
+
+    starts = _page_starts(response, page_size)
+    if starts is None:
+        if not _has_next(response, items, FIRST_INDEX, page_size):
+            return count
+        records = iter_pages(
+            fetch, page_size, start=FIRST_INDEX + page_size)
+    else:
+        records = (
+            item
+            for response in ordered_map(fetch, starts, workers)
+            for item in get_page_items(response)
+        )
+
+    for item in records:
+        sink(item)
+        count += 1
+    return count
+
+
+async def aexport_pages(
+        fetch: Callable,
+        sink: Callable[[Dict], None],
+        page_size: int,
+        workers: int
+) -> int:
+    """
+    Same as ``export_pages``, but ``fetch`` returns awaitable and
+    pages are fetched as tasks.
+    """
+    response = await fetch(FIRST_INDEX)
+    items = get_page_items(response)
+    count = len(items)
+    for item in items:
+        sink(item)
+
+    starts = _page_starts(response, page_size)
+    if starts is None:
+        if not _has_next(response, items, FIRST_INDEX, page_size):
+            return count
+        async for item in aiter_pages(
+                fetch, page_size, start=FIRST_INDEX + page_size):
+            sink(item)
+            count += 1
+        return count
+
+    remaining = iter(starts)
+    pending = deque(
+        asyncio.ensure_future(fetch(x)) for x in islice(remaining, workers))
+    try:
+        while pending:
+            response = await pending.popleft()
+            for start in islice(remaining, 1):
+                pending.append(asyncio.ensure_future(fetch(start)))
+            for item in get_page_items(response):
+                sink(item)
+                count += 1
+    finally:
+        for task in pending:
+            task.cancel()
+    return count
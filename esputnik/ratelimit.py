@@ -0,0 +1,175 @@
+"""
+Client side rate limiters, used by request clients to stay within
+the account request quota.
+
+Limits are set per endpoint family, see ``endpoint_family``.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+__all__ = (
+    'ENDPOINT_FAMILIES',
+    'endpoint_family',
+    'TokenBucketLimiter',
+    'FileTokenBucketLimiter'
+)
+
+
+# Path prefix -> family name.
+ENDPOINT_FAMILIES = (
+    ('message', 'messages'),
+    ('event', 'events'),
+    ('contact', 'contacts'),
+    ('group', 'contacts'),
+    ('emails', 'contacts'),
+    ('orders', 'orders'),
+)
+
+
+def endpoint_family(path: str) -> str:
+    """
+    Returns family name of the endpoint, 'default' for unknown ones.
+
+    Args:
+        path (str): relative path of request, e.g. 'message/sms'
+    """
+    path = path.lstrip('/')
+    for prefix, family in ENDPOINT_FAMILIES:
+        if path.startswith(prefix):
+            return family
+    return 'default'
+
+
+def _take(
+        state: Tuple[float, float],
+        rate: float,
+        burst: float,
+        now: float
+) -> Tuple[Tuple[float, float], float]:
+    """
+    Takes one token from bucket state.
+
+    Token amount may go below zero, then the caller has to wait until
+    the debt is refilled. That keeps waiting callers in order without
+    polling the bucket.
+
+    Returns:
+        Tuple: new state and seconds to wait.
+    """
+    tokens, updated = state
+    tokens = min(burst, tokens + (now - updated) * rate) - 1
+    delay = -tokens / rate if tokens < 0 else 0.0
+    return (tokens, now), delay
+
+
+class TokenBucketLimiter:
+    """
+    In-process token bucket limiter, can be shared by many clients
+    and threads.
+
+    Attributes:
+        rates (Dict[str, float]): Requests per second by endpoint family,
+            families without rate are not limited.
+        burst (float, optional): Bucket size, defaults to one second
+            worth of requests.
+    """
+
+    def __init__(self, rates: Dict[str, float], burst: float = None) -> None:
+        self.rates = rates
+        self.burst = burst
+        self._buckets = {}  # type: Dict[str, Tuple[float, float]]
+        self._lock = threading.Lock()
+
+    def get_burst(self, family: str) -> float:
+        return self.burst or max(1.0, self.rates[family])
+
+    def reserve(self, path: str) -> float:
+        """
+        Takes token for request to given path.
+
+        Returns:
+            float: seconds to wait before sending request.
+        """
+        family = endpoint_family(path)
+        rate = self.rates.get(family)
+        if not rate:
+            return 0.0
+
+        burst = self.get_burst(family)
+        now = time.monotonic()
+
+        with self._lock:
+            state = self._buckets.get(family, (burst, now))
+            self._buckets[family], delay = _take(state, rate, burst, now)
+
+        return delay
+
+    def acquire(self, path: str) -> None:
+        """
+        Blocks until request to given path is allowed.
+        """
+        delay = self.reserve(path)
+        if delay:
+            time.sleep(delay)
+
+
+class FileTokenBucketLimiter(TokenBucketLimiter):
+    """
+    Token bucket limiter that keeps buckets in a file, so all processes on
+    the host using the same file share one limit.
+    File access is serialized with ``flock``, available on Unix only.
+
+    Attributes:
+        path (str): Path to the state file, created if missing.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            rates: Dict[str, float],
+            burst: float = None
+    ) -> None:
+        if fcntl is None:
+            raise RuntimeError(
+                'FileTokenBucketLimiter requires fcntl module.')
+
+        self.path = path
+        super().__init__(rates, burst)
+
+    def reserve(self, path: str) -> float:
+        family = endpoint_family(path)
+        rate = self.rates.get(family)
+        if not rate:
+            return 0.0
+
+        burst = self.get_burst(family)
+
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                content = os.read(fd, 65536)
+                buckets = json.loads(content) if content else {}
+
+                # Wall clock, since monotonic one is not shared by processes.
+                now = time.time()
+                state = buckets.get(family, (burst, now))
+                buckets[family], delay = _take(state, rate, burst, now)
+
+                content = json.dumps(buckets).encode()
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.write(fd, content)
+                os.ftruncate(fd, len(content))
+            finally:
+                os.close(fd)
+
+        return delay
@@ -0,0 +1,187 @@
+"""
+Retry policy used by request clients to resend failed requests.
+"""
+
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Iterable, Mapping, Optional
+
+__all__ = (
+    'IDEMPOTENT_METHODS',
+    'IDEMPOTENT_PATHS',
+    'RetryBudget',
+    'RetryPolicy'
+)
+
+
+IDEMPOTENT_METHODS = (
+    'get',
+    'put',
+    'delete'
+)
+
+# POST endpoints that create or update records by a natural key,
+# so sending them twice has the same effect as sending once.
+IDEMPOTENT_PATHS = (
+    'contacts',
+    'contact/subscribe',
+    'contacts/upload',
+    'emails/unsubscribed/add',
+    'emails/unsubscribed/delete',
+    'orders'
+)
+
+
+class RetryBudget:
+    """
+    Limits retries to a share of the regular traffic, so a failing server
+    is not flooded with retries from every caller at once.
+
+    Every request deposits ``ratio`` tokens (up to ``max_tokens``),
+    every retry withdraws one token.
+
+    Attributes:
+        ratio (float): Retries allowed per request.
+        max_tokens (float): Max amount of saved up retries.
+    """
+
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 10) -> None:
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class RetryPolicy:
+    """
+    Decides whether failed request should be sent again and how long
+    to wait before that.
+
+    Rejected requests (429) are retried for every endpoint, since the
+    server did not process them. Server errors and connection errors are
+    retried only for idempotent requests, so messages are never sent twice.
+
+    Attributes:
+        total (int): Max amount of retries for one request.
+        backoff_factor (float): Base delay in seconds, doubled on every
+            attempt. Actual delay is picked randomly up to that value.
+        max_backoff (float): Max delay in seconds, applied to
+            ``Retry-After`` as well.
+        statuses (Iterable[int]): Server error statuses to retry.
+        methods (Iterable[str]): Idempotent methods.
+        paths (Iterable[str]): Idempotent POST paths.
+        budget (RetryBudget, optional): Shared retry budget.
+    """
+
+    def __init__(
+            self,
+            total: int = 3,
+            backoff_factor: float = 0.5,
+            max_backoff: float = 30,
+            statuses: Iterable[int] = (500, 502, 503, 504),
+            methods: Iterable[str] = IDEMPOTENT_METHODS,
+            paths: Iterable[str] = IDEMPOTENT_PATHS,
+            budget: RetryBudget = None
+    ) -> None:
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(methods)
+        self.paths = frozenset(x.strip('/') for x in paths)
+        self.budget = budget if budget is not None else RetryBudget()
+
+    def is_idempotent(self, method: str, path: str) -> bool:
+        return method in self.methods or path.strip('/') in self.paths
+
+    def is_retryable(
+            self,
+            method: str,
+            path: str,
+            status_code: int = None,
+            error: Exception = None
+    ) -> bool:
+        if status_code == 429:
+            return True
+        if error is not None or status_code in self.statuses:
+            return self.is_idempotent(method, path)
+        return False
+
+    def get_backoff(self, retries: int) -> float:
+        """
+        Returns jittered exponential delay for given amount of retries done.
+        """
+        cap = min(self.max_backoff, self.backoff_factor * 2 ** retries)
+        return random.uniform(0, cap)  # nosec
+
+    def parse_retry_after(self, headers: Mapping = None) -> Optional[float]:
+        """
+        Returns delay from ``Retry-After`` header, which can be either
+        amount of seconds or HTTP date.
+        """
+        value = (headers or {}).get('Retry-After')
+        if not value:
+            return None
+
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                date = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            delay = (date - datetime.now(timezone.utc)).total_seconds()
+
+        return min(self.max_backoff, max(0.0, delay))
+
+    def get_delay(
+            self,
+            retries: int,
+            method: str,
+            path: str,
+            status_code: int = None,
+            headers: Mapping = None,
+            error: Exception = None
+    ) -> Optional[float]:
+        """
+        Returns delay before next attempt or None if request must not
+        be retried.
+
+        Args:
+            retries (int): Amount of retries already done.
+            method (str): REST method used.
+            path (str): Relative path of request.
+            status_code (int, optional): Response status.
+            headers (Mapping, optional): Response headers.
+            error (Exception, optional): Error raised while sending.
+        """
+        if retries == 0:
+            self.budget.deposit()
+
+        if retries >= self.total:
+            return None
+
+        if not self.is_retryable(method, path, status_code, error):
+            return None
+
+        if not self.budget.withdraw():
+            return None
+
+        delay = self.parse_retry_after(headers)
+        if delay is None:
+            delay = self.get_backoff(retries)
+
+        return delay
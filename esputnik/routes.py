@@ -0,0 +1,68 @@
+"""
+Urls of API paths, built once per client.
+"""
+
+from typing import Dict, Iterable
+
+__all__ = (
+    'ROUTES',
+    'RouteTable'
+)
+
+
+# Static paths used by the adaptor, joined with base url in advance.
+ROUTES = (
+    'version',
+    'account/info',
+    'addressbooks',
+    'balance',
+    'contact',
+    'contact/subscribe',
+    'contacts',
+    'contacts/upload',
+    'emails/unsubscribed/add',
+    'emails/unsubscribed/delete',
+    'event',
+    'orders',
+    'groups',
+    'message/email',
+    'message/sms',
+    'message/status',
+    'message/viber'
+)
+
+
+class RouteTable:
+    """
+    Maps relative paths to absolute urls.
+
+    Static routes are joined in advance, other paths (with ids) are
+    joined on first use and kept, as the same ids are often used
+    in a row. Kept paths are dropped when there are ``maxsize`` of them.
+
+    Attributes:
+        base_url (str): Url of the API version, ending with slash.
+        maxsize (int): Max amount of kept urls.
+    """
+
+    def __init__(
+            self,
+            base_url: str,
+            routes: Iterable[str] = ROUTES,
+            maxsize: int = 4096
+    ) -> None:
+        self.base_url = base_url
+        self.maxsize = maxsize
+        self._static = {x: self.join(x) for x in routes}  # type: Dict
+        self._urls = dict(self._static)
+
+    def join(self, path: str) -> str:
+        return f'{self.base_url}{path.strip("/")}/'
+
+    def url(self, path: str) -> str:
+        url = self._urls.get(path)
+        if url is None:
+            if len(self._urls) >= self.maxsize:
+                self._urls = dict(self._static)
+            url = self._urls[path] = self.join(path)
+        return url
@@ -0,0 +1,119 @@
+"""
+JSON backends used to encode request bodies and decode responses.
+
+Faster ``orjson`` or ``ujson`` are used when installed,
+standard ``json`` module otherwise. Bodies differ only in formatting
+(no spaces, non-ASCII characters are not escaped), except for data
+``orjson`` can not encode, see ``OrjsonSerializer``.
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None  # type: ignore
+
+__all__ = (
+    'JSONSerializer',
+    'OrjsonSerializer',
+    'UjsonSerializer',
+    'SERIALIZERS',
+    'get_serializer'
+)
+
+
+class JSONSerializer:
+    """
+    Serializer based on standard ``json`` module.
+    """
+    name = 'json'
+
+    def dumps(self, data: Any) -> bytes:
+        return json.dumps(data).encode()
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+
+class OrjsonSerializer(JSONSerializer):
+    """
+    Serializer based on ``orjson``, encodes straight into bytes.
+
+    ``orjson`` rejects some data the standard module accepts: integers
+    beyond 64 bits, non-string dict keys, ``Decimal`` and other unknown
+    types. Such data is encoded with the standard module instead, so the
+    serializer raises in the same cases as ``JSONSerializer``. NaN and
+    infinity are encoded as null rather than as invalid JSON.
+    """
+    name = 'orjson'
+
+    def __init__(self) -> None:
+        if orjson is None:
+            raise ImportError('orjson is not installed.')
+
+    def dumps(self, data: Any) -> bytes:
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            # orjson.JSONEncodeError is a TypeError.
+            return super().dumps(data)
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+
+
+class UjsonSerializer(JSONSerializer):
+    """
+    Serializer based on ``ujson``.
+    """
+    name = 'ujson'
+
+    def __init__(self) -> None:
+        if ujson is None:
+            raise ImportError('ujson is not installed.')
+
+    def dumps(self, data: Any) -> bytes:
+        return ujson.dumps(data, ensure_ascii=False).encode()
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return ujson.loads(data)
+
+
+# In order of preference.
+SERIALIZERS = (
+    OrjsonSerializer,
+    UjsonSerializer,
+    JSONSerializer
+)
+
+
+def get_serializer(name: str = None) -> JSONSerializer:
+    """
+    Returns serializer by name or the fastest one available.
+
+    Args:
+        name (str, optional): 'orjson', 'ujson' or 'json'.
+
+    Raises:
+        ValueError: Unknown name.
+        ImportError: Backend is not installed.
+    """
+    if name is not None:
+        for serializer_class in SERIALIZERS:
+            if serializer_class.name == name:
+                return serializer_class()
+        raise ValueError(f'Unknown serializer {name}.')
+
+    for serializer_class in SERIALIZERS:
+        try:
+            return serializer_class()
+        except ImportError:
+            continue
+    return JSONSerializer()
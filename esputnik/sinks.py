@@ -0,0 +1,57 @@
+"""
+Sinks to write exported contacts to.
+
+Any callable that takes a contact dict can be used as a sink.
+"""
+
+import csv
+from typing import Dict, IO, Iterable
+
+from esputnik.serializers import JSONSerializer
+
+__all__ = (
+    'CSVSink',
+    'NDJSONSink'
+)
+
+
+class CSVSink:
+    """
+    Writes contacts as rows of CSV file, missing fields are left empty
+    and unknown ones are skipped.
+
+    Attributes:
+        file (IO): Text file opened for writing with newline=''.
+        fieldnames (Iterable[str]): Columns to write.
+    """
+
+    def __init__(
+            self,
+            file: IO,
+            fieldnames: Iterable[str],
+            header: bool = True
+    ) -> None:
+        self.writer = csv.DictWriter(
+            file, fieldnames=list(fieldnames), extrasaction='ignore')
+        if header:
+            self.writer.writeheader()
+
+    def __call__(self, contact: Dict) -> None:
+        self.writer.writerow(contact)
+
+
+class NDJSONSink:
+    """
+    Writes contacts as lines of JSON.
+
+    Attributes:
+        file (IO): Binary file opened for writing.
+        serializer (JSONSerializer, optional): JSON backend to use.
+    """
+
+    def __init__(self, file: IO, serializer: JSONSerializer = None) -> None:
+        self.file = file
+        self.dumps = (serializer or JSONSerializer()).dumps
+
+    def __call__(self, contact: Dict) -> None:
+        self.file.write(self.dumps(contact) + b'\n')
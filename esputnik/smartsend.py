@@ -0,0 +1,157 @@
+"""
+Fan-out of smartsend messages to large amounts of recipients.
+"""
+
+from typing import Any, Iterable, Iterator, List, NamedTuple, Tuple
+
+from trafaret import DataError
+
+from esputnik.client import is_success
+from esputnik.esputnik import BatchResult
+from esputnik.exceptions import IncorrectDataError
+from esputnik.streaming import stream_smartsend_email
+from esputnik.utils import BodyPacker, bounded_map
+
+__all__ = (
+    'SmartsendResult',
+    'SmartsendDispatcher'
+)
+
+
+_HEAD = b'{"recipients": ['
+
+
+class SmartsendResult(NamedTuple):
+    recipients: int
+    sent: int
+    failed: int
+    chunks: List[BatchResult]
+
+
+class SmartsendDispatcher:
+    """
+    Sends ``message_smartsend`` to recipients given as pairs of
+    locator and params. Params are serialized one by one and recipients
+    are packed into requests as large as caps allow.
+
+    Attributes:
+        adaptor (ESputnikAPIAdaptor): Adaptor to send messages with.
+        max_recipients (int): Max amount of recipients in one request.
+        max_bytes (int): Max size of request body in bytes.
+        workers (int): Amount of concurrent requests.
+    """
+
+    def __init__(
+            self,
+            adaptor,
+            max_recipients: int = 1000,
+            max_bytes: int = 1024 * 1024,
+            workers: int = 4
+    ) -> None:
+        self.adaptor = adaptor
+        self.max_recipients = max_recipients
+        self.max_bytes = max_bytes
+        self.workers = workers
+
+    def _encode(self, locator: str, params: Any) -> bytes:
+        dumps = self.adaptor.client.serializer.dumps
+        if not isinstance(params, str):
+            params = dumps(params).decode()
+        return dumps(stream_smartsend_email.prepare_record({
+            'locator': locator,
+            'json_param': params
+        }))
+
+    def pack(
+            self,
+            recipients: Iterable[Tuple[str, Any]]
+    ) -> Iterator[Tuple[int, Any]]:
+        """
+        Packs recipients into request bodies.
+
+        Yields:
+            Tuple[int, Any]: amount of recipients and body, or
+                ``IncorrectDataError`` for a recipient that is invalid
+                or alone exceeds ``max_bytes``.
+        """
+        packer = BodyPacker(_HEAD, self.max_recipients, self.max_bytes)
+
+        for index, (locator, params) in enumerate(recipients):
+            try:
+                part = self._encode(locator, params)
+            except DataError as e:
+                yield 1, IncorrectDataError(
+                    code='recipients',
+                    message=f'Recipient {index} is invalid: '
+                            f'{e.as_dict(value=True)}'
+                )
+                continue
+
+            if not packer.fits(part):
+                yield 1, IncorrectDataError(
+                    code='max_bytes',
+                    message=f'Recipient {index} does not fit into '
+                            f'{self.max_bytes} bytes.'
+                )
+                continue
+
+            packed = packer.add(index, part)
+            if packed is not None:
+                yield len(packed[0]), packed[1]
+
+        packed = packer.flush()
+        if packed is not None:
+            yield len(packed[0]), packed[1]
+
+    def send(
+            self,
+            message_id: str,
+            recipients: Iterable[Tuple[str, Any]]
+    ) -> SmartsendResult:
+        """
+        Sends message to all recipients.
+
+        Args:
+            message_id (str): unique id of the message.
+            recipients (Iterable[Tuple[str, Any]]): pairs of locator
+                (email or phone) and params, dict or JSON string.
+                May be a generator, it is consumed as requests are sent.
+
+        Returns:
+            SmartsendResult: counters and results of requests ordered
+                by index. Request that failed to send, and recipient
+                that is invalid or too large, has ``error`` instead
+                of response.
+        """
+        path = f'message/{message_id}/smartsend'
+
+        def post(chunk):
+            count, body = chunk
+            if isinstance(body, Exception):
+                return BatchResult(None, count, None, body)
+            try:
+                response = self.adaptor.client.post(path, body)
+            except Exception as e:
+                return BatchResult(None, count, None, e)
+            return BatchResult(None, count, response, None)
+
+        chunks = sorted(
+            (
+                result._replace(index=index)
+                for index, result in bounded_map(
+                    post, self.pack(recipients), self.workers)
+            ),
+            key=lambda x: x.index
+        )
+
+        total = sum(x.size for x in chunks)
+        sent = sum(
+            x.size for x in chunks
+            if x.response is not None and is_success(x.response)
+        )
+        return SmartsendResult(
+            recipients=total,
+            sent=sent,
+            failed=total - sent,
+            chunks=chunks
+        )
@@ -0,0 +1,133 @@
+"""
+Incremental JSON serialization of large request bodies.
+
+Records of the list key are transformed and serialized one by one while
+the request is being sent, so memory used by the body does not depend on
+the amount of records.
+"""
+
+from itertools import chain
+from typing import Dict, Iterator
+
+from trafaret import DataError, Dict as DictTrafaret
+
+from esputnik.compiler import compile_template
+from esputnik.serializers import JSONSerializer
+from esputnik.templates import CONTACTS, EMAIL_SMARTSEND, ORDER
+
+__all__ = (
+    'JSONStream',
+    'stream_contacts',
+    'stream_order',
+    'stream_smartsend_email'
+)
+
+
+class JSONStream:
+    """
+    Serializes data of the template with a list of records
+    into chunks of JSON.
+
+    Attributes:
+        template: Dict trafaret of the whole body.
+        list_key (str): Name of the key with records.
+        chunk_size (int): Min size of yielded chunk in bytes.
+    """
+
+    def __init__(
+            self,
+            template: DictTrafaret,
+            list_key: str,
+            chunk_size: int = 65536
+    ) -> None:
+        self.template = template
+        self.list_key = list_key
+        self.chunk_size = chunk_size
+
+        keys = [x for x in template.keys if x.name != list_key]
+        self.list = next(
+            x for x in template.keys if x.name == list_key).trafaret
+        self.prepare_envelope = compile_template(
+            DictTrafaret(*keys, ignore_extra='*'))
+        self.prepare_record = compile_template(self.list.trafaret)
+
+    def __call__(
+            self,
+            data: Dict,
+            serializer: JSONSerializer = None
+    ) -> Iterator[bytes]:
+        """
+        Validates everything except records and returns iterator over
+        body chunks. Records may be any iterable, including generators.
+
+        Args:
+            data (Dict): data of the template.
+            serializer (JSONSerializer, optional): backend to encode
+                records with, standard json by default.
+
+        Raises:
+            DataError: Data is invalid. Errors of records are raised while
+                iterating, with the index of the failed record.
+        """
+        envelope = self.prepare_envelope(data)
+        records = iter(data.get(self.list_key) or ())
+
+        # Empty list can be checked only by the template itself.
+        first = next(records, None)
+        if first is None:
+            self.template.transform(data)
+        else:
+            records = chain([first], records)
+
+        return self.iter_chunks(
+            envelope,
+            records,
+            serializer or JSONSerializer()
+        )
+
+    def iter_chunks(
+            self,
+            envelope: Dict,
+            records: Iterator[Dict],
+            serializer: JSONSerializer
+    ) -> Iterator[bytes]:
+        dumps = serializer.dumps
+        buffer = []
+        size = 0
+        sep = b'{'
+
+        for key in self.template.keys:
+            name = key.get_name()
+            if key.name == self.list_key:
+                buffer += [sep, dumps(name), b': [']
+                for index, record in enumerate(records):
+                    try:
+                        record = self.prepare_record(record)
+                    except DataError as e:
+                        raise DataError(error={
+                            self.list_key: DataError(error={index: e})
+                        })
+                    part = dumps(record)
+                    if index:
+                        buffer.append(b', ')
+                    buffer.append(part)
+                    size += len(part)
+
+                    if size >= self.chunk_size:
+                        yield b''.join(buffer)
+                        buffer = []
+                        size = 0
+                buffer.append(b']')
+            elif name in envelope:
+                buffer += [sep, dumps(name), b': ', dumps(envelope[name])]
+            else:
+                continue
+            sep = b', '
+
+        buffer.append(b'}')
+        yield b''.join(buffer)
+
+
+stream_contacts = JSONStream(CONTACTS, 'contacts')
+stream_order = JSONStream(ORDER, 'orders')
+stream_smartsend_email = JSONStream(EMAIL_SMARTSEND, 'recipients')
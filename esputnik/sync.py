@@ -0,0 +1,308 @@
+"""
+Delta synchronization of contacts.
+
+Fingerprint of every contact sent successfully is kept in SQLite index
+by its dedupe key, so following syncs send only new and changed
+contacts, or all of them when options of the request change. Index
+lives on disk, memory used by SQLite is bounded by its page cache
+whatever the amount of keys.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import (
+    Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+)
+
+from trafaret import DataError
+
+from esputnik.client import is_success
+from esputnik.consts import CONTACTS_BATCH_SIZE
+from esputnik.esputnik import BatchResult
+from esputnik.upload import prepare_contact_record
+from esputnik.utils import bounded_map, chunked
+
+__all__ = (
+    'QuarantinedContact',
+    'SyncResult',
+    'ContactSync'
+)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    key TEXT PRIMARY KEY,
+    digest BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Max amount of keys looked up by a single query,
+# less than default SQLITE_MAX_VARIABLE_NUMBER of old versions.
+LOOKUP_SIZE = 500
+
+
+QuarantinedContact = NamedTuple('QuarantinedContact', [
+    ('index', int),
+    ('contact', Dict),
+    ('errors', Any)
+])
+
+
+class SyncResult(NamedTuple):
+    total: int
+    unchanged: int
+    sent: int
+    invalid: int
+    failed: int
+    quarantine: List[QuarantinedContact]
+    batches: List[BatchResult]
+
+
+def get_dedupe_key(
+        contact: Dict,
+        record: Dict,
+        dedupe_on: str
+) -> Optional[str]:
+    """
+    Returns key the API deduplicates contact by, None if there is none.
+
+    Args:
+        contact (Dict): contact as passed to ``add_contacts``.
+        record (Dict): contact transformed with ``CONTACT`` template.
+        dedupe_on (str): one of ``UNIQUENESS_CONTACT_CHOICES``.
+    """
+    if dedupe_on == 'id':
+        value = contact.get('id')
+        return None if value is None else f'id:{value}'
+
+    channels = {}  # type: Dict[str, str]
+    for channel in record['channels']:
+        channels.setdefault(channel['type'], channel['value'])
+
+    types = ('email', 'sms') if dedupe_on == 'email_or_sms' else (dedupe_on,)
+    for type_ in types:
+        if channels.get(type_):
+            return f'{type_}:{channels[type_]}'
+    return None
+
+
+def _digest(data: Any) -> bytes:
+    encoded = json.dumps(
+        data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(encoded.encode(), digest_size=16).digest()
+
+
+def get_options_digest(data: Dict) -> bytes:
+    """
+    Returns digest of options sent with every batch (everything
+    but contacts), independent of key order.
+    """
+    return _digest({k: v for k, v in data.items() if k != 'contacts'})
+
+
+def get_fingerprint(record: Dict, options: bytes = b'') -> bytes:
+    """
+    Returns digest of transformed contact and of options it is sent
+    with, independent of key order. Contact is sent again when
+    any of them changes, e.g. it must be added to other groups.
+
+    Args:
+        record (Dict): contact transformed with ``CONTACT`` template.
+        options (bytes, optional): result of ``get_options_digest``.
+    """
+    return _digest([options.hex(), record])
+
+
+class ContactSync:
+    """
+    Attributes:
+        adaptor (ESputnikAPIAdaptor): Adaptor to send contacts with.
+        path (str): Path to SQLite index file. Use separate index for
+            every account and ``dedupe_on`` setting.
+        batch_size (int): Amount of contacts in one request.
+        workers (int): Amount of concurrent requests.
+        cache_size (int): SQLite page cache size in KiB.
+    """
+
+    def __init__(
+            self,
+            adaptor,
+            path: str,
+            batch_size: int = CONTACTS_BATCH_SIZE,
+            workers: int = 4,
+            cache_size: int = 65536
+    ) -> None:
+        self.adaptor = adaptor
+        self.path = path
+        self.batch_size = batch_size
+        self.workers = workers
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(f'PRAGMA cache_size=-{cache_size}')
+        self._db.executescript(SCHEMA)
+
+    def __enter__(self) -> 'ContactSync':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM fingerprints').fetchone()[0]
+
+    def _lookup(self, keys: List[str]) -> Dict[str, bytes]:
+        found = {}  # type: Dict[str, bytes]
+        with self._lock:
+            for chunk in chunked(keys, LOOKUP_SIZE):
+                found.update(self._db.execute(
+                    'SELECT key, digest FROM fingerprints WHERE key IN '
+                    f'({", ".join("?" * len(chunk))})',
+                    chunk
+                ))
+        return found
+
+    def _store(self, fingerprints: List[Tuple[str, bytes]]) -> None:
+        with self._lock:
+            self._db.execute('BEGIN')
+            try:
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO fingerprints (key, digest) '
+                    'VALUES (?, ?)',
+                    fingerprints
+                )
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+
+    def _changed(
+            self,
+            contacts: Iterable[Dict],
+            dedupe_on: str,
+            options: bytes,
+            counters: Dict[str, int],
+            quarantine: List[QuarantinedContact]
+    ) -> Iterator[Tuple[Dict, Optional[str], bytes]]:
+        """
+        Yields contacts that are new or differ from the index,
+        with their keys and fingerprints. Invalid contacts are added
+        to quarantine.
+        """
+        offset = 0
+        for chunk in chunked(contacts, self.batch_size):
+            items = []  # type: List[Tuple[Dict, Optional[str], bytes]]
+            for index, contact in enumerate(chunk, offset):
+                try:
+                    record = prepare_contact_record(contact)
+                except DataError as e:
+                    quarantine.append(QuarantinedContact(
+                        index, contact, e.as_dict(value=True)))
+                    continue
+                items.append((
+                    contact,
+                    get_dedupe_key(contact, record, dedupe_on),
+                    get_fingerprint(record, options)
+                ))
+            offset += len(chunk)
+            counters['total'] += len(chunk)
+
+            known = self._lookup([x[1] for x in items if x[1] is not None])
+            for contact, key, digest in items:
+                if key is not None and known.get(key) == digest:
+                    counters['unchanged'] += 1
+                    continue
+                yield contact, key, digest
+
+    def sync(self, contacts: Iterable[Dict], data: Dict) -> SyncResult:
+        """
+        Sends new and changed contacts by ``add_contacts`` in batches.
+        Fingerprints are stored only for batches accepted by the server,
+        so failed contacts are sent again by the next sync. Invalid
+        contacts are quarantined with their errors and not sent.
+
+        Args:
+            contacts (Iterable[Dict]): list or generator of contacts.
+            data (Dict): rest of the CONTACTS template
+                (dedupe_on, contact_fields, group_names, etc.)
+
+        Returns:
+            SyncResult: counters, quarantined invalid contacts ordered
+                by index and results of requests ordered by batch index.
+        """
+        counters = {'total': 0, 'unchanged': 0}
+        quarantine = []  # type: List[QuarantinedContact]
+        dedupe_on = data.get('dedupe_on', 'email')
+        options = get_options_digest(data)
+
+        def send(batch):
+            try:
+                response = self.adaptor.add_contacts(
+                    dict(data, contacts=[x[0] for x in batch]))
+            except Exception as e:
+                return BatchResult(None, len(batch), None, e)
+
+            if is_success(response):
+                self._store([
+                    (key, digest)
+                    for _, key, digest in batch
+                    if key is not None
+                ])
+            return BatchResult(None, len(batch), response, None)
+
+        batches = sorted(
+            (
+                result._replace(index=index)
+                for index, result in bounded_map(
+                    send,
+                    chunked(
+                        self._changed(
+                            contacts, dedupe_on, options, counters,
+                            quarantine),
+                        self.batch_size
+                    ),
+                    self.workers
+                )
+            ),
+            key=lambda x: x.index
+        )
+
+        sent = sum(
+            x.size for x in batches
+            if x.response is not None and is_success(x.response)
+        )
+        return SyncResult(
+            total=counters['total'],
+            unchanged=counters['unchanged'],
+            sent=sent,
+            invalid=len(quarantine),
+            failed=sum(x.size for x in batches) - sent,
+            quarantine=quarantine,
+            batches=batches
+        )
+
+    def forget(self, keys: Iterable[str] = None) -> None:
+        """
+        Removes given keys or the whole index,
+        so these contacts are sent by the next sync.
+        """
+        with self._lock:
+            if keys is None:
+                self._db.execute('DELETE FROM fingerprints')
+                return
+            for chunk in chunked(keys, LOOKUP_SIZE):
+                self._db.execute(
+                    'DELETE FROM fingerprints WHERE key IN '
+                    f'({", ".join("?" * len(chunk))})',
+                    chunk
+                )
+
+    def close(self) -> None:
+        self._db.close()
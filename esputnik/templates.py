@@ -2,10 +2,9 @@
 Set of templates to transform data into format, acceptable by ESputnik API
 """
 
-from functools import partial
-
 from trafaret import Dict, String, List, Key, Enum, URL, Bool, Int, Any, Float
 
+from esputnik.compiler import compile_template
 from esputnik.consts import (
     MEDIA_CHANNEL_TYPES,
     CONTACT_FIELDS_CHOICES,
@@ -22,6 +21,7 @@ __all__ = (
     'EMAIL_SEND',
     'EMAIL_SMARTSEND',
     'EVENT',
+    'GROUP_CONTACTS',
     'ORDER',
     'SMS',
     'VIBER',
@@ -32,6 +32,7 @@ __all__ = (
     'prepare_contact_upload',
     'prepare_email',
     'prepare_event',
+    'prepare_group_contacts',
     'prepare_order',
     'prepare_send_email',
     'prepare_smartsend_email',
@@ -138,6 +139,12 @@ CONTACT_SEARCH = Dict({
 }, ignore_extra='*')
 
 
+GROUP_CONTACTS = Dict({
+    Key('start_index', optional=True) >> 'startindex': Int,
+    Key('max_rows', optional=True) >> 'maxrows': Int
+}, ignore_extra='*')
+
+
 CONTACT_UPLOAD = Dict({
     Key('dedupe_on') >> 'dedupeOn': Enum(*UNIQUENESS_CONTACT_CHOICES),
     Key('link') >> 'link': URL,
@@ -259,19 +266,16 @@ VIBER = Dict({
 }, ignore_extra='*')
 
 
-def _extract(template, *args, **kwargs):
-    return template.transform(*args, **kwargs)
-
-
-prepare_contact = partial(_extract, CONTACT)
-prepare_contacts = partial(_extract, CONTACTS)
-prepare_contact_subscribe = partial(_extract, CONTACT_SUBSCRIBE)
-prepare_contact_search = partial(_extract, CONTACT_SEARCH)
-prepare_contact_upload = partial(_extract, CONTACT_UPLOAD)
-prepare_email = partial(_extract, EMAIL)
-prepare_event = partial(_extract, EVENT)
-prepare_order = partial(_extract, ORDER)
-prepare_send_email = partial(_extract, EMAIL_SEND)
-prepare_smartsend_email = partial(_extract, EMAIL_SMARTSEND)
-prepare_sms = partial(_extract, SMS)
-prepare_viber_message = partial(_extract, VIBER)
+prepare_contact = compile_template(CONTACT)
+prepare_contacts = compile_template(CONTACTS)
+prepare_contact_subscribe = compile_template(CONTACT_SUBSCRIBE)
+prepare_contact_search = compile_template(CONTACT_SEARCH)
+prepare_contact_upload = compile_template(CONTACT_UPLOAD)
+prepare_email = compile_template(EMAIL)
+prepare_event = compile_template(EVENT)
+prepare_group_contacts = compile_template(GROUP_CONTACTS)
+prepare_order = compile_template(ORDER)
+prepare_send_email = compile_template(EMAIL_SEND)
+prepare_smartsend_email = compile_template(EMAIL_SMARTSEND)
+prepare_sms = compile_template(SMS)
+prepare_viber_message = compile_template(VIBER)
@@ -0,0 +1,283 @@
+"""
+Builder of contact files for ``contacts_upload``.
+
+Contacts are read from any iterable, transformed with the ``CONTACT``
+template and written to CSV or NDJSON file part by part, so memory used
+does not depend on the amount of contacts. Files must be hosted by you,
+manifest only builds ``contacts_upload`` data with their links.
+"""
+
+import csv
+import gzip
+import hashlib
+import io
+import os
+from typing import Dict, IO, Iterable, List, NamedTuple, Optional, Union
+
+from trafaret import DataError
+
+from esputnik.exceptions import IncorrectDataError
+from esputnik.serializers import JSONSerializer
+from esputnik.templates import prepare_contact
+
+__all__ = (
+    'UPLOAD_FORMATS',
+    'UPLOAD_COMPRESSIONS',
+    'CSV_COLUMNS',
+    'UploadPart',
+    'UploadManifest',
+    'ContactFileBuilder',
+    'prepare_contact_record'
+)
+
+
+UPLOAD_FORMATS = (
+    'csv',
+    'ndjson'
+)
+
+UPLOAD_COMPRESSIONS = (
+    None,
+    'gzip'
+)
+
+# Columns of CSV file, named like ``contact_fields`` of the API.
+CSV_COLUMNS = (
+    'firstName',
+    'lastName',
+    'email',
+    'sms',
+    'address',
+    'town',
+    'region',
+    'postcode'
+)
+
+
+class UploadPart(NamedTuple):
+    path: str
+    rows: int
+    size: int
+    sha256: str
+
+
+class UploadManifest(NamedTuple):
+    format: str
+    compression: Optional[str]
+    parts: List[UploadPart]
+
+    @property
+    def rows(self) -> int:
+        return sum(x.rows for x in self.parts)
+
+    def upload_data(self, base_url: str, **data) -> List[Dict]:
+        """
+        Returns data of ``contacts_upload`` request for every part.
+
+        Args:
+            base_url (str): URL the directory with parts is served from.
+            **data: other keys of ``contacts_upload`` data,
+                e.g. dedupe_on and group_names.
+        """
+        base_url = base_url.rstrip('/') + '/'
+        return [
+            dict(data, link=base_url + os.path.basename(x.path))
+            for x in self.parts
+        ]
+
+
+def prepare_contact_record(contact: Dict) -> Dict:
+    """
+    Transforms contact with the ``CONTACT`` template. Template checks
+    only ids of custom fields, so their values are taken from input.
+    """
+    record = prepare_contact(contact)
+    if 'fields' in record:
+        record['fields'] = [
+            {'id': x['id'], 'value': y.get('value', '')}
+            for x, y in zip(record['fields'], contact['fields'])
+        ]
+    return record
+
+
+def _csv_row(contact: Dict, custom_fields_ids: List[int]) -> List:
+    """
+    Flattens transformed contact into row of CSV columns.
+    """
+    channels = {}  # type: Dict[str, str]
+    for channel in contact['channels']:
+        channels.setdefault(channel['type'], channel['value'])
+    address = contact.get('address') or {}
+    fields = {x['id']: x.get('value', '') for x in contact.get('fields', ())}
+
+    return [
+        contact.get('firstName', ''),
+        contact.get('lastName', ''),
+        channels.get('email', ''),
+        channels.get('sms', ''),
+        address.get('address', ''),
+        address.get('town', ''),
+        address.get('region', ''),
+        address.get('postcode', ''),
+    ] + [fields.get(x, '') for x in custom_fields_ids]
+
+
+class _PartWriter:
+    """
+    Single output file, optionally gzip compressed.
+    """
+
+    def __init__(self, path: str, compression: Optional[str]) -> None:
+        self.path = path
+        self.rows = 0
+        self.raw = open(path, 'wb')
+        self.file = self.raw  # type: Union[IO, gzip.GzipFile]
+        if compression == 'gzip':
+            self.file = gzip.GzipFile(
+                filename='', mode='wb', fileobj=self.raw, mtime=0)
+
+    def write(self, data: bytes, rows: int) -> None:
+        self.file.write(data)
+        self.rows += rows
+
+    def size(self) -> int:
+        """
+        Returns amount of bytes on disk, without data still buffered
+        by the compressor.
+        """
+        return self.raw.tell()
+
+    def close(self) -> UploadPart:
+        if self.file is not self.raw:
+            self.file.close()
+        self.raw.close()
+
+        sha256 = hashlib.sha256()
+        with open(self.path, 'rb') as f:
+            for block in iter(lambda: f.read(65536), b''):
+                sha256.update(block)
+        return UploadPart(
+            path=self.path,
+            rows=self.rows,
+            size=os.path.getsize(self.path),
+            sha256=sha256.hexdigest()
+        )
+
+
+class ContactFileBuilder:
+    """
+    Attributes:
+        directory (str): Directory to write parts to.
+        format (str): 'csv' or 'ndjson'.
+        compression (str, optional): None or 'gzip'.
+        max_part_size (int, optional): Max size of part on disk in bytes.
+            Size is checked when row buffer is written, so part may exceed
+            it by the size of one buffer.
+        buffer_rows (int): Amount of rows encoded and written at once.
+        custom_fields_ids (List[int]): Custom fields written as extra
+            CSV columns named by their id. NDJSON keeps all fields.
+        name (str): Prefix of part file names.
+        serializer (JSONSerializer, optional): JSON backend for NDJSON.
+    """
+
+    def __init__(
+            self,
+            directory: str,
+            format: str = 'csv',
+            compression: Optional[str] = 'gzip',
+            max_part_size: int = None,
+            buffer_rows: int = 1000,
+            custom_fields_ids: Iterable[int] = (),
+            name: str = 'contacts',
+            serializer: JSONSerializer = None
+    ) -> None:
+        if format not in UPLOAD_FORMATS:
+            raise IncorrectDataError(
+                code='format',
+                message=f'Format must be one of {UPLOAD_FORMATS}.'
+            )
+        if compression not in UPLOAD_COMPRESSIONS:
+            raise IncorrectDataError(
+                code='compression',
+                message=f'Compression must be one of {UPLOAD_COMPRESSIONS}.'
+            )
+
+        self.directory = directory
+        self.format = format
+        self.compression = compression
+        self.max_part_size = max_part_size
+        self.buffer_rows = buffer_rows
+        self.custom_fields_ids = list(custom_fields_ids)
+        self.name = name
+        self.serializer = serializer or JSONSerializer()
+
+    @property
+    def header(self) -> List[str]:
+        return list(CSV_COLUMNS) + [str(x) for x in self.custom_fields_ids]
+
+    def part_path(self, index: int) -> str:
+        extension = self.format
+        if self.compression == 'gzip':
+            extension += '.gz'
+        return os.path.join(
+            self.directory, f'{self.name}-{index:05d}.{extension}')
+
+    def _encode(self, contacts: List[Dict], header: bool) -> bytes:
+        if self.format == 'ndjson':
+            dumps = self.serializer.dumps
+            return b''.join(dumps(x) + b'\n' for x in contacts)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(self.header)
+        writer.writerows(
+            _csv_row(x, self.custom_fields_ids) for x in contacts)
+        return buffer.getvalue().encode()
+
+    def build(self, contacts: Iterable[Dict]) -> UploadManifest:
+        """
+        Writes contacts to files.
+
+        Args:
+            contacts (Iterable[Dict]): contacts in ``CONTACT`` format,
+                may be a generator.
+
+        Raises:
+            DataError: Contact is invalid, with the index of the contact.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        parts = []  # type: List[UploadPart]
+        part = None  # type: Optional[_PartWriter]
+        buffer = []  # type: List[Dict]
+
+        def flush():
+            nonlocal part
+            if part is None:
+                part = _PartWriter(
+                    self.part_path(len(parts) + 1), self.compression)
+            part.write(self._encode(buffer, not part.rows), len(buffer))
+            buffer.clear()
+            if self.max_part_size and part.size() >= self.max_part_size:
+                parts.append(part.close())
+                part = None
+
+        try:
+            for index, contact in enumerate(contacts):
+                try:
+                    buffer.append(prepare_contact_record(contact))
+                except DataError as e:
+                    raise DataError(error={index: e})
+                if len(buffer) >= self.buffer_rows:
+                    flush()
+            if buffer or part is None and not parts:
+                flush()
+        finally:
+            if part is not None:
+                parts.append(part.close())
+
+        return UploadManifest(
+            format=self.format,
+            compression=self.compression,
+            parts=parts
+        )
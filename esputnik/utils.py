@@ -0,0 +1,210 @@
+import importlib.util
+import sys
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    ThreadPoolExecutor,
+    wait
+)
+from itertools import islice
+from types import ModuleType
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+__all__ = (
+    'chunked',
+    'bounded_map',
+    'ordered_map',
+    'lazy_import',
+    'BodyPacker'
+)
+
+
+class _LazyModule(ModuleType):
+    """
+    Stands in for a module until its attributes are accessed, then
+    imports it and forwards attribute lookups to it. Module is imported
+    with ``importlib.import_module``, so concurrent first accesses from
+    many threads wait for a single import.
+    """
+
+    def __getattr__(self, attr: str) -> Any:
+        module = self.__dict__.get('_module')
+        if module is None:
+            module = self.__dict__['_module'] = \
+                importlib.import_module(self.__name__)
+        return getattr(module, attr)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Returns module that is imported on first access to its attributes.
+
+    Raises:
+        ImportError: Module is not installed.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    if importlib.util.find_spec(name) is None:
+        raise ImportError(f'No module named {name!r}', name=name)
+    return _LazyModule(name)
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    """
+    Splits iterable into lists of given size, the last one may be shorter.
+    Consumes the iterable lazily, so generators are never materialized.
+
+    Args:
+        iterable (Iterable): items to split.
+        size (int): max amount of items in chunk.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def bounded_map(
+        func: Callable,
+        iterable: Iterable,
+        workers: int
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Calls func for every item in a thread pool, keeping at most
+    ``workers`` items in flight, so the iterable is consumed only as fast
+    as results are produced.
+
+    Args:
+        func (Callable): function to call with every item.
+        iterable (Iterable): items to process.
+        workers (int): amount of threads.
+
+    Yields:
+        Tuple[int, Any]: index of item and result, in completion order.
+    """
+    iterator = enumerate(iterable)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        for index, item in islice(iterator, workers):
+            pending[executor.submit(func, item)] = index
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                yield index, future.result()
+
+            for index, item in islice(iterator, len(done)):
+                pending[executor.submit(func, item)] = index
+
+
+def ordered_map(
+        func: Callable,
+        iterable: Iterable,
+        workers: int,
+        executor: Executor = None
+) -> Iterator[Any]:
+    """
+    Same as ``bounded_map``, but results are yielded in order of items.
+    At most ``workers`` results are kept waiting for the slower ones.
+
+    Args:
+        func (Callable): function to call with every item.
+        iterable (Iterable): items to process.
+        workers (int): amount of items in flight, and of threads
+            when no executor is given.
+        executor (Executor, optional): pool to call func in, e.g. a pool
+            of processes. It is not shut down when items are processed.
+    """
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            yield from ordered_map(func, iterable, workers, executor)
+        return
+
+    iterator = iter(iterable)
+    pending = deque(
+        executor.submit(func, item) for item in islice(iterator, workers))
+
+    while pending:
+        result = pending.popleft().result()
+        for item in islice(iterator, 1):
+            pending.append(executor.submit(func, item))
+        yield result
+
+
+class BodyPacker:
+    """
+    Packs serialized items into request bodies of JSON list, bounded by
+    amount of items and size. Items are added one by one and a body
+    is returned as soon as the next item does not fit into it.
+
+    Attributes:
+        head (bytes): Start of body up to the opening bracket of list,
+            e.g. ``b'{"orders": ['``.
+        max_items (int): Max amount of items in one body.
+        max_bytes (int): Max size of body in bytes.
+        tail (bytes): End of body after the items.
+    """
+    separator = b', '
+
+    def __init__(
+            self,
+            head: bytes,
+            max_items: int,
+            max_bytes: int,
+            tail: bytes = b']}'
+    ) -> None:
+        self.head = head
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.tail = tail
+        self._keys = []  # type: List[Any]
+        self._parts = []  # type: List[bytes]
+        self._size = len(head) + len(tail)
+
+    def fits(self, part: bytes) -> bool:
+        """
+        Returns False if the item alone exceeds ``max_bytes``,
+        it must not be added then.
+        """
+        return len(self.head) + len(part) + len(self.tail) <= self.max_bytes
+
+    def add(self, key: Any, part: bytes) -> Optional[Tuple[List, bytes]]:
+        """
+        Adds serialized item with key to tell it by.
+
+        Returns:
+            Optional[Tuple[List, bytes]]: keys of items and body packed
+                before the item if it does not fit there, None otherwise.
+        """
+        packed = None
+        extra = len(part) + (len(self.separator) if self._parts else 0)
+        if self._parts and (len(self._parts) >= self.max_items or
+                            self._size + extra > self.max_bytes):
+            packed = self.flush()
+            extra = len(part)
+
+        self._keys.append(key)
+        self._parts.append(part)
+        self._size += extra
+        return packed
+
+    def flush(self) -> Optional[Tuple[List, bytes]]:
+        """
+        Returns keys and body of added items, None if there are none.
+        """
+        if not self._parts:
+            return None
+        packed = (
+            self._keys,
+            self.head + self.separator.join(self._parts) + self.tail
+        )
+        self._keys = []
+        self._parts = []
+        self._size = len(self.head) + len(self.tail)
+        return packed
@@ -18,6 +18,12 @@ setup(
     include_package_data=True,
     license='MIT',
     install_requires=requires,
+    extras_require={
+        'async': ['aiohttp'],
+        'fast': ['orjson'],
+        'prometheus': ['prometheus_client'],
+        'opentelemetry': ['opentelemetry-api'],
+    },
     python_requires=">=3.5",
     classifiers=[
         'Environment :: Web Environment',
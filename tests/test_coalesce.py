@@ -0,0 +1,137 @@
+"""
+Coalescing of message status lookups, see ``esputnik/coalesce.py``.
+"""
+
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from esputnik.client import Response
+from esputnik.coalesce import (
+    AsyncMessageStatusCoalescer,
+    MessageStatusCoalescer
+)
+from esputnik.exceptions import ResponseError
+
+
+class FakeAdaptor:
+    """
+    Knows statuses of numeric message ids, answers with ``status_code``.
+    """
+
+    def __init__(self, status_code: int = 200) -> None:
+        self.status_code = status_code
+        self.calls = []  # type: List[List[str]]
+        self._lock = threading.Lock()
+
+    def answer(self, ids):
+        with self._lock:
+            self.calls.append(list(ids))
+        if self.status_code != 200:
+            return Response(status_code=self.status_code, data='error')
+        return Response(status_code=200, data={'results': [
+            {'id': x, 'status': 'DELIVERED'} for x in ids if x.isdigit()
+        ]})
+
+    def message_status(self, ids):
+        return self.answer(ids)
+
+
+class AsyncFakeAdaptor(FakeAdaptor):
+
+    async def message_status(self, ids):
+        await asyncio.sleep(0)
+        return self.answer(ids)
+
+
+class MessageStatusCoalescerTest(unittest.TestCase):
+
+    def lookup(self, coalescer, ids):
+        with ThreadPoolExecutor(max_workers=len(ids)) as executor:
+            return list(executor.map(coalescer.status, ids))
+
+    def test_concurrent_lookups_share_requests(self):
+        adaptor = FakeAdaptor()
+        coalescer = MessageStatusCoalescer(adaptor, window=0.05)
+        ids = [str(x) for x in range(50)]
+
+        results = self.lookup(coalescer, ids)
+
+        self.assertEqual([x['id'] for x in results], ids)
+        self.assertEqual(coalescer.lookups, 50)
+        self.assertLess(coalescer.requests, 50)
+        self.assertEqual(
+            sorted(x for call in adaptor.calls for x in call),
+            sorted(ids)
+        )
+
+    def test_same_id_is_requested_once(self):
+        adaptor = FakeAdaptor()
+        coalescer = MessageStatusCoalescer(adaptor, window=0.05)
+
+        results = self.lookup(coalescer, ['7'] * 10)
+
+        self.assertEqual(results, [{'id': '7', 'status': 'DELIVERED'}] * 10)
+        self.assertEqual(adaptor.calls, [['7']])
+
+    def test_requests_are_limited_by_max_ids(self):
+        adaptor = FakeAdaptor()
+        coalescer = MessageStatusCoalescer(adaptor, window=0.05, max_ids=8)
+
+        self.lookup(coalescer, [str(x) for x in range(40)])
+
+        self.assertTrue(all(len(x) <= 8 for x in adaptor.calls))
+
+    def test_unknown_message_is_none(self):
+        coalescer = MessageStatusCoalescer(FakeAdaptor(), window=0.01)
+        self.assertIsNone(coalescer.status('unknown'))
+
+    def test_error_is_raised_for_every_lookup(self):
+        coalescer = MessageStatusCoalescer(FakeAdaptor(500), window=0.05)
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            futures = [executor.submit(coalescer.status, str(x))
+                       for x in range(5)]
+        for future in futures:
+            with self.assertRaises(ResponseError):
+                future.result()
+
+
+class AsyncMessageStatusCoalescerTest(unittest.TestCase):
+
+    def lookup(self, coalescer, ids):
+        async def main():
+            return await asyncio.gather(
+                *(coalescer.status(x) for x in ids), return_exceptions=True)
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(main())
+        finally:
+            loop.close()
+
+    def test_concurrent_lookups_share_requests(self):
+        adaptor = AsyncFakeAdaptor()
+        coalescer = AsyncMessageStatusCoalescer(adaptor, max_ids=20)
+        ids = [str(x) for x in range(50)] + ['3', 'unknown']
+
+        results = self.lookup(coalescer, ids)
+
+        self.assertEqual([x['id'] for x in results[:51]], ids[:51])
+        self.assertIsNone(results[51])
+        self.assertEqual(coalescer.requests, 3)
+        self.assertTrue(all(len(x) <= 20 for x in adaptor.calls))
+
+    def test_error_is_raised_for_every_lookup(self):
+        coalescer = AsyncMessageStatusCoalescer(AsyncFakeAdaptor(500))
+
+        results = self.lookup(coalescer, ['1', '2', '2'])
+
+        self.assertEqual(len(results), 3)
+        for result in results:
+            self.assertIsInstance(result, ResponseError)
+
+
+if __name__ == '__main__':
+    unittest.main()
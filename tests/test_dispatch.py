@@ -0,0 +1,125 @@
+"""
+Background event dispatch, see ``esputnik/dispatch.py``.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from esputnik import templates
+from esputnik.client import Response
+from esputnik.esputnik import ESputnikAPIAdaptor
+
+
+def make_event(key: int):
+    return {
+        'event_type_key': 'order_shipped',
+        'key_value': str(key),
+        'params': [{'name': 'order', 'value': str(key)}],
+    }
+
+
+class EventDispatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.spill_path = os.path.join(self.directory, 'events.spill')
+        self.adaptor = ESputnikAPIAdaptor('user', 'secret')
+        self.sent = []
+        self.sent_lock = threading.Lock()
+        # Workers wait for it before every request.
+        self.unblocked = threading.Event()
+        self.unblocked.set()
+        self.adaptor.client.post = self.post
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def post(self, path, data=None, timeout=None):
+        self.unblocked.wait()
+        with self.sent_lock:
+            self.sent.append(json.loads(data)['keyValue'])
+        return Response(status_code=200, data=None)
+
+    def test_spilled_events_are_sent(self):
+        self.unblocked.clear()
+        dispatcher = self.adaptor.event_dispatcher(
+            maxsize=2, batch_size=10, flush_interval=0.01, workers=1,
+            policy='spill', spill_path=self.spill_path)
+        for key in range(100):
+            self.assertTrue(dispatcher.event(make_event(key)))
+        self.assertGreater(dispatcher.stats()['spilled'], 0)
+
+        self.unblocked.set()
+        dispatcher.close()
+
+        stats = dispatcher.stats()
+        self.assertEqual(stats['sent'], 100)
+        self.assertEqual(sorted(map(int, self.sent)), list(range(100)))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_spill_left_by_crash_is_sent(self):
+        with open(self.spill_path + '.taken', 'wb') as f:
+            for key in range(25):
+                f.write(self.adaptor.dumps(
+                    make_event(key), templates.prepare_event))
+                f.write(b'\n')
+
+        dispatcher = self.adaptor.event_dispatcher(
+            batch_size=10, policy='spill', spill_path=self.spill_path)
+        dispatcher.close()
+
+        self.assertEqual(sorted(map(int, self.sent)), list(range(25)))
+        self.assertEqual(dispatcher.stats()['flushes'], 3)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_events_are_dropped_when_queue_is_full(self):
+        self.unblocked.clear()
+        dispatcher = self.adaptor.event_dispatcher(
+            maxsize=1, batch_size=1, workers=1, policy='drop')
+        accepted = sum(dispatcher.event(make_event(x)) for x in range(50))
+
+        self.unblocked.set()
+        dispatcher.close()
+
+        stats = dispatcher.stats()
+        self.assertEqual(stats['dropped'], 50 - accepted)
+        self.assertEqual(stats['sent'], accepted)
+
+    def test_event_after_close_is_rejected(self):
+        dispatcher = self.adaptor.event_dispatcher()
+        dispatcher.close()
+        with self.assertRaises(RuntimeError):
+            dispatcher.event(make_event(1))
+
+    def test_close_sends_every_accepted_event(self):
+        dispatcher = self.adaptor.event_dispatcher(
+            maxsize=10, batch_size=5, flush_interval=0.001)
+        accepted = []
+
+        def produce(offset):
+            for key in range(offset, offset + 1000):
+                try:
+                    dispatcher.event(make_event(key))
+                except RuntimeError:
+                    return
+                accepted.append(key)
+
+        producers = [
+            threading.Thread(target=produce, args=(x * 1000,))
+            for x in range(4)
+        ]
+        for producer in producers:
+            producer.start()
+        dispatcher.close()
+        for producer in producers:
+            producer.join()
+
+        self.assertEqual(sorted(map(int, self.sent)), sorted(accepted))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+"""
+Import time budget of the package, see ``benchmarks/bench_import.py``.
+"""
+
+import unittest
+
+from benchmarks import bench_import
+
+
+class ImportTimeTest(unittest.TestCase):
+
+    def test_median_import_time_is_within_budget(self):
+        median = bench_import.median()
+        self.assertLessEqual(
+            median, bench_import.BUDGET,
+            f'import {bench_import.MODULE} takes {median:.1f} ms, '
+            f'budget is {bench_import.BUDGET} ms'
+        )
+
+    def test_heavy_modules_are_not_loaded(self):
+        self.assertEqual(bench_import.loaded(), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Bulk sending of orders, see ``esputnik/orders.py``.
+"""
+
+import json
+import threading
+import unittest
+
+from esputnik.client import Response
+from esputnik.esputnik import ESputnikAPIAdaptor
+from esputnik.orders import FAILED, INVALID, SENT
+
+
+def make_order(key: int, description: str = 'Book'):
+    return {
+        'id': str(key),
+        'user_id': str(key),
+        'total_cost': 10.5,
+        'date': '2024-01-01T10:00:00',
+        'email': f'john{key}@dou.com',
+        'items': [{
+            'id': '1',
+            'name': 'Item',
+            'quantity': 1,
+            'cost': 10.5,
+            'url': 'https://dou.com/items/1',
+            'image_url': 'https://dou.com/items/1.png',
+            'category': 'Books',
+            'description': description,
+        }],
+    }
+
+
+class OrderPipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.adaptor = ESputnikAPIAdaptor('user', 'secret')
+        self.bodies = []
+        self.lock = threading.Lock()
+        # Requests with an order of this id fail.
+        self.failing_id = None
+        self.adaptor.client.post = self.post
+
+    def post(self, path, data=None, timeout=None):
+        orders = json.loads(data)['orders']
+        with self.lock:
+            self.bodies.append((len(data), orders))
+        if any(x['externalOrderId'] == self.failing_id for x in orders):
+            return Response(status_code=500, data='error')
+        return Response(status_code=200, data=None)
+
+    def test_invalid_orders_are_quarantined(self):
+        orders = [make_order(x) for x in range(10)]
+        del orders[3]['email']
+        orders[6] = 'garbage'
+
+        result = self.adaptor.orders_bulk(iter(orders), max_orders=4)
+
+        self.assertEqual(
+            (result.total, result.sent, result.invalid, result.failed),
+            (10, 8, 2, 0)
+        )
+        self.assertEqual([x.index for x in result.quarantine], [3, 6])
+        self.assertIn('email', result.quarantine[0].errors)
+        self.assertIs(result.quarantine[1].order, orders[6])
+        self.assertEqual(
+            [x.status for x in result.outcomes],
+            [SENT] * 3 + [INVALID] + [SENT] * 2 + [INVALID] + [SENT] * 3
+        )
+        sent_ids = sorted(
+            int(x['externalOrderId']) for _, batch in self.bodies
+            for x in batch
+        )
+        self.assertEqual(sent_ids, [0, 1, 2, 4, 5, 7, 8, 9])
+
+    def test_batches_are_bounded(self):
+        orders = [make_order(x, 'Book ' * 50) for x in range(30)]
+
+        result = self.adaptor.orders_bulk(
+            orders, max_orders=7, max_bytes=2000)
+
+        self.assertEqual(result.sent, 30)
+        self.assertEqual(len(result.batches), len(self.bodies))
+        for size, batch in self.bodies:
+            self.assertLessEqual(len(batch), 7)
+            self.assertLessEqual(size, 2000)
+
+    def test_order_larger_than_request_is_quarantined(self):
+        orders = [make_order(1), make_order(2, 'x' * 5000), make_order(3)]
+
+        result = self.adaptor.orders_bulk(orders, max_bytes=4000)
+
+        self.assertEqual(result.sent, 2)
+        self.assertEqual([x.index for x in result.quarantine], [1])
+        self.assertIn('4000 bytes', result.quarantine[0].errors)
+
+    def test_failed_request_fails_its_orders_only(self):
+        self.failing_id = '4'
+        orders = [make_order(x) for x in range(9)]
+
+        result = self.adaptor.orders_bulk(orders, max_orders=3)
+
+        self.assertEqual((result.sent, result.failed), (6, 3))
+        failed = [x for x in result.outcomes if x.status == FAILED]
+        self.assertEqual([x.order_id for x in failed], ['3', '4', '5'])
+        self.assertEqual(failed[0].error.status_code, 500)
+        self.assertEqual({x.batch for x in failed}, {1})
+
+    def test_orders_are_validated_in_processes(self):
+        orders = [make_order(x) for x in range(50)]
+        orders[10] = {'id': 'bad'}
+
+        result = self.adaptor.orders_bulk(
+            orders, processes=2, chunk_size=7)
+
+        self.assertEqual((result.sent, result.invalid), (49, 1))
+        self.assertEqual(result.quarantine[0].index, 10)
+        self.assertEqual(
+            [x.index for x in result.outcomes], list(range(50)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+"""
+Replay of the durable outbox, see ``esputnik/outbox.py``.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from typing import List, Tuple
+
+from esputnik.client import Response
+from esputnik.esputnik import ESputnikAPIAdaptor
+from esputnik.outbox import Outbox
+
+SMS = {
+    'from': 'Shop',
+    'text': 'Your order has been shipped',
+    'phone_numbers': ['+380501234567'],
+}
+
+ORDER = {
+    'orders': [{
+        'id': '1',
+        'user_id': '1',
+        'total_cost': 10.5,
+        'date': '2024-01-01T10:00:00',
+        'email': 'john@dou.com',
+        'items': [{
+            'id': '1',
+            'name': 'Item',
+            'quantity': 1,
+            'cost': 10.5,
+            'url': 'https://dou.com/items/1',
+            'image_url': 'https://dou.com/items/1.png',
+            'category': 'Books',
+        }],
+    }]
+}
+
+
+class FakeClient:
+    """
+    Answers every request with the next of given statuses, a status of
+    None raises connection error.
+    """
+
+    def __init__(self, serializer, statuses) -> None:
+        self.serializer = serializer
+        self.statuses = list(statuses)
+        self.requests = []  # type: List[Tuple[str, str]]
+
+    def _answer(self, method, path):
+        self.requests.append((method, path))
+        status_code = self.statuses.pop(0) if self.statuses else 200
+        if status_code is None:
+            raise ConnectionError('connection reset')
+        return Response(status_code=status_code, data=None)
+
+    def get(self, path, data=None, timeout=None):
+        return self._answer('get', path)
+
+    def post(self, path, data=None, timeout=None):
+        return self._answer('post', path)
+
+
+class OutboxReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'outbox.sqlite3')
+        self.adaptor = ESputnikAPIAdaptor('user', 'secret')
+        self.outbox = self.open()
+
+    def tearDown(self):
+        self.outbox.close()
+        shutil.rmtree(self.directory)
+
+    def open(self):
+        outbox = Outbox(self.adaptor, self.path, max_attempts=3)
+        outbox.retry.backoff_factor = 0
+        return outbox
+
+    def answer(self, *statuses):
+        client = FakeClient(self.adaptor.client.serializer, statuses)
+        self.adaptor.client = client
+        return client
+
+    def test_sends_pending_requests_in_order(self):
+        client = self.answer()
+        self.outbox.message_sms(SMS, dedupe_key='a')
+        self.outbox.orders(ORDER, dedupe_key='b')
+
+        self.assertEqual(self.outbox.replay(), (2, 0))
+        self.assertEqual(
+            client.requests,
+            [('post', 'message/sms'), ('post', 'orders')]
+        )
+        self.assertEqual(self.outbox.pending(), 0)
+
+    def test_dedupe_key_is_put_once(self):
+        self.assertTrue(self.outbox.message_sms(SMS, dedupe_key='a'))
+        self.assertFalse(self.outbox.message_sms(SMS, dedupe_key='a'))
+        self.assertEqual(self.outbox.pending(), 1)
+
+    def test_server_error_holds_message_for_review(self):
+        client = self.answer(503, 503)
+        self.outbox.message_sms(SMS)
+
+        self.assertEqual(self.outbox.replay(), (0, 1))
+        self.assertEqual(self.outbox.replay(), (0, 0))
+        self.assertEqual(len(client.requests), 1)
+        self.assertEqual(self.outbox.pending(), 0)
+        self.assertEqual(len(self.outbox.held()), 1)
+
+    def test_connection_error_holds_message_for_review(self):
+        client = self.answer(None)
+        self.outbox.message_sms(SMS)
+
+        self.assertEqual(self.outbox.replay(), (0, 1))
+        self.assertEqual(self.outbox.replay(), (0, 0))
+        self.assertEqual(len(client.requests), 1)
+        self.assertEqual(len(self.outbox.held()), 1)
+
+    def test_rejected_message_is_retried(self):
+        client = self.answer(429)
+        self.outbox.message_sms(SMS)
+
+        # No backoff, so it is due again within the same replay.
+        self.assertEqual(self.outbox.replay(), (1, 1))
+        self.assertEqual(len(client.requests), 2)
+
+    def test_idempotent_request_is_retried_until_dead(self):
+        client = self.answer(503, 503, 503, 503)
+        self.outbox.orders(ORDER)
+
+        for _ in range(4):
+            self.outbox.replay()
+        self.assertEqual(len(client.requests), 3)
+        self.assertEqual(self.outbox.pending(), 0)
+        self.assertEqual(self.outbox.held(), [])
+
+    def test_client_error_is_dead(self):
+        client = self.answer(400)
+        self.outbox.message_sms(SMS)
+
+        self.assertEqual(self.outbox.replay(), (0, 1))
+        self.assertEqual(self.outbox.replay(), (0, 0))
+        self.assertEqual(len(client.requests), 1)
+        self.assertEqual(self.outbox.held(), [])
+
+    def test_requeue_sends_held_message_again(self):
+        client = self.answer(503)
+        self.outbox.message_sms(SMS)
+        self.outbox.replay()
+
+        (id_, method, path, body), = self.outbox.held()
+        self.assertTrue(self.outbox.requeue(id_))
+        self.assertFalse(self.outbox.requeue(id_))
+        self.assertEqual(self.outbox.replay(), (1, 0))
+        self.assertEqual(len(client.requests), 2)
+
+    def test_request_in_flight_during_crash(self):
+        self.outbox.message_sms(SMS)
+        self.outbox.orders(ORDER)
+        # As if the process died while sending both.
+        self.outbox._db.execute("UPDATE outbox SET state = 'sending'")
+        self.outbox.close()
+
+        self.outbox = self.open()
+        self.assertEqual(self.outbox.pending(), 1)
+        (_, _, path, _), = self.outbox.held()
+        self.assertEqual(path, 'message/sms')
+
+
+if __name__ == '__main__':
+    unittest.main()
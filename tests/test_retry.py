@@ -0,0 +1,161 @@
+"""
+Retry policy and its use by the request client, see ``esputnik/retry.py``.
+"""
+
+import unittest
+from email.utils import formatdate
+from typing import Optional, Sequence
+
+import requests
+
+from esputnik.client import ESputnikRequestClient
+from esputnik.esputnik import ESputnikAPIAdaptor
+from esputnik.retry import RetryBudget, RetryPolicy
+
+SMS = {
+    'from': 'Shop',
+    'text': 'Your order has been shipped',
+    'phone_numbers': ['+380501234567'],
+}
+
+
+class RetryPolicyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.policy = RetryPolicy(backoff_factor=0)
+
+    def test_idempotent_requests(self):
+        self.assertTrue(self.policy.is_idempotent('get', 'groups'))
+        self.assertTrue(self.policy.is_idempotent('delete', 'contact/1'))
+        self.assertTrue(self.policy.is_idempotent('post', '/contacts/'))
+        self.assertTrue(self.policy.is_idempotent('post', 'orders'))
+        self.assertFalse(self.policy.is_idempotent('post', 'message/sms'))
+        self.assertFalse(self.policy.is_idempotent('post', 'event'))
+
+    def test_rejected_request_is_retried_for_every_endpoint(self):
+        self.assertTrue(
+            self.policy.is_retryable('post', 'message/sms', 429))
+
+    def test_server_error_is_retried_only_if_idempotent(self):
+        self.assertTrue(self.policy.is_retryable('get', 'groups', 503))
+        self.assertFalse(
+            self.policy.is_retryable('post', 'message/sms', 503))
+
+    def test_connection_error_is_retried_only_if_idempotent(self):
+        error = ConnectionError()
+        self.assertTrue(
+            self.policy.is_retryable('post', 'orders', error=error))
+        self.assertFalse(
+            self.policy.is_retryable('post', 'message/sms', error=error))
+
+    def test_client_error_is_not_retried(self):
+        self.assertFalse(self.policy.is_retryable('get', 'groups', 400))
+        self.assertFalse(self.policy.is_retryable('get', 'groups', 200))
+
+    def test_retries_are_limited_by_total(self):
+        delays = [
+            self.policy.get_delay(x, 'get', 'groups', status_code=503)
+            for x in range(5)
+        ]
+        self.assertEqual(delays, [0.0, 0.0, 0.0, None, None])
+
+    def test_backoff_is_capped(self):
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5)
+        for retries in range(10):
+            self.assertLessEqual(policy.get_backoff(retries), 5)
+
+    def test_retry_after_seconds_and_date(self):
+        self.assertEqual(
+            self.policy.parse_retry_after({'Retry-After': '2'}), 2.0)
+        self.assertEqual(
+            self.policy.parse_retry_after({'Retry-After': '120'}), 30)
+        delay = self.policy.parse_retry_after(
+            {'Retry-After': formatdate(usegmt=True)})
+        self.assertEqual(delay, 0.0)
+        self.assertIsNone(
+            self.policy.parse_retry_after({'Retry-After': 'soon'}))
+        self.assertIsNone(self.policy.parse_retry_after(None))
+
+    def test_retry_after_is_used_as_delay(self):
+        delay = self.policy.get_delay(
+            0, 'post', 'message/sms', status_code=429,
+            headers={'Retry-After': '3'})
+        self.assertEqual(delay, 3.0)
+
+    def test_budget_limits_retries(self):
+        policy = RetryPolicy(
+            backoff_factor=0, budget=RetryBudget(ratio=0, max_tokens=2))
+        delays = [
+            policy.get_delay(1, 'get', 'groups', status_code=503)
+            for _ in range(3)
+        ]
+        self.assertEqual(delays, [0.0, 0.0, None])
+
+
+class ScriptedClient(ESputnikRequestClient):
+    """
+    Answers requests with statuses from ``script``, None raises
+    connection error.
+    """
+    script = ()  # type: Sequence[Optional[int]]
+    calls = 0
+
+    def _request(self, method, url, data, headers, auth, **kwargs):
+        self.calls += 1
+        status_code = self.script[self.calls - 1] \
+            if self.calls <= len(self.script) else 200
+        if status_code is None:
+            raise requests.ConnectionError('connection reset')
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = b'{}'
+        return response
+
+
+class ScriptedAdaptor(ESputnikAPIAdaptor):
+    request_client_class = ScriptedClient
+
+
+class ClientRetryTest(unittest.TestCase):
+
+    def make_adaptor(self, *statuses):
+        adaptor = ScriptedAdaptor(
+            'user', 'secret',
+            client_options={'retry': RetryPolicy(backoff_factor=0)})
+        adaptor.client.script = statuses
+        return adaptor
+
+    def test_message_is_not_sent_twice_after_server_error(self):
+        adaptor = self.make_adaptor(503, 503)
+        response = adaptor.message_sms(SMS)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(adaptor.client.calls, 1)
+
+    def test_message_is_not_sent_twice_after_connection_error(self):
+        adaptor = self.make_adaptor(None)
+        with self.assertRaises(requests.ConnectionError):
+            adaptor.message_sms(SMS)
+        self.assertEqual(adaptor.client.calls, 1)
+
+    def test_rejected_message_is_sent_again(self):
+        adaptor = self.make_adaptor(429)
+        response = adaptor.message_sms(SMS)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.retries, 1)
+        self.assertEqual(adaptor.client.calls, 2)
+
+    def test_idempotent_request_is_retried(self):
+        adaptor = self.make_adaptor(503, None, 502)
+        response = adaptor.groups()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.retries, 3)
+
+    def test_idempotent_request_gives_up_after_total(self):
+        adaptor = self.make_adaptor(503, 503, 503, 503, 503)
+        response = adaptor.groups()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(adaptor.client.calls, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()